@@ -0,0 +1,156 @@
+import argparse
+import json
+import os
+import random
+import statistics
+import time
+from contextlib import contextmanager
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+import inventory_sorter as sorter
+
+# Headless scan/OCR benchmark: renders synthetic library screenshots from the config.ini geometry, feeds them through the
+# 'file' capture backend and times the same stages Numpad 1 runs. Needs no game and no Windows APIs.
+#   python inventory_benchmark.py --rows 5 10 20 --trials 5 --noise 4 --scale 1.25 --light -15
+
+BACKGROUND_RGB, SLOT_RGB, DIGIT_RGB = (18, 18, 22), (38, 36, 40), (235, 235, 235)
+
+@contextmanager
+def patched_sorter(**values): # Sets sorter globals for the block; on the way out every config global (load_config rewrites
+    # them all), every name set here and the fake capture source go back to what they were, so importers keep their sorter
+    names = {name for name in vars(sorter) if name.isupper()} | set(values)
+    saved = {name: getattr(sorter, name) for name in names}; saved_capture = dict(sorter.capture_state)
+    try:
+        for name, value in values.items(): setattr(sorter, name, value)
+        yield
+    finally:
+        for name, value in saved.items(): setattr(sorter, name, value)
+        sorter.capture_state.update(saved_capture)
+
+def make_random_layout(num_slots, fill, rng): # -> list of (tier, count) or None; items packed from the top with a few holes
+    layout = [None] * num_slots
+    for idx in range(int(round(num_slots * fill))):
+        if rng.random() < 0.1: continue
+        count = 1 if rng.random() < 0.4 else rng.choice([rng.randint(2, 9), rng.randint(10, 99), rng.randint(100, 999)])
+        layout[idx] = (rng.choice(list(sorter.TIER_COLORS)), count)
+    return layout
+
+def get_count_font(size): # Pillow's bundled FreeType font when available (>= 10.1), else the bitmap default
+    try: return ImageFont.load_default(size=size)
+    except TypeError: return ImageFont.load_default()
+
+def render_inventory(layout, num_rows, noise=0.0, scale=1.0, light=0.0, gain=1.0, seed=0): # -> (RGB array of the game window, ground truth)
+    # Drawn at `scale` x size and resampled back (UI scaling artefacts), then lighting (gain, offset) and Gaussian noise.
+    # Counts of 1 are drawn without digits, like the game; ground truth is per slot: tier (0 = empty) and count.
+    pitch_x, pitch_y = sorter.SLOT_WIDTH + sorter.SLOT_GAP_X, sorter.SLOT_HEIGHT + sorter.SLOT_GAP_Y
+    width = sorter.GRID_OFFSET_X + sorter.NUM_COLS * pitch_x + 20; height = sorter.GRID_OFFSET_Y + num_rows * pitch_y + 20
+    big = Image.new('RGB', (int(round(width * scale)), int(round(height * scale))), BACKGROUND_RGB)
+    draw = ImageDraw.Draw(big); sc = lambda *vals: [int(round(v * scale)) for v in vals]
+    font = get_count_font(max(6, int(round(sorter.OCR_HEIGHT * 0.8 * scale))))
+    grid = sorter.get_grid_layout(num_rows)
+    for idx, item in enumerate(layout[:num_rows * sorter.NUM_COLS]):
+        x, y = grid.slot_tl[idx].tolist()
+        draw.rectangle(sc(x, y, x + sorter.SLOT_WIDTH - 1, y + sorter.SLOT_HEIGHT - 1), fill=SLOT_RGB)
+        if item is None: continue
+        tier, count = item
+        # Tier band across the slot, a few pixels taller than the sampled patch
+        _, patch_top, _, patch_bottom = grid.patch_boxes[idx].tolist()
+        draw.rectangle(sc(x + 2, patch_top - 3, x + sorter.SLOT_WIDTH - 3, patch_bottom + 2), fill=tuple(sorter.TIER_COLORS[tier]))
+        ocr_left, ocr_top = grid.ocr_boxes[idx, :2].tolist()
+        if count > 1: draw.text(sc(ocr_left + 1, ocr_top), str(count), fill=DIGIT_RGB, font=font)
+    img = big if scale == 1.0 else big.resize((width, height), Image.LANCZOS)
+    arr = np.asarray(img).astype(np.float32) * gain + light
+    if noise > 0: arr += np.random.default_rng(seed).normal(0.0, noise, arr.shape)
+    truth = {'tiers': [item[0] if item else 0 for item in layout], 'counts': [item[1] if item else 0 for item in layout]}
+    return np.clip(arr, 0, 255).astype(np.uint8), truth
+
+def time_call(timings, stage, func, *args, **kwargs): # Runs func, appends its wall time in ms to timings[stage]
+    start = time.perf_counter(); result = func(*args, **kwargs)
+    timings.setdefault(stage, []).append((time.perf_counter() - start) * 1000.0)
+    return result
+
+def run_scan_trial(screen_arr, timings): # capture -> tiers -> full scan (tiers + OCR) -> plan, as calculate_sort_plan does
+    game_rect = (0, 0, screen_arr.shape[1], screen_arr.shape[0])
+    sorter.set_fake_capture_source(screen_arr); sorter.forget_last_scan(); sorter.ocr_cache.clear()
+    capture_bbox, capture_origin = sorter.get_grid_capture_bbox(game_rect)
+    grid_arr = time_call(timings, 'capture', sorter.capture_region, capture_bbox)
+    time_call(timings, 'tiers', sorter.classify_grid_tiers, grid_arr, origin=capture_origin)
+    scan = time_call(timings, 'scan', sorter.scan_grid_screenshot, grid_arr, capture_origin, 0, 0)
+    if scan['items']:
+        centers = sorter.get_slot_center_coords(0, 0, max(scan['eff_rows'], 1))
+        time_call(timings, 'plan', sorter.plan_sort_moves, scan['items'], centers)
+    return scan
+
+def score_scan(scan, truth, num_rows): # -> (tier hits, tier total, count hits, count total) over the visible grid
+    num_slots = num_rows * sorter.NUM_COLS
+    predicted = scan['tiers'][:num_rows].reshape(-1).tolist()
+    tier_hits = sum(p == t for p, t in zip(predicted, truth['tiers'][:num_slots]))
+    counts = {it['original_slot_index']: it['count'] for it in scan['items']}
+    occupied = [i for i in range(num_slots) if truth['tiers'][i]]
+    count_hits = sum(counts.get(i) == truth['counts'][i] for i in occupied)
+    return tier_hits, num_slots, count_hits, len(occupied)
+
+def benchmark_grid_size(num_rows, args): # -> result row for one grid size; MAX_NUM_ROWS is only changed while it runs
+    with patched_sorter(MAX_NUM_ROWS=num_rows):
+        timings = {}; tier_hits = tier_total = count_hits = count_total = 0
+        for trial in range(args.trials):
+            rng = random.Random(args.seed * 1000 + num_rows * 100 + trial)
+            layout = make_random_layout(num_rows * sorter.NUM_COLS, args.fill, rng)
+            screen_arr, truth = render_inventory(layout, num_rows, args.noise, args.scale, args.light, args.gain, seed=rng.randint(0, 2**31))
+            if args.save_images:
+                name = f"synthetic_r{num_rows}_t{trial}"
+                Image.fromarray(screen_arr).save(os.path.join(args.save_images, name + ".png"))
+                with open(os.path.join(args.save_images, name + ".json"), 'w') as f: json.dump(truth, f)
+            scan = run_scan_trial(screen_arr, timings)
+            hits = score_scan(scan, truth, num_rows)
+            tier_hits += hits[0]; tier_total += hits[1]; count_hits += hits[2]; count_total += hits[3]
+    median = lambda stage: statistics.median(timings[stage]) if stage in timings else 0.0
+    return {'rows': num_rows, 'cols': sorter.NUM_COLS, 'trials': args.trials,
+            'capture_ms': median('capture'), 'tiers_ms': median('tiers'), 'scan_ms': median('scan'), 'plan_ms': median('plan'),
+            'slots_per_sec': num_rows * sorter.NUM_COLS / (median('scan') / 1000.0) if median('scan') else 0.0,
+            'tier_accuracy': tier_hits / tier_total if tier_total else 1.0,
+            'count_accuracy': count_hits / count_total if count_total else 1.0}
+
+def run_benchmark(args): # -> list of result rows, one per grid size
+    return [benchmark_grid_size(num_rows, args) for num_rows in args.rows]
+
+def print_results(results):
+    print(f"{'grid':>7} {'capture':>9} {'tiers':>8} {'scan':>9} {'plan':>8} {'slots/s':>9} {'tier acc':>9} {'count acc':>10}")
+    for res in results:
+        print(f"{res['rows']:>4}x{res['cols']:<2} {res['capture_ms']:>7.2f}ms {res['tiers_ms']:>6.2f}ms {res['scan_ms']:>7.2f}ms "
+              f"{res['plan_ms']:>6.2f}ms {res['slots_per_sec']:>9.0f} {res['tier_accuracy']:>8.1%} {res['count_accuracy']:>9.1%}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the inventory scan on synthetic screenshots (no game needed).")
+    parser.add_argument('--config', default=sorter.CONFIG_FILE, help="config.ini with the grid geometry and tier colours")
+    parser.add_argument('--rows', type=int, nargs='+', default=[5, 10, 20], help="grid sizes (rows) to benchmark")
+    parser.add_argument('--trials', type=int, default=5)
+    parser.add_argument('--fill', type=float, default=0.8, help="fraction of slots holding items")
+    parser.add_argument('--noise', type=float, default=2.0, help="Gaussian pixel noise (std dev)")
+    parser.add_argument('--scale', type=float, default=1.0, help="render at this UI scale, then resample back")
+    parser.add_argument('--light', type=float, default=0.0, help="brightness offset added to every pixel")
+    parser.add_argument('--gain', type=float, default=1.0, help="brightness multiplier")
+    parser.add_argument('--engine', choices=sorted(sorter.OCR_ENGINES), help="override [OCR] Engine")
+    parser.add_argument('--per-slot-ocr', action='store_true', help="read counts per slot instead of batched")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save-images', metavar='DIR', help="also write each rendered screenshot and its ground truth here")
+    parser.add_argument('--json', metavar='FILE', help="write the results as JSON")
+    parser.add_argument('--verbose', action='store_true', help="keep the sorter's log output")
+    args = parser.parse_args()
+
+    log = sorter.log_message if args.verbose else lambda message: None
+    with patched_sorter(CONFIG_FILE=args.config, log_message=log):
+        sorter.load_config()
+        sorter.initialize_tesseract(); sorter.load_digit_templates(); sorter.load_tier_classifier()
+        sorter.CAPTURE_BACKEND = 'file'; sorter.DEBUG_LEVEL = 'off'; sorter.OCR_DISK_CACHE_FILE = ''
+        if args.engine: sorter.OCR_ENGINE = args.engine
+        if args.per_slot_ocr: sorter.OCR_BATCH_MODE = False
+        if args.save_images: os.makedirs(args.save_images, exist_ok=True)
+        if not sorter.is_any_ocr_available(): print("Note: no OCR engine available, every count reads as 1.")
+        results = run_benchmark(args)
+    print_results(results)
+    if args.json:
+        with open(args.json, 'w') as f: json.dump(results, f, indent=1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+import argparse
+import json
+import math
+import random
+import statistics
+import threading
+import time
+import types
+from contextlib import contextmanager
+import numpy as np
+from PIL import Image, ImageDraw
+import inventory_sorter as sorter
+from inventory_benchmark import BACKGROUND_RGB, SLOT_RGB, DIGIT_RGB, get_count_font, make_random_layout, patched_sorter
+
+# End-to-end run against a simulated game: stands in for pyautogui, pygetwindow, keyboard and the screen. The inventory
+# lives in memory (any length; the window shows MaxNumRows rows of it and scrolls), a completed drag swaps the two slots.
+# Time is simulated: sleeps and mouse tweens advance a virtual clock instead of waiting, so a sort that takes minutes in
+# the game runs at full speed and still reports how long it would have taken. Needs no game and no Windows APIs.
+#   python inventory_simulator.py --slots 60 600 3000 --drop 0.02 --pickup-latency 0.03 --drop-latency 0.08
+
+SIMULATED_MIN_SLEEP = 0.001 # sleep(0) still moves the clock, so polling loops always make progress
+# (slots, fill) run when --slots isn't given. 318 slots = 53 rows of 6: full, and the last page stops short at the list's end.
+DEFAULT_SCENARIOS = [(60, 0.8), (300, 0.8), (1200, 0.8), (318, 1.0)]
+
+class SimulatedClock: # Replaces the sorter's `time` module: sleep() advances the clock instead of blocking
+    def __init__(self): self.now = 0.0; self.lock = threading.Lock()
+    def sleep(self, seconds):
+        with self.lock: self.now += max(SIMULATED_MIN_SLEEP, seconds)
+    def perf_counter(self): return self.now
+    def monotonic(self): return self.now
+    def __getattr__(self, name): return getattr(time, name) # time(), strftime(), ... stay real
+
+class SimulatedGame: # Mouse (pyautogui), window (pygetwindow), keyboard and screen of a game showing one inventory grid
+    easeInOutQuad = staticmethod(lambda t: t)
+
+    def __init__(self, layout, visible_rows, rows_per_click=1, drop_rate=0.0, pickup_latency=0.0, drop_latency=0.0, seed=0, max_stack=0):
+        # layout: (tier, count) or None per slot, row-major. Latencies are how long the game takes to show a pick-up / drop.
+        # max_stack: dropping on a same-tier stack below it merges the two (0 = drops always swap).
+        self.slots = list(layout) + [None] * (-len(layout) % sorter.NUM_COLS)
+        self.total_rows = max(visible_rows, len(self.slots) // sorter.NUM_COLS)
+        self.slots += [None] * (self.total_rows * sorter.NUM_COLS - len(self.slots))
+        self.visible_rows, self.rows_per_click, self.top_row = visible_rows, rows_per_click, 0
+        self.drop_rate, self.pickup_latency, self.drop_latency, self.max_stack = drop_rate, pickup_latency, drop_latency, max_stack
+        self.rng = random.Random(seed); self.clock = SimulatedClock()
+        self.mouse = (0, 0); self.held = None; self.lifted = set(); self.events = [] # (due time, kind, src, dst)
+        self.stats = {'drags': 0, 'dropped': 0, 'scrolls': 0, 'captures': 0}
+        self.grid = sorter.get_grid_layout(self.total_rows) # Whole list, unscrolled; the window shows a band of it
+        pitch_y = self.grid.pitch[1]; width = int(self.grid.sample_boxes[:, 2].max()) + 20
+        height = sorter.GRID_OFFSET_Y + visible_rows * pitch_y + 20
+        self.window = types.SimpleNamespace(left=0, top=0, width=width, height=height, isActive=True, isMinimized=False, activate=lambda: None)
+        self.font = get_count_font(max(6, int(round(sorter.OCR_HEIGHT * 0.8))))
+        self.tiles = {}; self.frame = np.empty((height, width, 3), dtype=np.uint8); self.frame[:] = BACKGROUND_RGB
+        self.sheet = np.empty((sorter.GRID_OFFSET_Y + self.total_rows * pitch_y, width, 3), dtype=np.uint8); self.sheet[:] = BACKGROUND_RGB
+        for slot in range(len(self.slots)): self.redraw_slot(slot)
+        self.frame_stale = True
+
+    @contextmanager
+    def installed(self): # Points the sorter's mouse, window, keyboard, clock and capture at this game for the block
+        window = types.SimpleNamespace(getWindowsWithTitle=lambda title: [self.window])
+        keys = types.SimpleNamespace(is_pressed=lambda key: False, unhook_all=lambda: None)
+        with patched_sorter(pyautogui=self, time=self.clock, gw=window, keyboard=keys, CAPTURE_BACKEND='file'):
+            sorter.set_fake_capture_source(self.get_screen); yield self
+
+    # --- Rendering: the whole list is drawn once onto a tall sheet; changed slots are redrawn, scrolling only moves the band ---
+    def get_tile(self, item):
+        if item not in self.tiles:
+            tile = Image.new('RGB', (sorter.SLOT_WIDTH, sorter.SLOT_HEIGHT), SLOT_RGB); draw = ImageDraw.Draw(tile)
+            if item is not None:
+                tier, count = item
+                _, patch_top, _, patch_bottom = (self.grid.patch_boxes[0] - np.tile(self.grid.slot_tl[0], 2)).tolist()
+                draw.rectangle((2, patch_top - 3, sorter.SLOT_WIDTH - 3, patch_bottom + 2), fill=tuple(sorter.TIER_COLORS[tier]))
+                if count > 1: draw.text((sorter.OCR_RELATIVE_X + 1, sorter.OCR_RELATIVE_Y), str(count), fill=DIGIT_RGB, font=self.font)
+            self.tiles[item] = np.asarray(tile)
+        return self.tiles[item]
+
+    def redraw_slot(self, slot):
+        x, y = self.grid.slot_tl[slot].tolist()
+        self.sheet[y:y + sorter.SLOT_HEIGHT, x:x + sorter.SLOT_WIDTH] = self.get_tile(None if slot in self.lifted else self.slots[slot])
+        self.frame_stale = True
+
+    def get_screen(self): # Capture source: the window as it looks at the current simulated time
+        self.stats['captures'] += 1
+        while self.events and self.events[0][0] <= self.clock.now: self.apply_event(*self.events.pop(0)[1:])
+        if self.frame_stale:
+            top, band = sorter.GRID_OFFSET_Y, self.visible_rows * self.grid.pitch[1]; offset = self.top_row * self.grid.pitch[1]
+            self.frame[top:top + band] = self.sheet[top + offset:top + offset + band]; self.frame_stale = False
+        return self.frame
+
+    def apply_event(self, kind, src, dst):
+        if kind == 'lift': self.lifted.add(src); self.redraw_slot(src); return
+        self.lifted.discard(src)
+        if kind == 'swap':
+            held, target = self.slots[src], self.slots[dst]
+            if self.max_stack and target and target[0] == held[0] and target[1] < self.max_stack: # What fits joins the stack
+                moved = min(held[1], self.max_stack - target[1])
+                self.slots[dst] = (target[0], target[1] + moved); self.slots[src] = (held[0], held[1] - moved) if held[1] > moved else None
+            else: self.slots[src], self.slots[dst] = target, held
+            self.redraw_slot(dst)
+        self.redraw_slot(src) # 'return': a dropped drag puts the item back where it came from
+
+    def schedule(self, delay, kind, src, dst=None):
+        self.events.append((self.clock.now + delay, kind, src, dst)); self.events.sort(key=lambda e: e[0])
+
+    def slot_at(self, x, y): # Global slot under a window position, or None between / outside slots
+        col, dx = divmod(x - sorter.GRID_OFFSET_X, self.grid.pitch[0]); row, dy = divmod(y - sorter.GRID_OFFSET_Y, self.grid.pitch[1])
+        if not (0 <= col < sorter.NUM_COLS and 0 <= row < self.visible_rows and dx < sorter.SLOT_WIDTH and dy < sorter.SLOT_HEIGHT): return None
+        return (self.top_row + row) * sorter.NUM_COLS + col
+
+    # --- pyautogui ---
+    def position(self): return self.mouse
+
+    def moveTo(self, x, y, duration=0.0, tween=None):
+        if duration: self.clock.sleep(duration)
+        self.mouse = (int(x), int(y))
+
+    def mouseDown(self):
+        slot = self.slot_at(*self.mouse)
+        if slot is not None and self.slots[slot] is not None: self.held = slot; self.schedule(self.pickup_latency, 'lift', slot)
+
+    def mouseUp(self):
+        if self.held is None: return
+        src, dst = self.held, self.slot_at(*self.mouse); self.held = None; self.stats['drags'] += 1
+        if dst is None or dst == src or self.rng.random() < self.drop_rate:
+            self.stats['dropped'] += dst is not None and dst != src; self.schedule(self.drop_latency, 'return', src)
+        else: self.schedule(self.drop_latency, 'swap', src, dst)
+
+    def scroll(self, clicks, x=None, y=None): # Positive = up, as in pyautogui
+        self.top_row = min(max(0, self.top_row - clicks * self.rows_per_click), self.total_rows - self.visible_rows)
+        self.stats['scrolls'] += 1; self.frame_stale = True
+
+    def is_sorted(self): # Final layout is what the planner targets: tier asc, count desc, packed from slot 0
+        items = [it for it in self.slots if it is not None]
+        return self.slots == sorted(items, key=lambda it: (it[0], -it[1])) + [None] * (len(self.slots) - len(items))
+
+def run_sort_trial(num_slots, fill, args, seed): # Plan + execute on a fresh simulated inventory -> result dict
+    rng = random.Random(seed)
+    layout = make_random_layout(num_slots, fill, rng)
+    if not sorter.is_any_ocr_available(): layout = [(it[0], 1) if it else None for it in layout] # Counts would all read as 1
+    if args.max_stack: layout = [(it[0], min(it[1], args.max_stack)) if it else None for it in layout]
+    visible_rows = sorter.MAX_NUM_ROWS
+    game = SimulatedGame(layout, visible_rows, args.rows_per_click, args.drop, args.pickup_latency, args.drop_latency, seed, args.max_stack)
+    with game.installed(), patched_sorter(last_calculated_plan=None, is_processing=False):
+        sorter.PAGED_SCAN_ENABLED = game.total_rows > visible_rows
+        if sorter.PAGED_SCAN_ENABLED: # Enough pages to reach the bottom of the list
+            rows_per_page = max(1, abs(sorter.PAGE_SCROLL_CLICKS) * args.rows_per_click)
+            sorter.PAGE_MAX_PAGES = max(sorter.PAGE_MAX_PAGES, math.ceil((game.total_rows - visible_rows) / rows_per_page) + 2)
+        sorter.forget_last_scan(); sorter.ocr_cache.clear(); sorter.load_timing_profile()
+
+        wall_start, sim_start = time.perf_counter(), game.clock.now
+        sorter.calculate_sort_plan()
+        plan_wall, plan_sim = time.perf_counter() - wall_start, game.clock.now - sim_start
+        plan = sorter.last_calculated_plan
+        planned = len([m for m in plan['moves'] if m.get('action') != 'scroll']) if plan else 0
+        merges = len([m for m in plan['moves'] if m.get('action') == 'merge']) if plan else 0
+        wall_start, sim_start = time.perf_counter(), game.clock.now
+        if plan: sorter.execute_sort_plan()
+        exec_wall, exec_sim = time.perf_counter() - wall_start, game.clock.now - sim_start
+        paged = sorter.PAGED_SCAN_ENABLED
+    drags = game.stats['drags']
+    return {'slots': num_slots, 'fill': fill, 'items': sum(it is not None for it in layout), 'paged': paged,
+            'planned_drags': planned, 'merges': merges, 'stacks_after': sum(it is not None for it in game.slots), 'drags': drags, 'dropped': game.stats['dropped'], 'scrolls': game.stats['scrolls'],
+            'captures': game.stats['captures'], 'plan_wall_ms': plan_wall * 1000.0, 'plan_sim_s': plan_sim,
+            'exec_wall_s': exec_wall, 'exec_sim_s': exec_sim, 'sim_total_s': plan_sim + exec_sim,
+            'moves_per_sim_s': drags / exec_sim if exec_sim else 0.0, 'moves_per_wall_s': drags / exec_wall if exec_wall else 0.0,
+            'sorted': game.is_sorted()}
+
+def run_benchmark(args): # -> list of result rows, one per scenario (medians over the trials)
+    scenarios = [(num_slots, args.fill) for num_slots in args.slots] if args.slots else DEFAULT_SCENARIOS
+    results = []
+    for num_slots, fill in scenarios:
+        trials = [run_sort_trial(num_slots, fill, args, args.seed * 1000 + trial) for trial in range(args.trials)]
+        row = {k: statistics.median(t[k] for t in trials) for k in trials[0] if k not in ('slots', 'fill', 'paged', 'sorted')}
+        row.update(slots=num_slots, fill=fill, paged=trials[0]['paged'], trials=args.trials, sorted=sum(t['sorted'] for t in trials))
+        results.append(row)
+    return results
+
+def print_results(results):
+    print(f"{'slots':>6} {'fill':>5} {'items':>6} {'freed':>6} {'drags':>6} {'merges':>7} {'lost':>5} {'plan':>9} {'exec wall':>10} {'game time':>10} "
+          f"{'moves/s game':>13} {'moves/s wall':>13} {'sorted':>7}")
+    for res in results:
+        print(f"{res['slots']:>6} {res['fill']:>5.0%} {res['items']:>6.0f} {res['items'] - res['stacks_after']:>6.0f} {res['drags']:>6.0f} {res['merges']:>7.0f} {res['dropped']:>5.0f} {res['plan_wall_ms']:>7.0f}ms "
+              f"{res['exec_wall_s']:>9.2f}s {res['sim_total_s']:>9.1f}s {res['moves_per_sim_s']:>13.2f} {res['moves_per_wall_s']:>13.0f} "
+              f"{res['sorted']:>4}/{res['trials']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Sort simulated inventories end to end (scan, plan, drags) without the game.")
+    parser.add_argument('--config', default=sorter.CONFIG_FILE, help="config.ini with the grid geometry, tier colours and timings")
+    parser.add_argument('--slots', type=int, nargs='+', help="inventory sizes (slots) to sort at --fill (default: 60, 300, 1200 at 80%% and 318 full)")
+    parser.add_argument('--trials', type=int, default=3)
+    parser.add_argument('--fill', type=float, default=0.8, help="fraction of slots holding items, with --slots")
+    parser.add_argument('--drop', type=float, default=0.0, help="chance that the game ignores a drag")
+    parser.add_argument('--pickup-latency', type=float, default=0.03, help="seconds until a picked-up item shows as lifted")
+    parser.add_argument('--drop-latency', type=float, default=0.05, help="seconds until a drop shows")
+    parser.add_argument('--max-stack', type=int, default=0, help="stacks merge up to this size; also turns on [Consolidate] with it")
+    parser.add_argument('--rows-per-click', type=int, default=1, help="rows the list moves per scroll click")
+    parser.add_argument('--max-repairs', type=int, help="override [Executor] MaxRepairs")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', metavar='FILE', help="write the results as JSON")
+    parser.add_argument('--verbose', action='store_true', help="keep the sorter's log output")
+    args = parser.parse_args()
+
+    log = sorter.log_message if args.verbose else lambda message: None
+    with patched_sorter(CONFIG_FILE=args.config, log_message=log):
+        sorter.load_config()
+        sorter.initialize_tesseract(); sorter.load_digit_templates(); sorter.load_tier_classifier()
+        sorter.DEBUG_LEVEL = 'off'; sorter.OCR_DISK_CACHE_FILE = ''; sorter.EXECUTOR_CHECKPOINT_FILE = ''
+        sorter.TIMING_PROFILE_FILE = ''; sorter.CALIBRATION_PROFILE_AUTO_SELECT = False
+        if args.max_repairs is not None: sorter.EXECUTOR_MAX_REPAIRS = args.max_repairs
+        if args.max_stack: sorter.CONSOLIDATE_ENABLED, sorter.CONSOLIDATE_MAX_STACK = True, args.max_stack
+        if not sorter.is_any_ocr_available(): print("Note: no OCR engine available, every stack is simulated as a count of 1.")
+        results = run_benchmark(args)
+    print_results(results)
+    if args.json:
+        with open(args.json, 'w') as f: json.dump(results, f, indent=1)
+
+if __name__ == "__main__":
+    main()
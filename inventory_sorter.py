@@ -1,53 +1,92 @@
-import pyautogui
-import keyboard
 import time
-from PIL import Image, ImageGrab, ImageOps, ImageDraw # ImageEnhance removed
+STARTUP_T0 = time.perf_counter() # For the startup timing breakdown
+from PIL import Image, ImageOps, ImageDraw # ImageEnhance removed; ImageGrab is imported by the imagegrab capture backend
 import numpy as np
-import pygetwindow as gw
 from datetime import datetime
 import configparser
 import os
-
-# --- Tesseract Configuration (Module Level Import) ---
-try:
-    import pytesseract
-except ImportError:
-    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}] WARNING: Pytesseract library not found. OCR will be disabled.")
-    pytesseract = None
-except Exception as e:
-    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}] WARNING: Error during initial pytesseract import: {e}. OCR will be disabled.")
-    pytesseract = None
+import bisect
+import hashlib
+import math
+import json
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future
+from multiprocessing import shared_memory, resource_tracker
+import argparse
+import sys
+import threading
+import queue
+import platform
+import cProfile
+import pstats
+import io
+from contextlib import contextmanager
+import importlib
+
+# --- Optional platform / OCR modules ---
+# Imported on first use behind LazyModule facades, so importing this file (scan, plan, batch, benchmark) needs none
+# of them and startup doesn't wait for them. available() tries the import once and logs why it failed.
+class LazyModule:
+    def __init__(self, module_name, missing_note):
+        self._module_name = module_name; self._missing_note = missing_note; self._module = None; self._failed = False
+    def available(self):
+        if self._module is None and not self._failed:
+            try: self._module = importlib.import_module(self._module_name)
+            except Exception as e: self._failed = True; log_message(f"WARNING: {self._module_name} unavailable ({e}). {self._missing_note}")
+        return self._module is not None
+    def __getattr__(self, attr): # Only called for attributes not set on the facade itself (tests may set fakes there)
+        if not self.available(): raise RuntimeError(f"{self._module_name} is not installed")
+        return getattr(self._module, attr)
+
+pyautogui = LazyModule('pyautogui', "Mouse control disabled.")
+keyboard = LazyModule('keyboard', "Hotkeys disabled.")
+gw = LazyModule('pygetwindow', "Game window lookup disabled.")
+pytesseract = LazyModule('pytesseract', "OCR will be disabled.")
+mss = LazyModule('mss', "CaptureBackend mss falls back to imagegrab.") # Optional faster screen capture ([Scan] CaptureBackend = mss)
 
 # --- CONFIGURATION LOADING ---
 CONFIG_FILE = 'config.ini'
 config = configparser.ConfigParser() # Global config object
-interrupt_processing_flag = False
 
 DEFAULT_CONFIG = { # All keys here should be lowercase
     'general': {'gamewindowtitle': 'Bellwright', 'tesseractcmdpath': r'C:\Program Files\Tesseract-OCR\tesseract.exe'},
     'hotkeys': {
-        'calculateandplan': 'num_1', 'executesort': 'num_2',
+        'calculateandplan': 'num_1', 'executesort': 'num_2', 'scanandexecute': 'ctrl+num_1',
         'startfulluicalibration': 'num_4',
         'setgridorigin': 'num_3', 'calibrateslotdimensions': 'num_5', 'calibrateslotxgap': 'num_6',
         'calibrateslotygap': 'num_plus', 'calibratetiercolorpoint': 'num_7', 'calibrateocrregion': 'num_8',
         'savecalibratedvalues': 'num_9', 'exitscript': 'num_0',
-        'interruptprocess': 'delete',
+        'interruptprocess': 'delete', 'resumesort': 'num_decimal', 'profilenextaction': 'num_multiply', 'autocalibrategrid': 'num_subtract',
     },
     'gridstructure': {
         'gridoffsetx': '310', 'gridoffsety': '170', 'numcols': '6', 'maxnumrows': '10',
         'slotwidth': '83', 'slotheight': '83', 'slotgapx': '10', 'slotgapy': '10',
     },
-    'colorpatch': {'relativex': '15', 'relativey': '68', 'size': '10', 'tolerance': '30'},
+    'colorpatch': {'relativex': '15', 'relativey': '68', 'size': '10', 'tolerance': '30',
+                   'classifierfile': 'tier_classifier.npz', 'samplefile': 'tier_color_samples.json', 'maxdistance': '4.0'},
     'tiercolors': {'tier1': '47,67,81', 'tier2': '81,89,42', 'tier3': '95,64,40',
                    'tier4': '102,41,35', 'tier5': '61,50,85'},
     'ocr': {'relativex': '8', 'relativey': '8', 'width': '30', 'height': '25',
-            'upscalefactor': '2', 'thresholdvalue': '180'},
-    'mousemovement': {'moveduration': '0.20', 'dragduration': '0.30', 'postactiondelay': '0.30'}
+            'upscalefactor': '2', 'thresholdvalue': '180', 'batchocr': 'true',
+            'engine': 'tesseract', 'templatefile': 'digit_templates.npz', 'templateminconfidence': '0.85',
+            'cachesize': '2048', 'diskcachefile': 'ocr_cache.json', 'diskcachemaxentries': '20000', 'poolworkers': 'auto'}, # PoolWorkers: per-slot reads only (BatchOCR = false)
+    'mousemovement': {'moveduration': '0.20', 'dragduration': '0.30', 'postactiondelay': '0.30'},
+    'scan': {'incrementalrescan': 'true', 'capturebackend': 'imagegrab', 'capturefile': ''},
+    'debug': {'level': 'summary', 'writefiles': 'true', 'queuesize': '64', 'ringbufferscans': '0'},
+    'timing': {'adaptive': 'true', 'profilefile': 'timing_profile.json', 'pollinterval': '0.01', 'waittimeout': '0.6',
+               'minmoveduration': '0.02', 'mindragduration': '0.04', 'streaktospeedup': '8'},
+    'perf': {'enabled': 'true', 'writetrace': 'false', 'tracefolder': 'perf_traces'},
+    'executor': {'verifymoves': 'true', 'verifyretrydelay': '0.15', 'maxrepairs': '5', 'checkpointfile': 'sort_checkpoint.json'},
+    'paging': {'enabled': 'false', 'scrollclicksperpage': '-5', 'scrolltotopclicks': '100', 'maxpages': '10',
+               'scrollsettledelay': '0.35'},
+    'profiles': {'profilefile': 'calibration_profiles.json', 'autoselect': 'true'},
+    'containers': {'enabled': 'false', 'names': ''},
+    'consolidate': {'enabled': 'false', 'maxstacksize': '100'}
 }
 
 # --- Global config variables ---
 GAME_WINDOW_TITLE, TESSERACT_CMD_PATH = '', ''
-INTERRUPT_PROCESS_HOTKEY = ''
+INTERRUPT_PROCESS_HOTKEY, RESUME_SORT_HOTKEY, SCAN_AND_EXECUTE_HOTKEY = '', '', ''
 CALCULATE_HOTKEY, EXECUTE_SORT_HOTKEY, FULL_UI_CALIBRATION_HOTKEY, SAVE_CONFIG_HOTKEY, EXIT_SCRIPT_HOTKEY = '', '', '', '', ''
 # Individual calibration hotkeys
 SET_GRID_ORIGIN_IND_HOTKEY, CALIBRATE_SLOT_DIM_IND_HOTKEY, CALIBRATE_SLOT_X_GAP_IND_HOTKEY = '', '', ''
@@ -57,23 +96,77 @@ GRID_OFFSET_X, GRID_OFFSET_Y, NUM_COLS, MAX_NUM_ROWS = 0, 0, 0, 0
 SLOT_WIDTH, SLOT_HEIGHT, SLOT_GAP_X, SLOT_GAP_Y = 0, 0, 0, 0
 COLOR_PATCH_RELATIVE_X, COLOR_PATCH_RELATIVE_Y, COLOR_PATCH_SIZE, COLOR_TOLERANCE = 0, 0, 0, 0
 TIER_COLORS = {}
+COLOR_CLASSIFIER_FILE, COLOR_SAMPLE_FILE, COLOR_MAX_DISTANCE = '', '', 0.0
 OCR_RELATIVE_X, OCR_RELATIVE_Y, OCR_WIDTH, OCR_HEIGHT = 0, 0, 0, 0
 OCR_UPSCALE_FACTOR, OCR_THRESHOLD_VALUE = 0, 0
+OCR_BATCH_MODE = True
+OCR_ENGINE, OCR_TEMPLATE_FILE, OCR_TEMPLATE_MIN_CONFIDENCE = 'tesseract', '', 0.0
+OCR_CACHE_SIZE, OCR_DISK_CACHE_FILE, OCR_DISK_CACHE_MAX_ENTRIES = 0, '', 0
+OCR_POOL_WORKERS = 0
 MOUSE_MOVE_DURATION, DRAG_DURATION, POST_ACTION_DELAY = 0.0, 0.0, 0.0
-
+PAGED_SCAN_ENABLED, PAGE_SCROLL_CLICKS, PAGE_SCROLL_TOP_CLICKS, PAGE_MAX_PAGES, PAGE_SCROLL_SETTLE_DELAY = False, 0, 0, 0, 0.0
+INCREMENTAL_RESCAN = True
+CAPTURE_BACKEND, CAPTURE_FILE = 'imagegrab', ''
+DEBUG_LEVEL, DEBUG_WRITE_FILES, DEBUG_QUEUE_SIZE, DEBUG_RING_BUFFER_SCANS = 'summary', True, 0, 0
+EXECUTOR_VERIFY_MOVES, EXECUTOR_VERIFY_RETRY_DELAY, EXECUTOR_MAX_REPAIRS = True, 0.0, 0
+EXECUTOR_CHECKPOINT_FILE = ''
+TIMING_ADAPTIVE, TIMING_PROFILE_FILE, TIMING_POLL_INTERVAL, TIMING_WAIT_TIMEOUT = True, '', 0.0, 0.0
+TIMING_MIN_MOVE_DURATION, TIMING_MIN_DRAG_DURATION, TIMING_STREAK_TO_SPEEDUP = 0.0, 0.0, 0
+PERF_ENABLED, PERF_WRITE_TRACE, PERF_TRACE_FOLDER = True, False, ''
+CALIBRATION_PROFILE_FILE, CALIBRATION_PROFILE_AUTO_SELECT = '', True
+CONTAINERS_ENABLED = False
+CONSOLIDATE_ENABLED, CONSOLIDATE_MAX_STACK = False, 0
+CONTAINERS = [] # One dict per [Container <name>] section listed in [Containers] Names (see load_container_settings)
+
+LOG_QUIET = False # Batch mode: only errors and warnings
 def log_message(message):
+    if LOG_QUIET and not message.startswith(("ERR", "WARN", "Config ERROR", "Config CRITICAL")): return
     print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}] {message}")
 
+def parse_bool_str(val_str): # 'true'/'yes'/'on'/'1' -> True, 'false'/'no'/'off'/'0' -> False
+    val = val_str.strip().lower()
+    if val in ('1', 'true', 'yes', 'on'): return True
+    if val in ('0', 'false', 'no', 'off'): return False
+    raise ValueError(f"not a boolean: '{val_str}'")
+
+def get_cfg_val(section_name, option_name, type_func=str, is_int=False, is_float=False, is_bool=False):
+    # Section and option names for DEFAULT_CONFIG are all lowercase
+    default_section_name = section_name.lower()
+    default_option_name = option_name.lower()
+    try:
+        # Read from config file (case-insensitive for configparser)
+        # Fallback directly to DEFAULT_CONFIG value if not found in file
+        val_str = config.get(section_name, option_name, 
+                             fallback=DEFAULT_CONFIG[default_section_name][default_option_name])
+        if is_int: return int(val_str)
+        if is_float: return float(val_str)
+        if is_bool: return parse_bool_str(val_str)
+        return type_func(val_str)
+    except (ValueError) as e:
+        log_message(f"Config ERROR: Invalid value for '{option_name}' in '[{section_name}]': '{config.get(section_name,option_name, fallback='ERROR_NO_FALLBACK')}' (Error: {e}). Using hardcoded default.")
+        val_str = DEFAULT_CONFIG[default_section_name][default_option_name] # Get default again
+        if is_int: return int(val_str)
+        if is_float: return float(val_str)
+        if is_bool: return parse_bool_str(val_str)
+        return type_func(val_str)
+    except Exception as e:
+        log_message(f"Config CRITICAL ERROR for '{option_name}' in '[{section_name}]' (Error: {e}).")
+        if is_int: return 0
+        if is_float: return 0.0
+        if is_bool: return False
+        return ""
+
 def load_config():
-    global GAME_WINDOW_TITLE, TESSERACT_CMD_PATH, CALCULATE_HOTKEY, EXECUTE_SORT_HOTKEY, \
+    global GAME_WINDOW_TITLE, TESSERACT_CMD_PATH, CALCULATE_HOTKEY, EXECUTE_SORT_HOTKEY, RESUME_SORT_HOTKEY, SCAN_AND_EXECUTE_HOTKEY, \
            FULL_UI_CALIBRATION_HOTKEY, SAVE_CONFIG_HOTKEY, EXIT_SCRIPT_HOTKEY, \
            SET_GRID_ORIGIN_IND_HOTKEY, CALIBRATE_SLOT_DIM_IND_HOTKEY, CALIBRATE_SLOT_X_GAP_IND_HOTKEY, \
            CALIBRATE_SLOT_Y_GAP_IND_HOTKEY, CALIBRATE_TIER_COLOR_IND_HOTKEY, CALIBRATE_OCR_REGION_IND_HOTKEY, \
-           GRID_OFFSET_X, GRID_OFFSET_Y, NUM_COLS, MAX_NUM_ROWS, SLOT_WIDTH, SLOT_HEIGHT, \
-           SLOT_GAP_X, SLOT_GAP_Y, COLOR_PATCH_RELATIVE_X, COLOR_PATCH_RELATIVE_Y, \
-           COLOR_PATCH_SIZE, COLOR_TOLERANCE, TIER_COLORS, OCR_RELATIVE_X, OCR_RELATIVE_Y, \
-           OCR_WIDTH, OCR_HEIGHT, OCR_UPSCALE_FACTOR, OCR_THRESHOLD_VALUE, \
-           MOUSE_MOVE_DURATION, DRAG_DURATION, POST_ACTION_DELAY
+           PAGED_SCAN_ENABLED, PAGE_SCROLL_CLICKS, PAGE_SCROLL_TOP_CLICKS, PAGE_MAX_PAGES, PAGE_SCROLL_SETTLE_DELAY, \
+           INCREMENTAL_RESCAN, CAPTURE_BACKEND, CAPTURE_FILE, \
+           DEBUG_LEVEL, DEBUG_WRITE_FILES, DEBUG_QUEUE_SIZE, DEBUG_RING_BUFFER_SCANS, \
+           EXECUTOR_VERIFY_MOVES, EXECUTOR_VERIFY_RETRY_DELAY, EXECUTOR_MAX_REPAIRS, EXECUTOR_CHECKPOINT_FILE, \
+           PERF_ENABLED, PERF_WRITE_TRACE, PERF_TRACE_FOLDER, CALIBRATION_PROFILE_FILE, CALIBRATION_PROFILE_AUTO_SELECT, \
+           CONTAINERS_ENABLED, CONSOLIDATE_ENABLED, CONSOLIDATE_MAX_STACK
 
     if not os.path.exists(CONFIG_FILE):
         log_message(f"WARNING: {CONFIG_FILE} not found. Writing default config.")
@@ -83,34 +176,11 @@ def load_config():
     
     config.read(CONFIG_FILE) # configparser reads sections/options case-insensitively
 
-    def get_cfg_val(section_name, option_name, type_func=str, is_int=False, is_float=False):
-        # Section and option names for DEFAULT_CONFIG are all lowercase
-        default_section_name = section_name.lower()
-        default_option_name = option_name.lower()
-        try:
-            # Read from config file (case-insensitive for configparser)
-            # Fallback directly to DEFAULT_CONFIG value if not found in file
-            val_str = config.get(section_name, option_name, 
-                                 fallback=DEFAULT_CONFIG[default_section_name][default_option_name])
-            if is_int: return int(val_str)
-            if is_float: return float(val_str)
-            return type_func(val_str)
-        except (ValueError) as e:
-            log_message(f"Config ERROR: Invalid value for '{option_name}' in '[{section_name}]': '{config.get(section_name,option_name, fallback='ERROR_NO_FALLBACK')}' (Error: {e}). Using hardcoded default.")
-            val_str = DEFAULT_CONFIG[default_section_name][default_option_name] # Get default again
-            if is_int: return int(val_str)
-            if is_float: return float(val_str)
-            return type_func(val_str)
-        except Exception as e:
-            log_message(f"Config CRITICAL ERROR for '{option_name}' in '[{section_name}]' (Error: {e}).")
-            if is_int: return 0
-            if is_float: return 0.0
-            return ""
-
     GAME_WINDOW_TITLE = get_cfg_val('General', 'GameWindowTitle')
     TESSERACT_CMD_PATH = get_cfg_val('General', 'TesseractCmdPath')
     CALCULATE_HOTKEY = get_cfg_val('Hotkeys', 'CalculateAndPlan') # Keys from INI can be mixed case
-    EXECUTE_SORT_HOTKEY = get_cfg_val('Hotkeys', 'ExecuteSort')
+    EXECUTE_SORT_HOTKEY = get_cfg_val('Hotkeys', 'ExecuteSort'); RESUME_SORT_HOTKEY = get_cfg_val('Hotkeys', 'ResumeSort')
+    SCAN_AND_EXECUTE_HOTKEY = get_cfg_val('Hotkeys', 'ScanAndExecute')
     FULL_UI_CALIBRATION_HOTKEY = get_cfg_val('Hotkeys', 'StartFullUICalibration')
     SAVE_CONFIG_HOTKEY = get_cfg_val('Hotkeys', 'SaveCalibratedValues')
     EXIT_SCRIPT_HOTKEY = get_cfg_val('Hotkeys', 'ExitScript')
@@ -121,6 +191,45 @@ def load_config():
     CALIBRATE_TIER_COLOR_IND_HOTKEY = get_cfg_val('Hotkeys', 'CalibrateTierColorPoint')
     CALIBRATE_OCR_REGION_IND_HOTKEY = get_cfg_val('Hotkeys', 'CalibrateOCRRegion')
 
+    load_calibration_settings() # Sections a calibration profile can switch
+    INCREMENTAL_RESCAN = get_cfg_val('Scan', 'IncrementalRescan', is_bool=True)
+    CAPTURE_BACKEND = get_cfg_val('Scan', 'CaptureBackend').strip().lower()
+    if CAPTURE_BACKEND not in ('imagegrab', 'mss', 'file'): log_message(f"Config ERROR: Unknown CaptureBackend '{CAPTURE_BACKEND}'. Using imagegrab."); CAPTURE_BACKEND = 'imagegrab'
+    CAPTURE_FILE = get_cfg_val('Scan', 'CaptureFile').strip()
+    DEBUG_LEVEL = get_cfg_val('Debug', 'Level').strip().lower()
+    if DEBUG_LEVEL not in DEBUG_LEVELS: log_message(f"Config ERROR: Unknown Debug Level '{DEBUG_LEVEL}'. Using summary."); DEBUG_LEVEL = 'summary'
+    DEBUG_WRITE_FILES = get_cfg_val('Debug', 'WriteFiles', is_bool=True)
+    DEBUG_QUEUE_SIZE = max(1, get_cfg_val('Debug', 'QueueSize', is_int=True))
+    DEBUG_RING_BUFFER_SCANS = max(0, get_cfg_val('Debug', 'RingBufferScans', is_int=True))
+    if debug_state['ring'].maxlen != DEBUG_RING_BUFFER_SCANS: debug_state['ring'] = deque(debug_state['ring'], maxlen=DEBUG_RING_BUFFER_SCANS)
+    PERF_ENABLED = get_cfg_val('Perf', 'Enabled', is_bool=True)
+    PERF_WRITE_TRACE = get_cfg_val('Perf', 'WriteTrace', is_bool=True)
+    PERF_TRACE_FOLDER = get_cfg_val('Perf', 'TraceFolder').strip()
+    EXECUTOR_VERIFY_MOVES = get_cfg_val('Executor', 'VerifyMoves', is_bool=True)
+    EXECUTOR_VERIFY_RETRY_DELAY = get_cfg_val('Executor', 'VerifyRetryDelay', is_float=True)
+    EXECUTOR_MAX_REPAIRS = max(0, get_cfg_val('Executor', 'MaxRepairs', is_int=True))
+    EXECUTOR_CHECKPOINT_FILE = get_cfg_val('Executor', 'CheckpointFile')
+    PAGED_SCAN_ENABLED = get_cfg_val('Paging', 'Enabled', is_bool=True)
+    PAGE_SCROLL_CLICKS = get_cfg_val('Paging', 'ScrollClicksPerPage', is_int=True)
+    PAGE_SCROLL_TOP_CLICKS = get_cfg_val('Paging', 'ScrollToTopClicks', is_int=True)
+    PAGE_MAX_PAGES = max(1, get_cfg_val('Paging', 'MaxPages', is_int=True))
+    PAGE_SCROLL_SETTLE_DELAY = get_cfg_val('Paging', 'ScrollSettleDelay', is_float=True)
+    CALIBRATION_PROFILE_FILE = get_cfg_val('Profiles', 'ProfileFile').strip()
+    CALIBRATION_PROFILE_AUTO_SELECT = get_cfg_val('Profiles', 'AutoSelect', is_bool=True)
+    CONTAINERS_ENABLED = get_cfg_val('Containers', 'Enabled', is_bool=True); load_container_settings()
+    CONSOLIDATE_ENABLED = get_cfg_val('Consolidate', 'Enabled', is_bool=True)
+    CONSOLIDATE_MAX_STACK = max(1, get_cfg_val('Consolidate', 'MaxStackSize', is_int=True))
+
+def load_calibration_settings(): # [GridStructure], [ColorPatch], [TierColors], [OCR], [MouseMovement] and [Timing] from config
+    global GRID_OFFSET_X, GRID_OFFSET_Y, NUM_COLS, MAX_NUM_ROWS, SLOT_WIDTH, SLOT_HEIGHT, \
+           SLOT_GAP_X, SLOT_GAP_Y, COLOR_PATCH_RELATIVE_X, COLOR_PATCH_RELATIVE_Y, \
+           COLOR_PATCH_SIZE, COLOR_TOLERANCE, TIER_COLORS, COLOR_CLASSIFIER_FILE, COLOR_SAMPLE_FILE, COLOR_MAX_DISTANCE, OCR_RELATIVE_X, OCR_RELATIVE_Y, \
+           OCR_WIDTH, OCR_HEIGHT, OCR_UPSCALE_FACTOR, OCR_THRESHOLD_VALUE, OCR_BATCH_MODE, \
+           OCR_ENGINE, OCR_TEMPLATE_FILE, OCR_TEMPLATE_MIN_CONFIDENCE, \
+           OCR_CACHE_SIZE, OCR_DISK_CACHE_FILE, OCR_DISK_CACHE_MAX_ENTRIES, OCR_POOL_WORKERS, \
+           MOUSE_MOVE_DURATION, DRAG_DURATION, POST_ACTION_DELAY, \
+           TIMING_ADAPTIVE, TIMING_PROFILE_FILE, TIMING_POLL_INTERVAL, TIMING_WAIT_TIMEOUT, \
+           TIMING_MIN_MOVE_DURATION, TIMING_MIN_DRAG_DURATION, TIMING_STREAK_TO_SPEEDUP
     GRID_OFFSET_X = get_cfg_val('GridStructure', 'GridOffsetX', is_int=True)
     GRID_OFFSET_Y = get_cfg_val('GridStructure', 'GridOffsetY', is_int=True)
     NUM_COLS = get_cfg_val('GridStructure', 'NumCols', is_int=True); MAX_NUM_ROWS = get_cfg_val('GridStructure', 'MaxNumRows', is_int=True)
@@ -129,6 +238,8 @@ def load_config():
     COLOR_PATCH_RELATIVE_X = get_cfg_val('ColorPatch', 'RelativeX', is_int=True)
     COLOR_PATCH_RELATIVE_Y = get_cfg_val('ColorPatch', 'RelativeY', is_int=True)
     COLOR_PATCH_SIZE = get_cfg_val('ColorPatch', 'Size', is_int=True); COLOR_TOLERANCE = get_cfg_val('ColorPatch', 'Tolerance', is_int=True)
+    COLOR_CLASSIFIER_FILE = get_cfg_val('ColorPatch', 'ClassifierFile'); COLOR_SAMPLE_FILE = get_cfg_val('ColorPatch', 'SampleFile')
+    COLOR_MAX_DISTANCE = get_cfg_val('ColorPatch', 'MaxDistance', is_float=True)
     TIER_COLORS = {}
     for i in range(1, 6):
         key_in_ini = f'Tier{i}'; key_in_default = f'tier{i}' # default keys are lowercase
@@ -138,14 +249,34 @@ def load_config():
     OCR_RELATIVE_X = get_cfg_val('OCR', 'RelativeX', is_int=True); OCR_RELATIVE_Y = get_cfg_val('OCR', 'RelativeY', is_int=True)
     OCR_WIDTH = get_cfg_val('OCR', 'Width', is_int=True); OCR_HEIGHT = get_cfg_val('OCR', 'Height', is_int=True)
     OCR_UPSCALE_FACTOR = get_cfg_val('OCR', 'UpscaleFactor', is_int=True); OCR_THRESHOLD_VALUE = get_cfg_val('OCR', 'ThresholdValue', is_int=True)
+    OCR_BATCH_MODE = get_cfg_val('OCR', 'BatchOCR', is_bool=True)
+    OCR_ENGINE = get_cfg_val('OCR', 'Engine').strip().lower()
+    if OCR_ENGINE not in ('tesseract', 'template'): log_message(f"Config ERROR: Unknown OCR Engine '{OCR_ENGINE}'. Using tesseract."); OCR_ENGINE = 'tesseract'
+    OCR_TEMPLATE_FILE = get_cfg_val('OCR', 'TemplateFile')
+    OCR_TEMPLATE_MIN_CONFIDENCE = get_cfg_val('OCR', 'TemplateMinConfidence', is_float=True)
+    OCR_CACHE_SIZE = get_cfg_val('OCR', 'CacheSize', is_int=True)
+    pool_workers_str = get_cfg_val('OCR', 'PoolWorkers').strip().lower()
+    if pool_workers_str == 'auto': OCR_POOL_WORKERS = os.cpu_count() or 1
+    elif pool_workers_str.isdigit(): OCR_POOL_WORKERS = int(pool_workers_str)
+    else: log_message(f"Config ERROR: Invalid PoolWorkers '{pool_workers_str}' (auto, 0 = off, or a number). Using auto."); OCR_POOL_WORKERS = os.cpu_count() or 1
+    OCR_DISK_CACHE_FILE = get_cfg_val('OCR', 'DiskCacheFile').strip()
+    OCR_DISK_CACHE_MAX_ENTRIES = get_cfg_val('OCR', 'DiskCacheMaxEntries', is_int=True)
     MOUSE_MOVE_DURATION = get_cfg_val('MouseMovement', 'MoveDuration', is_float=True)
     DRAG_DURATION = get_cfg_val('MouseMovement', 'DragDuration', is_float=True)
     POST_ACTION_DELAY = get_cfg_val('MouseMovement', 'PostActionDelay', is_float=True)
+    TIMING_ADAPTIVE = get_cfg_val('Timing', 'Adaptive', is_bool=True)
+    TIMING_PROFILE_FILE = get_cfg_val('Timing', 'ProfileFile').strip()
+    TIMING_POLL_INTERVAL = max(0.0, get_cfg_val('Timing', 'PollInterval', is_float=True))
+    TIMING_WAIT_TIMEOUT = get_cfg_val('Timing', 'WaitTimeout', is_float=True)
+    TIMING_MIN_MOVE_DURATION = get_cfg_val('Timing', 'MinMoveDuration', is_float=True)
+    TIMING_MIN_DRAG_DURATION = get_cfg_val('Timing', 'MinDragDuration', is_float=True)
+    TIMING_STREAK_TO_SPEEDUP = max(1, get_cfg_val('Timing', 'StreakToSpeedUp', is_int=True))
 
 pytesseract_available = False
-def initialize_tesseract(): # Unchanged from previous working version
+tesseract_state = {'ready': threading.Event(), 'thread': None}; tesseract_state['ready'].set() # Cleared while warming up
+def initialize_tesseract(): # Detects the binary via the lazy pytesseract import; run by warm_up_tesseract (tesseract_state) or inline by tools and workers
     global pytesseract_available, TESSERACT_CMD_PATH, pytesseract
-    if pytesseract is None: log_message("Pytesseract module not imported. OCR disabled."); pytesseract_available=False; return
+    if not pytesseract.available(): log_message("Pytesseract module not imported. OCR disabled."); pytesseract_available=False; return
     try:
         if TESSERACT_CMD_PATH and os.path.exists(TESSERACT_CMD_PATH): pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD_PATH
         version = pytesseract.get_tesseract_version()
@@ -153,6 +284,25 @@ def initialize_tesseract(): # Unchanged from previous working version
         pytesseract_available = True
     except Exception as e: log_message(f"WARN: Init Tesseract (Path:'{TESSERACT_CMD_PATH}'): {e}"); pytesseract_available=False
 
+def warm_up_tesseract(): # Background: detection, then one throwaway read so the first scan doesn't pay the cold start
+    start = time.perf_counter()
+    try:
+        initialize_tesseract(); detect_s = time.perf_counter() - start
+        if pytesseract_available:
+            sample = Image.new('L', (60, 40), 255); ImageDraw.Draw(sample).text((10, 10), "12", fill=0)
+            pytesseract.image_to_string(sample, config=OCR_TESSERACT_CONFIG)
+            log_message(f"Tesseract ready in background: detect {detect_s*1000:.0f}ms, warm-up read {(time.perf_counter() - start - detect_s)*1000:.0f}ms.")
+    except Exception as e: log_message(f"WARN: Tesseract warm-up failed: {e}")
+    finally: tesseract_state['ready'].set()
+    if not OCR_BATCH_MODE and OCR_POOL_WORKERS > 0 and is_any_ocr_available(): # Per-slot OCR will use the worker pool
+        try: warm_up_ocr_pool()
+        except Exception as e: log_message(f"WARN: OCR pool unavailable ({e}). Reading counts one by one."); ocr_pool_state['broken'] = True
+
+def start_tesseract_warm_up(): # OCR users wait on tesseract_state['ready'] (see is_ocr_engine_available)
+    tesseract_state['ready'].clear()
+    tesseract_state['thread'] = threading.Thread(target=warm_up_tesseract, name="tesseract-warm-up", daemon=True)
+    tesseract_state['thread'].start()
+
 is_processing = False; 
 last_calculated_plan = None; 
 script_running = True
@@ -162,13 +312,219 @@ individual_calibration_tool_state = {} # For individual calibration tools
 def ensure_debug_folder(): # Unchanged
     if not os.path.exists(DEBUG_IMAGE_FOLDER): os.makedirs(DEBUG_IMAGE_FOLDER); log_message(f"Created: {DEBUG_IMAGE_FOLDER}")
 
+# --- TIMING INSTRUMENTATION ---
+# Spans (name, start, duration, thread) and counters for the current hotkey action. perf_action wraps a hotkey
+# callback: it logs a one-line summary at the end and can export the spans as a Chrome trace (chrome://tracing,
+# Perfetto). The 'profilenextaction' hotkey runs the next action under cProfile.
+perf_state = {'action': None, 'start': 0.0, 'spans': [], 'counters': {}, 'last': None, 'profile_next': False}
+
+@contextmanager
+def perf_span(name, **args): # with perf_span('capture'): ... records one span while an action is being measured
+    if not PERF_ENABLED or perf_state['action'] is None: yield; return
+    start = time.perf_counter()
+    try: yield
+    finally: perf_state['spans'].append((name, start, time.perf_counter() - start, threading.get_ident(), args))
+
+def perf_count(name, n=1):
+    if PERF_ENABLED and perf_state['action'] is not None: perf_state['counters'][name] = perf_state['counters'].get(name, 0) + n
+
+def get_perf_summary(record): # One line: total, time per span name (with call count when > 1), counters
+    totals = OrderedDict()
+    for name, _, dur, _, _ in record['spans']:
+        t, n = totals.get(name, (0.0, 0)); totals[name] = (t + dur, n + 1)
+    stages = ", ".join(f"{name} {t*1000:.0f}ms" + (f" x{n}" if n > 1 else "") for name, (t, n) in totals.items())
+    counters = ", ".join(f"{k} {v}" for k, v in sorted(record['counters'].items()))
+    return f"Perf [{record['action']}]: total {record['total']*1000:.0f}ms | {stages or 'no spans'}" + (f" | {counters}" if counters else "")
+
+def export_chrome_trace(record, path): # Trace-event JSON: one complete ('X') event per span, counters as metadata
+    events = [{'name': name, 'cat': name.split('.')[0], 'ph': 'X', 'pid': os.getpid(), 'tid': tid,
+               'ts': round((start - record['start']) * 1e6, 1), 'dur': round(dur * 1e6, 1), 'args': args}
+              for name, start, dur, tid, args in record['spans']]
+    events.insert(0, {'name': record['action'], 'cat': 'action', 'ph': 'X', 'pid': os.getpid(), 'tid': record['tid'],
+                      'ts': 0, 'dur': round(record['total'] * 1e6, 1), 'args': record['counters']})
+    with open(path, 'w') as f: json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+def export_last_trace(): # Console 'exporttrace': writes the last action's spans -> path or None
+    record = perf_state['last']
+    if record is None: log_message("No measured action yet."); return None
+    os.makedirs(PERF_TRACE_FOLDER or '.', exist_ok=True)
+    path = os.path.join(PERF_TRACE_FOLDER or '.', f"trace_{record['action']}_{record['started_at'].strftime('%Y%m%d_%H%M%S')}.json")
+    export_chrome_trace(record, path); log_message(f"Trace written to '{path}'."); return path
+
+def request_profile_next_action(): # Hotkey: the next measured action also runs under cProfile
+    perf_state['profile_next'] = not perf_state['profile_next']
+    log_message("cProfile armed for the next action." if perf_state['profile_next'] else "cProfile disarmed.")
+
+def perf_action(label, func): # Wraps a hotkey callback with span recording, summary, optional trace and cProfile
+    def run():
+        if not PERF_ENABLED or perf_state['action'] is not None: return func() # Off, or nested in a running action
+        perf_state.update(action=label, start=time.perf_counter(), spans=[], counters={})
+        started_at = datetime.now(); profiler = None
+        if perf_state['profile_next']: perf_state['profile_next'] = False; profiler = cProfile.Profile(); profiler.enable()
+        try: return func()
+        finally:
+            if profiler is not None: profiler.disable()
+            record = {'action': label, 'start': perf_state['start'], 'total': time.perf_counter() - perf_state['start'],
+                      'spans': perf_state['spans'], 'counters': perf_state['counters'], 'tid': threading.get_ident(), 'started_at': started_at}
+            perf_state.update(action=None, last=record)
+            log_message(get_perf_summary(record))
+            if PERF_WRITE_TRACE: export_last_trace()
+            if profiler is not None: save_profile(profiler, label, started_at)
+    return run
+
+def save_profile(profiler, label, started_at): # .prof file (snakeviz/pstats) plus the top entries in the log
+    os.makedirs(PERF_TRACE_FOLDER or '.', exist_ok=True)
+    path = os.path.join(PERF_TRACE_FOLDER or '.', f"profile_{label}_{started_at.strftime('%Y%m%d_%H%M%S')}.prof")
+    profiler.dump_stats(path); out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(15)
+    log_message(f"cProfile written to '{path}'. Top functions by cumulative time:\n{out.getvalue()}")
+
+# --- JOB SCHEDULER ---
+# Hotkeys only queue their action; one worker thread runs the jobs in order, so a long scan or sort never blocks the
+# keyboard hook and two actions never overlap. Every job carries a cancellation token (threading.Event): the interrupt
+# hotkey sets it for the running job and everything queued, and the scan, OCR and executor loops stop at their next check.
+# Calibration steps read the mouse when they run, so they are only taken while the worker is idle (only_if_idle).
+# An action that bails out with "Busy." (report_busy) ends as 'skipped', not 'done'.
+JOB_HISTORY_SIZE = 20
+job_state = {'queue': None, 'thread': None, 'current': None, 'history': deque(maxlen=JOB_HISTORY_SIZE), 'next_id': 1,
+             'live': {}, 'lock': threading.Lock()} # live: id -> job while queued or running (history only keeps the last few)
+
+def get_job_summary(job): # One line: state plus time spent queued and running
+    now = time.perf_counter(); started = job['started'] or job['finished'] or now
+    timings = f"waited {(started - job['queued'])*1000:.0f}ms"
+    if job['started'] is not None: timings += f", ran {((job['finished'] or now) - job['started'])*1000:.0f}ms"
+    return f"Job #{job['id']} '{job['label']}': {job['state']} ({timings})"
+
+def run_job(job): # Worker thread: runs one job unless it was cancelled while still queued
+    global is_processing
+    if job['token'].is_set(): job['state'] = 'cancelled'
+    else:
+        job.update(state='running', started=time.perf_counter()); job_state['current'] = job
+        try: job['func'](); job['state'] = 'cancelled' if job['token'].is_set() else 'skipped' if job['skipped'] else 'done'
+        except Exception as e:
+            job['state'] = 'failed'; is_processing = False # A crashed action must not leave the sorter "Busy"
+            log_message(f"ERR: Job #{job['id']} '{job['label']}' failed: {e}")
+        finally: job_state['current'] = None
+    with job_state['lock']: job_state['live'].pop(job['id'], None)
+    job['finished'] = time.perf_counter()
+    log_message(get_job_summary(job))
+
+def job_worker_loop(q):
+    while True:
+        job = q.get()
+        try: run_job(job)
+        finally: q.task_done()
+
+def get_job_queue(): # Worker started on first use
+    if job_state['thread'] is None or not job_state['thread'].is_alive():
+        job_state['queue'] = queue.Queue()
+        job_state['thread'] = threading.Thread(target=job_worker_loop, args=(job_state['queue'],), name="job-worker", daemon=True)
+        job_state['thread'].start()
+    return job_state['queue']
+
+def submit_job(label, func, only_if_idle=False): # Queues func for the worker -> job dict (None if not queued)
+    with job_state['lock']:
+        live = list(job_state['live'].values())
+        if only_if_idle and live: log_message(f"Busy with '{live[0]['label']}'. '{label}' ignored; press it again when that is done."); return None
+        if any(j['label'] == label and j['state'] == 'queued' for j in live):
+            log_message(f"'{label}' is already queued."); return None
+        job = {'id': job_state['next_id'], 'label': label, 'func': func, 'state': 'queued', 'token': threading.Event(),
+               'queued': time.perf_counter(), 'started': None, 'finished': None, 'skipped': False}
+        job_state['next_id'] += 1; job_state['history'].append(job); job_state['live'][job['id']] = job
+    running = job_state['current']
+    get_job_queue().put(job)
+    if running is not None: log_message(f"Job #{job['id']} '{label}' queued behind '{running['label']}'.")
+    return job
+
+def job_action(label, func, only_if_idle=False): return lambda: submit_job(label, func, only_if_idle) # Hotkey callback that queues func
+
+def report_busy(): # "Busy." bail-out; on the worker it also marks the running job 'skipped'
+    log_message("Busy.")
+    job = job_state['current']
+    if job is not None and threading.current_thread() is job_state['thread']: job['skipped'] = True
+
+def cancel_jobs(): # Cancels the running job and everything queued -> number of jobs cancelled
+    with job_state['lock']: jobs = list(job_state['live'].values())
+    for job in jobs: job['token'].set()
+    return len(jobs)
+
+def is_cancel_requested(): # Polled by long-running work (any thread) between steps
+    job = job_state['current']
+    return job is not None and job['token'].is_set()
+
+def list_jobs(): # Console 'jobs'
+    with job_state['lock']: jobs = list(job_state['history'])
+    if not jobs: log_message("No jobs yet."); return
+    for job in jobs: log_message(get_job_summary(job))
+
+# --- DEBUG ARTIFACTS ---
+# [Debug] Level: off = nothing, summary = capture + annotated layout per scan, slots = also every OCR crop and the montage.
+# Images are PNG-encoded by a background writer thread; the scan only queues them (and drops them if the queue is full).
+# With RingBufferScans > 0 the artifacts of the last N scans are also kept in memory for 'dumpdebug'.
+DEBUG_LEVELS = {'off': 0, 'summary': 1, 'slots': 2}
+debug_state = {'queue': None, 'thread': None, 'ring': deque(maxlen=0), 'current': None, 'dropped': 0}
+
+def is_debug_level(level): return DEBUG_LEVELS[DEBUG_LEVEL] >= DEBUG_LEVELS[level]
+
+def debug_writer_loop(q): # Writer thread: (path, image or RGB array) items -> PNG files
+    while True:
+        path, img = q.get()
+        try:
+            with perf_span('debug.write', file=os.path.basename(path)):
+                if isinstance(img, np.ndarray): img = Image.fromarray(img)
+                img.save(path)
+        except Exception as e: log_message(f"WARN: Debug image '{path}' not written: {e}")
+        finally: q.task_done()
+
+def get_debug_writer_queue(): # Started on first use
+    if debug_state['thread'] is None or not debug_state['thread'].is_alive():
+        debug_state['queue'] = queue.Queue(maxsize=DEBUG_QUEUE_SIZE)
+        debug_state['thread'] = threading.Thread(target=debug_writer_loop, args=(debug_state['queue'],), name="debug-writer", daemon=True)
+        debug_state['thread'].start()
+    return debug_state['queue']
+
+def begin_debug_scan(label): # New ring buffer entry; artifacts until the next call belong to it
+    if DEBUG_RING_BUFFER_SCANS <= 0 or not is_debug_level('summary'): debug_state['current'] = None; return
+    debug_state['current'] = {'label': label, 'time': datetime.now(), 'artifacts': [], 'notes': []}
+    debug_state['ring'].append(debug_state['current'])
+
+def debug_artifact(level, name, image): # image: PIL image, RGB array, or a callable making one (only called if level is on)
+    if not is_debug_level(level): return
+    if callable(image): image = image()
+    if debug_state['current'] is not None: debug_state['current']['artifacts'].append((name, image))
+    perf_count('debug_images')
+    if not DEBUG_WRITE_FILES: return
+    try: get_debug_writer_queue().put_nowait((os.path.join(DEBUG_IMAGE_FOLDER, name), image))
+    except queue.Full:
+        debug_state['dropped'] += 1
+        if debug_state['dropped'] == 1 or debug_state['dropped'] % 100 == 0: log_message(f"WARN: Debug writer busy, {debug_state['dropped']} image(s) skipped. Lower [Debug] Level or raise QueueSize.")
+
+def debug_note(text): # Text saved with the current ring buffer entry (plan, scan summary)
+    if debug_state['current'] is not None: debug_state['current']['notes'].append(text)
+
+def flush_debug_writer(): # Waits until every queued image is on disk
+    if debug_state['thread'] is not None and debug_state['thread'].is_alive(): debug_state['queue'].join()
+
+def dump_debug_ring_buffer(): # Writes the buffered scans to their own folder -> folder path or None
+    if not debug_state['ring']: log_message("Debug ring buffer is empty. Set [Debug] RingBufferScans > 0 and Level to summary or slots."); return None
+    flush_debug_writer()
+    dump_dir = os.path.join(DEBUG_IMAGE_FOLDER, f"dump_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    for n, entry in enumerate(list(debug_state['ring'])):
+        scan_dir = os.path.join(dump_dir, f"scan_{n}_{entry['label']}"); os.makedirs(scan_dir, exist_ok=True)
+        for name, img in entry['artifacts']:
+            try: (Image.fromarray(img) if isinstance(img, np.ndarray) else img).save(os.path.join(scan_dir, name))
+            except Exception as e: log_message(f"WARN: Dump of '{name}' failed: {e}")
+        with open(os.path.join(scan_dir, "notes.txt"), 'w') as f:
+            f.write(f"{entry['time'].strftime('%Y-%m-%d %H:%M:%S')}\n" + "\n".join(entry['notes']) + "\n")
+    log_message(f"Dumped {len(debug_state['ring'])} buffered scan(s) to '{dump_dir}'."); return dump_dir
+
 # --- UNIFIED & INDIVIDUAL UI CALIBRATION FUNCTIONS ---
 # (start_or_advance_full_ui_calibration, set_grid_origin_individually, calibrate_slot_dimensions_individually, etc. from previous message)
 # Ensure they use the correct global hotkey variables loaded from config for their log messages.
 # Example for one individual function:
 def set_grid_origin_individually():
     global GRID_OFFSET_X, GRID_OFFSET_Y, is_processing
-    if is_processing: log_message("Busy."); return
+    if is_processing: report_busy(); return
     is_processing = True
     log_message(f"INDIV. CALIB: GRID ORIGIN. Hover TOP-LEFT of FIRST slot. Press {SET_GRID_ORIGIN_IND_HOTKEY} again.") # Use loaded hotkey
     
@@ -184,11 +540,9 @@ def set_grid_origin_individually():
     log_message(f"SUCCESS: Indiv. Grid Origin: X={GRID_OFFSET_X}, Y={GRID_OFFSET_Y}. Press {SAVE_CONFIG_HOTKEY} to save.")
     del individual_calibration_tool_state[tool_name]; is_processing = False
 
-def request_interrupt_processing():
-    global interrupt_processing_flag, is_processing
-    if is_processing: # Only if something is actually running
-        log_message("!!! PROCESSING INTERRUPTED BY USER !!!")
-        interrupt_processing_flag = True
+def request_interrupt_processing(): # Cancels the running job and everything queued behind it
+    cancelled = cancel_jobs()
+    if cancelled: log_message(f"!!! PROCESSING INTERRUPTED BY USER !!! ({cancelled} job(s) cancelled)")
 
 def start_or_advance_full_ui_calibration():
     global full_ui_calibration_state, is_processing, GRID_OFFSET_X, GRID_OFFSET_Y, \
@@ -317,7 +671,7 @@ def start_or_advance_full_ui_calibration():
  
 def calibrate_slot_dimensions_individually():
     global SLOT_WIDTH, SLOT_HEIGHT, individual_calibration_tool_state, is_processing
-    if is_processing: log_message("Busy."); return
+    if is_processing: report_busy(); return
     is_processing = True
     
     tool_name = "IndividualSlotDimensions"
@@ -347,7 +701,7 @@ def calibrate_slot_dimensions_individually():
 def calibrate_slot_x_gap_individually():
     global SLOT_GAP_X, individual_calibration_tool_state, is_processing
     # ... (similar 2-step logic: click Top-Right of slot A, then Top-Left of slot B (to its right))
-    if is_processing: log_message("Busy."); return; is_processing=True
+    if is_processing: report_busy(); return; is_processing=True
     tool="IndXGap"; hotkey=config.get('Hotkeys','CalibrateSlotXGap')
     if tool not in individual_calibration_tool_state:
         log_message(f"INDIV. CALIB: X-GAP. S1: Hover TR of Slot A. Press {hotkey}.")
@@ -365,7 +719,7 @@ def calibrate_slot_x_gap_individually():
 def calibrate_slot_y_gap_individually():
     global SLOT_GAP_Y, individual_calibration_tool_state, is_processing
     # ... (similar 2-step logic: click Bottom-Left of slot A, then Top-Left of slot B (below it))
-    if is_processing: log_message("Busy."); return; is_processing=True
+    if is_processing: report_busy(); return; is_processing=True
     tool="IndYGap"; hotkey=config.get('Hotkeys','CalibrateSlotYGap')
     if tool not in individual_calibration_tool_state:
         log_message(f"INDIV. CALIB: Y-GAP. S1: Hover BL of Slot A. Press {hotkey}.")
@@ -383,7 +737,7 @@ def calibrate_slot_y_gap_individually():
 def calibrate_tier_color_point_individually(): # Calibrates COLOR_PATCH_RELATIVE_X/Y
     global COLOR_PATCH_RELATIVE_X, COLOR_PATCH_RELATIVE_Y, individual_calibration_tool_state, is_processing
     # ... (2-step: click Top-Left of a reference slot, then click center of color patch WITHIN that slot)
-    if is_processing: log_message("Busy."); return; is_processing=True
+    if is_processing: report_busy(); return; is_processing=True
     tool="IndColorPatch"; hotkey=config.get('Hotkeys','CalibrateTierColorPoint')
     if tool not in individual_calibration_tool_state:
         log_message(f"INDIV. CALIB: TIER COLOR POINT. S1: Hover TL of ANY slot (ref). Press {hotkey}.")
@@ -402,7 +756,7 @@ def calibrate_tier_color_point_individually(): # Calibrates COLOR_PATCH_RELATIVE
 def calibrate_ocr_region_individually(): # Calibrates OCR_RELATIVE_X/Y and OCR_WIDTH/HEIGHT
     global OCR_RELATIVE_X, OCR_RELATIVE_Y, OCR_WIDTH, OCR_HEIGHT, individual_calibration_tool_state, is_processing
     # ... (3-step: click Top-Left of ref slot, then TL of number in that slot, then BR of number in that slot)
-    if is_processing: log_message("Busy."); return; is_processing=True
+    if is_processing: report_busy(); return; is_processing=True
     tool="IndOCR"; hotkey=config.get('Hotkeys','CalibrateOCRRegion')
     if tool not in individual_calibration_tool_state:
         log_message(f"INDIV. CALIB: OCR REGION. S1: Hover TL of ANY slot (ref). Press {hotkey}.")
@@ -423,6 +777,153 @@ def calibrate_ocr_region_individually(): # Calibrates OCR_RELATIVE_X/Y and OCR_W
         else: log_message(f"  Stack# BR at ({mx},{my}). SUCCESS: OCR Rel.X={OCR_RELATIVE_X}, Rel.Y={OCR_RELATIVE_Y}, W={OCR_WIDTH}, H={OCR_HEIGHT}. Save with {SAVE_CONFIG_HOTKEY}.")
         del individual_calibration_tool_state[tool]; is_processing=False; return
 
+# --- AUTOMATIC GRID DETECTION ---
+# One screenshot of the game window -> grid geometry, from edge projections. Slot borders give two sharp edges per
+# slot pitch along each axis; the pitch comes from the autocorrelation of the edge profile, the two edge phases from
+# folding the profile onto one pitch (the longer of the two intervals is the slot, the shorter the gap), and the grid
+# extent from the longest run of pitches with strong edges. Colour patch and OCR box are then proposed from the
+# slot crops: the most saturated patch-sized spot, and the box around bright unsaturated (digit) pixels.
+AUTO_CALIBRATION_MIN_PITCH, AUTO_CALIBRATION_MAX_PITCH = 16, 400
+
+def find_edge_period(profile): # -> (pitch, periodicity 0..1) of a 1D edge-strength profile, or (None, 0.0)
+    n = len(profile); max_lag = min(AUTO_CALIBRATION_MAX_PITCH, n // 2)
+    if max_lag <= AUTO_CALIBRATION_MIN_PITCH: return None, 0.0
+    centered = profile - profile.mean()
+    spectrum = np.fft.rfft(centered, 2 * n); ac = np.fft.irfft(spectrum * np.conj(spectrum))[:n]
+    if ac[0] <= 0: return None, 0.0
+    ac = ac / ac[0]; lags = np.arange(AUTO_CALIBRATION_MIN_PITCH, max_lag)
+    best = ac[lags].max()
+    if best < 0.15: return None, 0.0 # Nothing repeats: no grid in this image
+    for lag in lags: # Smallest strong local maximum, so 2x/3x the pitch doesn't win on noise
+        if ac[lag] >= 0.85 * best and ac[lag] >= ac[lag - 1] and ac[lag] >= ac[lag + 1]: return int(lag), float(ac[lag])
+    return None, 0.0
+
+def detect_grid_axis(edges, flat): # Per-pixel profiles along one axis -> dict(start, size, gap, count, periodicity, contrast) or None
+    # edges: change ACROSS the axis (peaks at slot borders); flat: change ALONG it (near zero in the empty gaps).
+    pitch, periodicity = find_edge_period(edges)
+    if pitch is None: return None
+    phases = np.arange(len(flat)) % pitch
+    folded = np.bincount(phases, weights=flat, minlength=pitch) / np.bincount(phases, minlength=pitch)
+    is_gap = folded <= folded.min() + 0.25 * (np.median(folded) - folded.min())
+    if is_gap.all() or not is_gap.any(): return None
+    shift = int(np.flatnonzero(~is_gap)[0]) # Longest circular run of gap phases; the slot starts where it ends
+    best_len, best_end, run = 0, 0, 0
+    for k in range(1, pitch + 1):
+        if is_gap[(shift + k) % pitch]:
+            run += 1
+            if run > best_len: best_len, best_end = run, (shift + k) % pitch
+        else: run = 0
+    gap, phase = best_len, (best_end + 1) % pitch
+    size = pitch - gap
+    # edges[i] is the change between pixels i and i+1: a slot [x, x+size) has its borders at x-1 and x+size-1
+    starts = np.arange(phase if phase > 0 else pitch, len(edges) - size + 1, pitch)
+    if not len(starts): return None
+    edge_at = lambda i: edges[max(0, i - 1):i + 2].max()
+    strength = np.array([edge_at(x - 1) + edge_at(x + size - 1) for x in starts])
+    strong = strength >= 0.4 * np.percentile(strength, 90)
+    best_run, run_start = (0, 0), None
+    for k, is_strong in enumerate(list(strong) + [False]): # Longest run of consecutive strong pitches is the grid
+        if is_strong and run_start is None: run_start = k
+        elif not is_strong and run_start is not None:
+            if k - run_start > best_run[1] - best_run[0]: best_run = (run_start, k)
+            run_start = None
+    if best_run[1] - best_run[0] < 2: return None
+    slot_level = folded[~is_gap].mean()
+    contrast = float(slot_level / max(folded[is_gap].mean(), 0.01 * slot_level)) # Slot vs gap texture, capped at 100x
+    return {'start': int(starts[best_run[0]]), 'size': int(size), 'gap': int(gap), 'count': best_run[1] - best_run[0],
+            'periodicity': periodicity, 'contrast': contrast}
+
+def box_mean(values, size): # Mean over every size x size window -> array of shape (H-size+1, W-size+1)
+    integral = np.pad(values, ((1, 0), (1, 0))).cumsum(0).cumsum(1)
+    return (integral[size:, size:] - integral[:-size, size:] - integral[size:, :-size] + integral[:-size, :-size]) / (size * size)
+
+def propose_slot_regions(img_arr, grid): # Colour patch centre and OCR box relative to the slot, from all detected slots
+    x0, y0, w, h = grid['offset_x'], grid['offset_y'], grid['slot_width'], grid['slot_height']
+    crops = np.stack([img_arr[y0 + r * (h + grid['gap_y']):y0 + r * (h + grid['gap_y']) + h, x0 + c * (w + grid['gap_x']):x0 + c * (w + grid['gap_x']) + w]
+                      for r in range(grid['rows']) for c in range(grid['num_cols'])]).astype(np.int16)
+    saturation = crops.max(axis=3) - crops.min(axis=3); gray = crops.mean(axis=3)
+    proposal = {}
+    size = min(COLOR_PATCH_SIZE, w - 2, h - 2)
+    if size > 0: # Tier colour: the spot that is most saturated across the slots
+        patch_map = box_mean(saturation.mean(axis=0)[1:-1, 1:-1].astype(np.float64), size)
+        near_best = np.argwhere(patch_map >= 0.95 * patch_map.max()) # Middle of the best area, not its first pixel
+        py, px = near_best[np.argmin(np.abs(near_best - near_best.mean(axis=0)).sum(axis=1))]
+        proposal['patch_x'], proposal['patch_y'] = int(px + 1 + size // 2), int(py + 1 + size // 2)
+        proposal['patch_contrast'] = float(patch_map.max() / max(np.median(saturation), 1.0))
+    ink = ((gray > OCR_THRESHOLD_VALUE) & (saturation < 60)).mean(axis=0) # Digits: bright and grey in some slots
+    ink[[0, -1], :] = 0; ink[:, [0, -1]] = 0
+    proposal['ocr_slots'] = int(((gray > OCR_THRESHOLD_VALUE) & (saturation < 60)).any(axis=(1, 2)).sum())
+    if ink.max() > 0:
+        rows = np.flatnonzero(ink.max(axis=1) >= 0.15 * ink.max()); cols = np.flatnonzero(ink.max(axis=0) >= 0.15 * ink.max())
+        top, left = max(0, rows[0] - 2), max(0, cols[0] - 2)
+        proposal['ocr_box'] = (int(left), int(top), int(min(w, cols[-1] + 3) - left), int(min(h, rows[-1] + 3) - top))
+    return proposal
+
+def detect_grid_geometry(img_arr): # Screenshot of the game window (HxWx3) -> geometry dict with a confidence report, or None
+    gray = img_arr.astype(np.float32).mean(axis=2)
+    dx = np.abs(np.diff(gray, axis=1)); dy = np.abs(np.diff(gray, axis=0))
+    edge_min = max(6.0, 3.0 * float(np.median(dx[::4, ::4]))) # Above pixel noise; counts edges instead of summing noise
+    dx = (dx > edge_min).astype(np.float32); dy = (dy > edge_min).astype(np.float32)
+    cols = detect_grid_axis(dx.sum(axis=0), dy.sum(axis=0)[:-1])
+    if cols is None: return None
+    x_span = slice(cols['start'], cols['start'] + cols['count'] * (cols['size'] + cols['gap']))
+    rows = detect_grid_axis(dy[:, x_span].sum(axis=1), dx[:-1, x_span].sum(axis=1)) # Rows only from the grid's columns: less unrelated UI
+    if rows is None: return None
+    y_span = slice(rows['start'], rows['start'] + rows['count'] * (rows['size'] + rows['gap']))
+    cols = detect_grid_axis(dx[y_span].sum(axis=0), dy[y_span][:, :-1].sum(axis=0)) or cols # Columns again, now only from the grid's rows
+    grid = {'offset_x': cols['start'], 'offset_y': rows['start'], 'slot_width': cols['size'], 'slot_height': rows['size'],
+            'gap_x': cols['gap'], 'gap_y': rows['gap'], 'num_cols': cols['count'], 'rows': rows['count'], 'axes': {'x': cols, 'y': rows}}
+    grid.update(propose_slot_regions(img_arr, grid))
+    return grid
+
+def get_grid_detection_report(grid): # -> (lines, confident?) for the log
+    lines = [f"  Grid origin ({grid['offset_x']},{grid['offset_y']}), {grid['num_cols']} cols x {grid['rows']} visible rows, "
+             f"slot {grid['slot_width']}x{grid['slot_height']}, gap {grid['gap_x']}x{grid['gap_y']}"]
+    confident = True
+    for axis, name in (('x', 'Columns'), ('y', 'Rows')):
+        a = grid['axes'][axis]; ok = a['periodicity'] >= 0.3 and a['contrast'] >= 1.5
+        confident &= ok
+        lines.append(f"  {name}: periodicity {a['periodicity']:.2f}, edge contrast {a['contrast']:.1f}x{'' if ok else '  <- LOW'}")
+    if 'patch_x' in grid:
+        ok = grid['patch_contrast'] >= 2.0; confident &= ok
+        lines.append(f"  ColorPatch at ({grid['patch_x']},{grid['patch_y']}) in the slot, saturation {grid['patch_contrast']:.1f}x the slot median{'' if ok else '  <- LOW'}")
+    if 'ocr_box' in grid:
+        ox, oy, ow, oh = grid['ocr_box']
+        lines.append(f"  OCR box at ({ox},{oy}) size {ow}x{oh}, from digits seen in {grid['ocr_slots']} slot(s) (covers the widest count on screen)")
+    else: lines.append("  OCR box: no stack counts on screen, keeping the current OCR region  <- LOW"); confident = False
+    return lines, confident
+
+def apply_grid_geometry(grid): # Detected values -> the globals save_calibrated_values_to_config writes
+    global GRID_OFFSET_X, GRID_OFFSET_Y, SLOT_WIDTH, SLOT_HEIGHT, SLOT_GAP_X, SLOT_GAP_Y, NUM_COLS, \
+           COLOR_PATCH_RELATIVE_X, COLOR_PATCH_RELATIVE_Y, OCR_RELATIVE_X, OCR_RELATIVE_Y, OCR_WIDTH, OCR_HEIGHT
+    GRID_OFFSET_X, GRID_OFFSET_Y, NUM_COLS = grid['offset_x'], grid['offset_y'], grid['num_cols']
+    SLOT_WIDTH, SLOT_HEIGHT, SLOT_GAP_X, SLOT_GAP_Y = grid['slot_width'], grid['slot_height'], grid['gap_x'], grid['gap_y']
+    if 'patch_x' in grid: COLOR_PATCH_RELATIVE_X, COLOR_PATCH_RELATIVE_Y = grid['patch_x'], grid['patch_y']
+    if 'ocr_box' in grid: OCR_RELATIVE_X, OCR_RELATIVE_Y, OCR_WIDTH, OCR_HEIGHT = grid['ocr_box']
+    forget_last_scan() # Slot positions changed: nothing from the last scan can be reused
+
+def auto_calibrate_grid(image_path=None): # Hotkey: screenshot of the game window (or a saved one) -> calibrated geometry
+    global is_processing
+    if is_processing: report_busy(); return None
+    is_processing = True
+    try:
+        if image_path: img_arr = np.asarray(Image.open(image_path).convert('RGB'))
+        else:
+            game_rect = get_game_window_rect()
+            if not game_rect: return None
+            gx, gy, gw_, gh_ = game_rect; img_arr = capture_region((gx, gy, gx + gw_, gy + gh_))
+        start = time.perf_counter(); grid = detect_grid_geometry(img_arr); elapsed_ms = (time.perf_counter() - start) * 1000
+        if grid is None: log_message(f"ERR: Auto calibration found no slot grid ({elapsed_ms:.0f}ms). Open the inventory and try again, or calibrate manually."); return None
+        lines, confident = get_grid_detection_report(grid)
+        log_message(f"--- Auto Calibration ({elapsed_ms:.0f}ms) ---")
+        for line in lines: log_message(line)
+        apply_grid_geometry(grid)
+        if grid['rows'] > MAX_NUM_ROWS: log_message(f"  Note: {grid['rows']} rows visible but MaxNumRows = {MAX_NUM_ROWS}.")
+        log_message(("Looks good. " if confident else "WARN: Some values look unreliable (LOW); check them before saving. ") + f"Press {SAVE_CONFIG_HOTKEY} to save.")
+        return grid
+    except Exception as e: log_message(f"ERR: Auto calibration failed: {e}"); return None
+    finally: is_processing = False
+
 def save_calibrated_values_to_config(): # Updated to save new calibrated globals
     global GRID_OFFSET_X, GRID_OFFSET_Y, SLOT_WIDTH, SLOT_HEIGHT, SLOT_GAP_X, SLOT_GAP_Y, \
            COLOR_PATCH_RELATIVE_X, COLOR_PATCH_RELATIVE_Y, \
@@ -528,27 +1029,196 @@ def save_calibrated_values_to_config(): # Updated to save new calibrated globals
     with open(CONFIG_FILE, 'w') as configfile:
         cfg_to_save.write(configfile)
     log_message(f"Calibrated values (and preserved others) saved to {CONFIG_FILE}.")
-
-
-# --- Helper Functions (get_slot_center_coords, etc.) ---
-# (Unchanged from the last "full script" version, they use the global config variables)
-def get_slot_center_coords(game_x_abs, game_y_abs, num_rows_to_scan): # ... uses global GRID_OFFSET_X/Y etc.
-    centers = []
-    base_x = game_x_abs + GRID_OFFSET_X
-    base_y = game_y_abs + GRID_OFFSET_Y
-    for r in range(num_rows_to_scan):
-        for c in range(NUM_COLS):
-            centers.append((base_x + c*(SLOT_WIDTH+SLOT_GAP_X) + SLOT_WIDTH//2,
-                            base_y + r*(SLOT_HEIGHT+SLOT_GAP_Y) + SLOT_HEIGHT//2))
-    return centers
-
-def get_color_patch_coords_for_slot(slot_idx, game_x_abs, game_y_abs): # ... uses global COLOR_PATCH_RELATIVE_X/Y etc.
-    r, c = slot_idx // NUM_COLS, slot_idx % NUM_COLS
-    slot_tl_x_abs = game_x_abs + GRID_OFFSET_X + c*(SLOT_WIDTH+SLOT_GAP_X)
-    slot_tl_y_abs = game_y_abs + GRID_OFFSET_Y + r*(SLOT_HEIGHT+SLOT_GAP_Y)
-    patch_center_x_abs = slot_tl_x_abs + COLOR_PATCH_RELATIVE_X
-    patch_center_y_abs = slot_tl_y_abs + COLOR_PATCH_RELATIVE_Y
-    return patch_center_x_abs, patch_center_y_abs
+    # The running config takes the calibrated sections; the rest of the profile keeps what is active in memory
+    for section_lc in sections_to_update_directly:
+        saved_section = next((s for s in cfg_to_save.sections() if s.lower() == section_lc), None)
+        if saved_section is None: continue
+        actual = get_config_section(section_lc) or saved_section
+        if not config.has_section(actual): config.add_section(actual)
+        for opt, value in cfg_to_save.items(saved_section): config.set(actual, opt, value)
+    save_calibration_profile()
+
+
+# --- CALIBRATION PROFILES ---
+# Geometry, tier colours, OCR and mouse timing saved per game window. The key is the window title plus the window size
+# from get_game_window_rect, so every resolution, UI scale and windowed/fullscreen mode keeps its own calibration.
+# Saving the calibration also stores it as the profile of the current window; each scan switches to the profile
+# matching the window. ProfileFile is read once per session, switching applies the profile from memory.
+CALIBRATION_PROFILE_SECTIONS = ('GridStructure', 'ColorPatch', 'TierColors', 'OCR', 'MouseMovement', 'Timing')
+CALIBRATION_PROFILE_SKIP = {('colorpatch', 'samplefile'), ('ocr', 'cachesize'), ('ocr', 'diskcachefile'), ('ocr', 'diskcachemaxentries'),
+                            ('ocr', 'poolworkers'), ('timing', 'adaptive'), ('timing', 'profilefile')} # Per machine, not per window
+calibration_profiles = {'loaded': False, 'profiles': {}, 'active': None, 'warned': set()}
+
+def get_calibration_profile_key(game_rect): return f"{GAME_WINDOW_TITLE} {game_rect[2]}x{game_rect[3]}"
+
+def get_config_section(section): return next((s for s in config.sections() if s.lower() == section.lower()), None)
+
+def get_current_profile_settings(): # {section: {option: value}} of the profile options, as the running config has them
+    settings = {}
+    for section in CALIBRATION_PROFILE_SECTIONS:
+        actual = get_config_section(section)
+        settings[section] = {opt: config.get(actual, opt, fallback=default) if actual else default
+                             for opt, default in DEFAULT_CONFIG[section.lower()].items() if (section.lower(), opt) not in CALIBRATION_PROFILE_SKIP}
+    return settings
+
+PROFILE_VALUE_PARSERS = (int, float, lambda s: [int(v) for v in s.split(',')] if s.count(',') == 2 else int('')) # Integer, number, r,g,b
+
+def is_valid_profile_value(default, value): # A stored value must parse the way the option's default does (anything for text)
+    for parse in PROFILE_VALUE_PARSERS:
+        try: parse(default)
+        except ValueError: continue
+        try: parse(str(value)); return True
+        except ValueError: return False
+    return True
+
+def is_valid_profile_settings(settings): # Profile sections and options only, every value usable by load_calibration_settings
+    sections = {section.lower() for section in CALIBRATION_PROFILE_SECTIONS}
+    if not isinstance(settings, dict): return False
+    for section, options in settings.items():
+        if str(section).lower() not in sections or not isinstance(options, dict): return False
+        defaults = DEFAULT_CONFIG[section.lower()]
+        for opt, value in options.items():
+            if str(opt).lower() not in defaults or isinstance(value, bool) or not isinstance(value, (str, int, float)) \
+               or not is_valid_profile_value(defaults[opt.lower()], value): return False
+    return True
+
+def read_profile_entries(data): # ProfileFile / export JSON -> ({key: profile}, number of malformed entries skipped)
+    profiles = data.get('profiles') if isinstance(data, dict) else None
+    if not isinstance(profiles, dict): return {}, 0
+    valid = {key: entry for key, entry in profiles.items() if isinstance(entry, dict) and is_valid_profile_settings(entry.get('settings'))}
+    return valid, len(profiles) - len(valid)
+
+def write_profile_file(path, profiles): # Same format for the store and for exports; atomic rewrite
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f: json.dump({'version': 1, 'profiles': profiles}, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def load_calibration_profiles(): # -> {key: profile}; reads ProfileFile on first use only
+    if calibration_profiles['loaded']: return calibration_profiles['profiles']
+    calibration_profiles['loaded'] = True
+    if not CALIBRATION_PROFILE_FILE or not os.path.exists(CALIBRATION_PROFILE_FILE): return calibration_profiles['profiles']
+    try:
+        with open(CALIBRATION_PROFILE_FILE, 'r') as f: calibration_profiles['profiles'], skipped = read_profile_entries(json.load(f))
+        log_message(f"{len(calibration_profiles['profiles'])} calibration profile(s) in {CALIBRATION_PROFILE_FILE}.")
+        if skipped: log_message(f"WARN: {skipped} malformed profile(s) in {CALIBRATION_PROFILE_FILE} ignored.")
+    except Exception as e: log_message(f"WARN: Calibration profiles '{CALIBRATION_PROFILE_FILE}' unreadable ({e}).")
+    return calibration_profiles['profiles']
+
+def save_calibration_profile(game_rect=None): # Stores the running settings as the current window's profile -> key or None
+    if not CALIBRATION_PROFILE_FILE: return None
+    game_rect = game_rect or get_game_window_rect()
+    if not game_rect: log_message("WARN: Game window not found, calibration profile not saved."); return None
+    key = get_calibration_profile_key(game_rect); profiles = load_calibration_profiles()
+    profiles[key] = {'title': GAME_WINDOW_TITLE, 'size': [game_rect[2], game_rect[3]],
+                     'saved': datetime.now().isoformat(timespec='seconds'), 'settings': get_current_profile_settings()}
+    calibration_profiles['active'] = key
+    try: write_profile_file(CALIBRATION_PROFILE_FILE, profiles); log_message(f"Calibration profile '{key}' saved to {CALIBRATION_PROFILE_FILE}.")
+    except Exception as e: log_message(f"WARN: Calibration profile not saved: {e}")
+    return key
+
+def apply_calibration_profile(key): # Switches the running settings to a stored profile -> True if applied
+    profile = load_calibration_profiles().get(key)
+    if profile is None: log_message(f"ERR: No calibration profile '{key}'."); return False
+    dependents = (OCR_TEMPLATE_FILE, OCR_THRESHOLD_VALUE, OCR_UPSCALE_FACTOR), (COLOR_CLASSIFIER_FILE, COLOR_MAX_DISTANCE), \
+                 (MOUSE_MOVE_DURATION, DRAG_DURATION, TIMING_WAIT_TIMEOUT)
+    for section, options in profile['settings'].items():
+        actual = get_config_section(section)
+        if actual is None: actual = section; config.add_section(section)
+        for opt, value in options.items(): config.set(actual, opt, str(value))
+    load_calibration_settings(); calibration_profiles['active'] = key
+    # Files learned for other OCR / colour / timing settings are reloaded only when those settings changed
+    if dependents[0] != (OCR_TEMPLATE_FILE, OCR_THRESHOLD_VALUE, OCR_UPSCALE_FACTOR): load_digit_templates()
+    if dependents[1] != (COLOR_CLASSIFIER_FILE, COLOR_MAX_DISTANCE): load_tier_classifier()
+    if dependents[2] != (MOUSE_MOVE_DURATION, DRAG_DURATION, TIMING_WAIT_TIMEOUT) and timing_profile['move_duration'] is not None: load_timing_profile()
+    log_message(f"Calibration profile '{key}': grid {NUM_COLS}x{MAX_NUM_ROWS} at ({GRID_OFFSET_X},{GRID_OFFSET_Y}), slot {SLOT_WIDTH}x{SLOT_HEIGHT}.")
+    return True
+
+def select_calibration_profile(game_rect): # Scan time: switch to the profile for this window if it isn't active yet
+    key = get_calibration_profile_key(game_rect)
+    if key == calibration_profiles['active']: return
+    if key in load_calibration_profiles(): apply_calibration_profile(key); return
+    if key not in calibration_profiles['warned']:
+        calibration_profiles['warned'].add(key)
+        log_message(f"WARN: No calibration profile for '{key}'. Using the current settings; save a calibration ({SAVE_CONFIG_HOTKEY}) to create one.")
+
+def get_profile_by_name(name): # Console: profile key or its number in 'profiles' -> key or None
+    keys = sorted(load_calibration_profiles())
+    if name.isdigit() and 1 <= int(name) <= len(keys): return keys[int(name) - 1]
+    return name if name in keys else None
+
+def list_calibration_profiles(): # Console 'profiles'
+    keys = sorted(load_calibration_profiles())
+    if not keys: log_message(f"No calibration profiles in {CALIBRATION_PROFILE_FILE or '(ProfileFile not set)'}."); return
+    for n, key in enumerate(keys, 1):
+        grid = calibration_profiles['profiles'][key]['settings'].get('GridStructure', {})
+        log_message(f"{'*' if key == calibration_profiles['active'] else ' '}{n}: '{key}' (grid at {grid.get('gridoffsetx')},{grid.get('gridoffsety')}, "
+                    f"slot {grid.get('slotwidth')}x{grid.get('slotheight')}, saved {calibration_profiles['profiles'][key].get('saved', '?')})")
+
+def export_calibration_profiles(path, names=()): # Console 'exportprofiles <file> [profile ...]': all profiles by default
+    profiles = load_calibration_profiles(); keys = [get_profile_by_name(n) for n in names] if names else list(profiles)
+    if None in keys: log_message(f"ERR: Unknown profile '{names[keys.index(None)]}'. See 'profiles'."); return False
+    try: write_profile_file(path, {key: profiles[key] for key in keys})
+    except Exception as e: log_message(f"ERR: Export to '{path}' failed: {e}"); return False
+    log_message(f"Exported {len(keys)} calibration profile(s) to '{path}'."); return True
+
+def import_calibration_profiles(path): # Console 'importprofiles <file>': adds / replaces profiles by key
+    try:
+        with open(path, 'r') as f: imported, skipped = read_profile_entries(json.load(f))
+    except Exception as e: log_message(f"ERR: Import from '{path}' failed: {e}"); return False
+    if skipped: log_message(f"ERR: {skipped} malformed profile(s) in '{path}' (unknown options or unreadable values). Nothing imported."); return False
+    if not imported: log_message(f"ERR: No calibration profiles in '{path}'."); return False
+    profiles = load_calibration_profiles(); profiles.update(imported)
+    if calibration_profiles['active'] in imported: calibration_profiles['active'] = None # Re-applied on the next scan
+    try: write_profile_file(CALIBRATION_PROFILE_FILE, profiles)
+    except Exception as e: log_message(f"WARN: Imported profiles not saved to {CALIBRATION_PROFILE_FILE}: {e}")
+    log_message(f"Imported {len(imported)} calibration profile(s): {', '.join(sorted(imported))}."); return True
+
+# --- GRID LAYOUT MODEL ---
+# Every slot's geometry, computed once from the calibration as read-only NumPy arrays (coordinates relative to the game
+# window). Scans, the planner and the executor index into it instead of redoing the row/column maths per slot.
+# A calibration change produces a new key; the next caller builds a fresh layout and swaps it in with one assignment,
+# so a thread holding the old layout keeps a consistent view.
+GridLayout = namedtuple('GridLayout', ['key', 'rows', 'cols', 'pitch', 'row_ys', 'col_xs', 'slot_tl', 'centers',
+                                       'patch_boxes', 'ocr_boxes', 'sample_extents', 'sample_boxes'])
+grid_layout = None # Current GridLayout; replaced, never modified
+
+def get_grid_layout_key(): # Every setting the slot geometry depends on
+    return (GRID_OFFSET_X, GRID_OFFSET_Y, NUM_COLS, SLOT_WIDTH, SLOT_HEIGHT, SLOT_GAP_X, SLOT_GAP_Y,
+            COLOR_PATCH_RELATIVE_X, COLOR_PATCH_RELATIVE_Y, COLOR_PATCH_SIZE, OCR_RELATIVE_X, OCR_RELATIVE_Y, OCR_WIDTH, OCR_HEIGHT)
+
+def build_grid_layout(key, num_rows): # -> GridLayout for num_rows x NUM_COLS slots; boxes are (left, top, right, bottom)
+    (off_x, off_y, cols, slot_w, slot_h, gap_x, gap_y, patch_x, patch_y, patch_size, ocr_x, ocr_y, ocr_w, ocr_h) = key
+    half = patch_size // 2; pitch = (slot_w + gap_x, slot_h + gap_y)
+    row_ys = off_y + np.arange(num_rows) * pitch[1]; col_xs = off_x + np.arange(cols) * pitch[0]
+    slot_tl = np.stack(np.broadcast_arrays(col_xs[None, :], row_ys[:, None]), axis=-1).reshape(-1, 2) # Row-major slot order
+    extents = (min(0, patch_x - half, ocr_x), min(0, patch_y - half, ocr_y),
+               max(slot_w, patch_x + half, ocr_x + ocr_w), max(slot_h, patch_y + half, ocr_y + ocr_h))
+    corners = np.hstack([slot_tl, slot_tl])
+    arrays = {'centers': slot_tl + (slot_w // 2, slot_h // 2),
+              'patch_boxes': corners + (patch_x - half, patch_y - half, patch_x + half, patch_y + half),
+              'ocr_boxes': corners + (ocr_x, ocr_y, ocr_x + ocr_w, ocr_y + ocr_h), 'sample_boxes': corners + extents}
+    for arr in (row_ys, col_xs, slot_tl, *arrays.values()): arr.setflags(write=False)
+    return GridLayout(key=key, rows=num_rows, cols=cols, pitch=pitch, row_ys=row_ys, col_xs=col_xs, slot_tl=slot_tl,
+                      sample_extents=extents, **arrays)
+
+def get_grid_layout(num_rows=None): # Current layout covering at least num_rows rows (default MAX_NUM_ROWS)
+    global grid_layout
+    num_rows = MAX_NUM_ROWS if num_rows is None else num_rows
+    layout, key = grid_layout, get_grid_layout_key()
+    if layout is None or layout.key != key or layout.rows < num_rows:
+        # Paged plans ask for more rows than fit on screen; keep the larger layout for the next caller
+        keep_rows = layout.rows if layout is not None and layout.key == key else MAX_NUM_ROWS
+        layout = build_grid_layout(key, max(num_rows, keep_rows, 0))
+        grid_layout = layout
+    return layout
+
+def get_slot_center_coords(game_x_abs, game_y_abs, num_rows_to_scan): # Absolute (x, y) slot centres, row-major
+    centers = get_grid_layout(num_rows_to_scan).centers[:num_rows_to_scan * NUM_COLS] + (game_x_abs, game_y_abs)
+    return [tuple(pt) for pt in centers.tolist()]
+
+def get_color_patch_coords_for_slot(slot_idx, game_x_abs, game_y_abs): # Absolute centre of a slot's colour patch
+    left, top = get_grid_layout(slot_idx // NUM_COLS + 1).patch_boxes[slot_idx, :2].tolist(); half = COLOR_PATCH_SIZE // 2
+    return game_x_abs + left + half, game_y_abs + top + half
 
 def get_average_color_from_patch(img, patch_cx_abs, patch_cy_abs, game_x_abs, game_y_abs, slot_idx_str=""): # ... uses COLOR_PATCH_SIZE
     patch_cx_rel, patch_cy_rel = patch_cx_abs - game_x_abs, patch_cy_abs - game_y_abs
@@ -561,25 +1231,222 @@ def get_average_color_from_patch(img, patch_cx_abs, patch_cy_abs, game_x_abs, ga
     if patch_img.mode != 'RGB': patch_img = patch_img.convert('RGB')
     return tuple(np.mean(np.array(patch_img).reshape(-1, 3), axis=0).astype(int))
 
-def identify_tier_from_color(rgb_tuple, slot_idx_str=""): # ... uses TIER_COLORS, COLOR_TOLERANCE
+def identify_tier_from_color(rgb_tuple, slot_idx_str=""): # ... uses TIER_COLORS, COLOR_TOLERANCE (or the trained classifier)
     if rgb_tuple is None: return None
+    if tier_classifier is not None: return classify_tier_color(rgb_tuple)[0]
     best_match, min_d = None, float('inf')
     for tier, t_color in TIER_COLORS.items():
         d = sum(abs(rgb_tuple[i] - t_color[i]) for i in range(3))
         if d < min_d: min_d, best_match = d, tier
     return best_match if min_d <= COLOR_TOLERANCE else None
 
-def get_color_under_mouse_periodic(interval=1): # For TIER_COLOR manual calibration
+# --- VECTORIZED GRID SCAN ENGINE ---
+# Classifies every slot of the grid in one pass over a single NumPy array of the screenshot,
+# instead of cropping/converting/looping per slot.
+# origin: where the array's top-left pixel sits in the game window (grid-only captures start inside the window).
+# grid: a container's GridLayout (get_container_layout) to scan that grid instead of [GridStructure].
+def get_scan_grid(grid=None): # -> (GridLayout, rows) of the grid being scanned
+    return (get_grid_layout(), MAX_NUM_ROWS) if grid is None else (grid, grid.rows)
+
+def get_grid_slot_origins(num_rows, origin=(0, 0), grid=None): # Slot top-left corners relative to the captured array: (row_ys, col_xs)
+    layout = get_grid_layout(num_rows) if grid is None else grid
+    return layout.row_ys[:num_rows] - origin[1], layout.col_xs - origin[0]
+
+def get_grid_patch_colors(img_arr, num_rows, slot_mask=None, origin=(0, 0), grid=None): # (rows, cols, 3) int array of mean patch colours
+    # -1 where not sampleable or not in slot_mask (optional (rows, cols) bool array: only sample those slots).
+    layout = get_grid_layout(num_rows) if grid is None else grid; cols = layout.cols
+    half = COLOR_PATCH_SIZE // 2; side = 2 * half # Same box as get_average_color_from_patch: centre +/- half
+    colors = np.full((num_rows, cols, 3), -1, dtype=np.int32)
+    if side <= 0 or num_rows <= 0: return colors
+    if slot_mask is None: slot_mask = np.ones((num_rows, cols), dtype=bool)
+    boxes = layout.patch_boxes[:num_rows * cols].reshape(num_rows, cols, 4) - (tuple(origin) * 2)
+    lefts, tops = boxes[..., 0], boxes[..., 1]
+    img_h, img_w = img_arr.shape[:2]
+    inside = (tops >= 0) & (tops + side <= img_h) & (lefts >= 0) & (lefts + side <= img_w)
+    rr, cc = np.nonzero(slot_mask & inside)
+    if rr.size:
+        # Strided view of every side x side window (no copy); fancy indexing then gathers only the patches we need
+        windows = np.lib.stride_tricks.sliding_window_view(img_arr, (side, side), axis=(0, 1)) # (H-s+1, W-s+1, 3, s, s)
+        patches = windows[tops[rr, cc], lefts[rr, cc]] # (n, 3, s, s)
+        colors[rr, cc] = patches.reshape(patches.shape[:2] + (-1,)).mean(axis=-1).astype(np.int32)
+    # Patches hanging over the screenshot edge are rare; sample their clipped area like the per-slot path did
+    for r, c in zip(*np.nonzero(slot_mask & ~inside)):
+        t, l = max(0, tops[r, c]), max(0, lefts[r, c]); b, rt = min(img_h, tops[r, c] + side), min(img_w, lefts[r, c] + side)
+        if t < b and l < rt: colors[r, c] = img_arr[t:b, l:rt].reshape(-1, 3).mean(axis=0).astype(np.int32)
+    return colors
+
+def classify_grid_tiers(img_arr, num_rows=None, slot_mask=None, origin=(0, 0), grid=None): # img_arr: HxWx3 RGB array of the grid capture
+    # Returns (tiers, colors): tiers is a (rows, cols) int array with the tier per slot (0 = empty / no match).
+    num_rows = get_scan_grid(grid)[1] if num_rows is None else num_rows
+    colors = get_grid_patch_colors(img_arr, num_rows, slot_mask, origin, grid)
+    tiers = np.zeros(colors.shape[:2], dtype=np.int32)
+    if tier_classifier is not None: return lookup_tier_lut(colors)[0].astype(np.int32), colors
+    if not TIER_COLORS: return tiers, colors
+    tier_ids = np.array(list(TIER_COLORS.keys())); palette = np.array(list(TIER_COLORS.values()), dtype=np.int32)
+    dists = np.abs(colors[:, :, None, :] - palette[None, None, :, :]).sum(axis=-1) # Manhattan distance to every tier at once
+    best = dists.argmin(axis=-1) # First minimum wins, same tie-break as identify_tier_from_color
+    min_d = np.take_along_axis(dists, best[..., None], axis=-1)[..., 0]
+    matched = (colors[..., 0] >= 0) & (min_d <= COLOR_TOLERANCE)
+    tiers[matched] = tier_ids[best[matched]]
+    return tiers, colors
+
+def get_effective_scan_rows(tiers): # Early-stop row rules applied to the tier array -> (eff_rows, last_scanned_row)
+    # Scanning stops at the first empty row after the first occupied one, or after 5 empty leading rows.
+    num_rows = tiers.shape[0]
+    occupied_rows = (tiers > 0).any(axis=1)
+    occupied_idx = np.flatnonzero(occupied_rows)
+    if not occupied_idx.size or occupied_idx[0] > 4: return 0, min(4, num_rows - 1)
+    first = occupied_idx[0]
+    empty_after = np.flatnonzero(~occupied_rows[first:])
+    if not empty_after.size: return num_rows, num_rows - 1
+    eff_rows = int(first + empty_after[0])
+    return eff_rows, eff_rows
+
+# --- TIER COLOUR CLASSIFIER ---
+# Optional replacement for the one-colour-per-tier + Tolerance match. Labelled patch colours (console sampling or saved
+# screenshots) are fitted per tier as a Gaussian in CIELAB, where distances follow perceived colour and a lighting
+# change mostly moves L. The model is compiled into a 32x32x32 lookup table over RGB (tier + rejection reason per
+# cell), so classifying a patch is one array index. Tier 0 samples (empty slots) teach it what "empty" looks like.
+TIER_LUT_BITS = 5 # 32 levels per channel
+TIER_AMBIGUITY_MARGIN = 0.5 # Reject when the two closest tiers are within this many standard deviations
+TIER_LAB_VARIANCE_FLOOR = (25.0, 4.0, 4.0) # Minimum L, a, b variance: a few tight samples must not make a tier brittle
+TIER_REJECT_REASONS = {0: 'ok', 1: 'empty', 2: 'unknown colour', 3: 'ambiguous', 4: 'not sampled'}
+tier_classifier = None # {'lut', 'reasons', 'classes', 'signature'} once loaded
+
+def rgb_to_lab(rgb): # (..., 3) sRGB 0-255 -> (..., 3) CIELAB (D65)
+    c = np.asarray(rgb, dtype=np.float64) / 255.0
+    c = np.where(c > 0.04045, ((c + 0.055) / 1.055) ** 2.4, c / 12.92)
+    xyz = c @ np.array([[0.4124, 0.2126, 0.0193], [0.3576, 0.7152, 0.1192], [0.1805, 0.0722, 0.9505]]) / np.array([0.95047, 1.0, 1.08883])
+    f = np.where(xyz > 216 / 24389, np.cbrt(xyz), (24389 / 27 * xyz + 16) / 116)
+    return np.stack([116 * f[..., 1] - 16, 500 * (f[..., 0] - f[..., 1]), 200 * (f[..., 1] - f[..., 2])], axis=-1)
+
+def load_tier_color_samples(): # -> {tier: [[r, g, b], ...]} from COLOR_SAMPLE_FILE
+    if not COLOR_SAMPLE_FILE or not os.path.exists(COLOR_SAMPLE_FILE): return {}
+    try:
+        with open(COLOR_SAMPLE_FILE) as f: return {int(tier): samples for tier, samples in json.load(f).items()}
+    except Exception as e: log_message(f"WARN: Could not read colour samples '{COLOR_SAMPLE_FILE}': {e}"); return {}
+
+def save_tier_color_samples(samples):
+    if not COLOR_SAMPLE_FILE: log_message("WARN: [ColorPatch] SampleFile is empty, samples not saved."); return
+    with open(COLOR_SAMPLE_FILE, 'w') as f: json.dump({str(tier): rgb_list for tier, rgb_list in sorted(samples.items())}, f)
+
+def collect_tier_samples_from_folder(folder, samples): # Saved game-window screenshots -> patch colours added to samples
+    # Labels come from '<name>.json' next to the image ({"tiers": [...]}, 0 = empty) when present,
+    # else from the current classification (matched slots only).
+    added = 0
+    for name in sorted(os.listdir(folder)):
+        if not name.lower().endswith('.png'): continue
+        try: img_arr = np.asarray(Image.open(os.path.join(folder, name)).convert('RGB'))
+        except Exception as e: log_message(f"  Skip '{name}': {e}"); continue
+        colors = get_grid_patch_colors(img_arr, MAX_NUM_ROWS).reshape(-1, 3)
+        truth_path = os.path.join(folder, os.path.splitext(name)[0] + '.json')
+        if os.path.exists(truth_path):
+            with open(truth_path) as f: labels = json.load(f)['tiers'][:len(colors)]
+        else: labels = classify_grid_tiers(img_arr)[0].reshape(-1).tolist()
+        for tier, rgb in zip(labels, colors):
+            if rgb[0] < 0 or (tier == 0 and not os.path.exists(truth_path)): continue # Unlabelled empties may be misreads
+            samples.setdefault(int(tier), []).append([int(v) for v in rgb]); added += 1
+    log_message(f"  {added} labelled patch colours taken from '{folder}'.")
+    return added
+
+def compile_tier_lut(classes, means, inv_covs): # Gaussian per class -> (tier LUT, reason LUT), both uint8 (n, n, n)
+    levels = 1 << TIER_LUT_BITS; step = 256 // levels
+    centres = np.arange(levels) * step + step // 2
+    grid_lab = rgb_to_lab(np.stack(np.meshgrid(centres, centres, centres, indexing='ij'), axis=-1).reshape(-1, 3))
+    dists = np.stack([np.sqrt(np.einsum('ni,ij,nj->n', grid_lab - m, ic, grid_lab - m)) for m, ic in zip(means, inv_covs)], axis=1)
+    classes = np.asarray(classes); order = np.argsort(dists, axis=1)
+    best_d = np.take_along_axis(dists, order[:, :1], axis=1)[:, 0]; best_class = classes[order[:, 0]]
+    tier_d = np.where(classes[None, :] > 0, dists, np.inf); tier_order = np.sort(tier_d, axis=1) # Ambiguity only between tiers
+    lut = np.where(best_class > 0, best_class, 0).astype(np.uint8); reasons = np.zeros(len(lut), dtype=np.uint8)
+    reasons[best_class == 0] = 1
+    if tier_order.shape[1] > 1:
+        ambiguous = (best_class > 0) & (tier_order[:, 1] - tier_order[:, 0] < TIER_AMBIGUITY_MARGIN); reasons[ambiguous] = 3
+    reasons[best_d > COLOR_MAX_DISTANCE] = 2
+    lut[reasons > 0] = 0
+    return lut.reshape(levels, levels, levels), reasons.reshape(levels, levels, levels)
+
+def learn_tier_classifier(folder=None): # Fits the per-tier model from the sample file (+ folder) and saves the compiled LUT
+    global tier_classifier
+    samples = load_tier_color_samples()
+    if folder:
+        if not os.path.isdir(folder): log_message(f"ERR: Folder '{folder}' not found."); return False
+        collect_tier_samples_from_folder(folder, samples); save_tier_color_samples(samples)
+    classes = sorted(tier for tier, rgb_list in samples.items() if len(rgb_list) >= 3)
+    if not any(tier > 0 for tier in classes):
+        log_message("ERR: Need at least 3 samples of a tier. Use 'calibratecolors <tier>' or 'learncolors <folder>'."); return False
+    means, inv_covs = [], []
+    for tier in classes:
+        lab = rgb_to_lab(np.array(samples[tier], dtype=np.float64))
+        cov = np.cov(lab, rowvar=False) + np.diag(TIER_LAB_VARIANCE_FLOOR)
+        means.append(lab.mean(axis=0)); inv_covs.append(np.linalg.inv(cov))
+    lut, reasons = compile_tier_lut(classes, means, inv_covs)
+    np.savez(COLOR_CLASSIFIER_FILE, lut=lut, reasons=reasons, classes=np.array(classes), means=np.array(means),
+             inv_covs=np.array(inv_covs), max_distance=COLOR_MAX_DISTANCE)
+    load_tier_classifier()
+    log_message(f"Learned tier colours for {[t for t in classes if t > 0]}" + (" and empty slots" if 0 in classes else "") + f". Saved to {COLOR_CLASSIFIER_FILE}.")
+    for tier in classes: # How the compiled table reads its own training samples
+        results = [classify_tier_color(rgb) for rgb in samples[tier]]
+        hits = sum((t or 0) == tier for t, _ in results); rejected = {}
+        for t, reason in results:
+            if t is None and reason != 'empty': rejected[reason] = rejected.get(reason, 0) + 1
+        log_message(f"  {'Empty' if tier == 0 else f'Tier {tier}'}: {hits}/{len(results)} samples read back correctly"
+                    + (f", rejected: {rejected}" if rejected else "") + ".")
+    missing = sorted(set(TIER_COLORS) - set(classes))
+    if missing: log_message(f"  WARN: No samples for tiers {missing}. They will never be recognised while {COLOR_CLASSIFIER_FILE} exists.")
+    return True
+
+def load_tier_classifier(): # Loads COLOR_CLASSIFIER_FILE if present; otherwise TierColors + Tolerance are used
+    global tier_classifier
+    tier_classifier = None
+    if not COLOR_CLASSIFIER_FILE or not os.path.exists(COLOR_CLASSIFIER_FILE): return
+    try:
+        with np.load(COLOR_CLASSIFIER_FILE) as data:
+            if data['lut'].shape[0] != 1 << TIER_LUT_BITS: log_message(f"WARN: {COLOR_CLASSIFIER_FILE} has another table size. Re-run 'learncolors'."); return
+            tier_classifier = {'lut': data['lut'].astype(np.int32), 'reasons': data['reasons'], 'classes': [int(t) for t in data['classes']]}
+            if float(data['max_distance']) != COLOR_MAX_DISTANCE: # MaxDistance was changed since: recompile, the model is in the file
+                tier_classifier['lut'], tier_classifier['reasons'] = compile_tier_lut(data['classes'], data['means'], data['inv_covs'])
+                tier_classifier['lut'] = tier_classifier['lut'].astype(np.int32)
+        tier_classifier['signature'] = hashlib.sha1(tier_classifier['lut'].tobytes() + tier_classifier['reasons'].tobytes()).hexdigest()[:12]
+        log_message(f"Tier colour classifier loaded from {COLOR_CLASSIFIER_FILE} (classes {tier_classifier['classes']}).")
+    except Exception as e: log_message(f"WARN: Could not load tier classifier '{COLOR_CLASSIFIER_FILE}': {e}"); tier_classifier = None
+
+def lookup_tier_lut(colors): # (..., 3) int colours (-1 = not sampled) -> (tiers, reason codes) from the compiled table
+    shift = 8 - TIER_LUT_BITS
+    idx = np.clip(np.asarray(colors), 0, 255) >> shift
+    tiers = tier_classifier['lut'][idx[..., 0], idx[..., 1], idx[..., 2]]
+    reasons = tier_classifier['reasons'][idx[..., 0], idx[..., 1], idx[..., 2]]
+    unsampled = np.asarray(colors)[..., 0] < 0
+    return np.where(unsampled, 0, tiers), np.where(unsampled, 4, reasons)
+
+def classify_tier_color(rgb_tuple): # -> (tier or None, reason); reason is 'ok' for a match
+    if rgb_tuple is None: return None, TIER_REJECT_REASONS[4]
+    if tier_classifier is None:
+        tier = identify_tier_from_color(rgb_tuple)
+        return tier, 'ok' if tier else f"more than Tolerance {COLOR_TOLERANCE} from every tier"
+    tier, reason = lookup_tier_lut(np.array(rgb_tuple, dtype=np.int32))
+    return (int(tier) or None), TIER_REJECT_REASONS[int(reason)]
+
+def log_tier_rejections(colors, reasons, num_rows): # One line per rejected non-empty-looking slot (classifier only)
+    for r, c in zip(*np.nonzero((reasons[:num_rows] == 2) | (reasons[:num_rows] == 3))):
+        log_message(f"  Slot {r*colors.shape[1]+c}(R{r}C{c}): no tier, {TIER_REJECT_REASONS[int(reasons[r, c])]} {tuple(int(v) for v in colors[r, c])}")
+
+def get_color_under_mouse_periodic(interval=1, label_tier=None): # For TIER_COLOR manual calibration
+    # With label_tier (0 = empty slot) every sample is also stored for 'learncolors'; move over many slots of that tier.
     log_message("Calibrating TIER_COLORS. Press Ctrl+C in console to stop.") # ... rest of function
+    samples = load_tier_color_samples() if label_tier is not None else None; taken = 0
     try:
         while True:
-            x,y = pyautogui.position(); img = ImageGrab.grab(bbox=(x-2,y-2,x+2,y+2))
-            if img.mode != 'RGB': img = img.convert('RGB')
-            avg_c = tuple(np.mean(np.array(img).reshape(-1,3), axis=0).astype(int))
-            log_message(f"Mouse ({x},{y}) - Avg 5x5 Color: {avg_c}")
+            x,y = pyautogui.position(); img_arr = capture_region((x-2,y-2,x+2,y+2))
+            avg_c = tuple(np.mean(img_arr.reshape(-1,3), axis=0).astype(int))
+            if samples is not None: samples.setdefault(label_tier, []).append([int(v) for v in avg_c]); taken += 1
+            tier, reason = classify_tier_color(avg_c)
+            log_message(f"Mouse ({x},{y}) - Avg 5x5 Color: {avg_c} -> " + (f"Tier {tier}" if tier else f"no tier ({reason})"))
             time.sleep(interval)
     except KeyboardInterrupt: log_message("Tier Color calibration stopped.")
     except Exception as e: log_message(f"Tier Color sampling error: {e}")
+    if taken:
+        save_tier_color_samples(samples)
+        log_message(f"{taken} samples of {'empty slots' if label_tier == 0 else f'tier {label_tier}'} saved to {COLOR_SAMPLE_FILE}. Type 'learncolors' to rebuild the classifier.")
 
 
 def get_game_window_rect(): # ... uses GAME_WINDOW_TITLE
@@ -592,219 +1459,1498 @@ def get_game_window_rect(): # ... uses GAME_WINDOW_TITLE
         return (win.left, win.top, win.width, win.height)
     except Exception as e: log_message(f"ERR getting game window: {e}"); return None
 
+# --- SCREEN CAPTURE BACKENDS ---
+# Every backend takes an absolute screen bbox (left, top, right, bottom) and returns an HxWx3 uint8 RGB array.
+capture_state = {'mss_local': threading.local(), 'fake_source': None, 'fake_origin': (0, 0)}
+
+def capture_with_imagegrab(bbox):
+    from PIL import ImageGrab # Lazy: pulls in platform screen-grab support
+    return np.asarray(ImageGrab.grab(bbox=bbox).convert('RGB'))
+
+def capture_with_mss(bbox): # mss handles can't be shared between threads, so each thread keeps its own
+    local = capture_state['mss_local']
+    if getattr(local, 'sct', None) is None: local.sct = mss.mss()
+    l, t, r, b = bbox
+    shot = local.sct.grab({'left': l, 'top': t, 'width': r - l, 'height': b - t})
+    return np.ascontiguousarray(np.asarray(shot)[:, :, 2::-1]) # BGRA -> RGB
+
+def set_fake_capture_source(source, origin=(0, 0)): # Image path, PIL image, HxWx3 array, or callable returning one of those
+    # origin: screen position of the fake image's top-left pixel.
+    if isinstance(source, str): source = Image.open(source)
+    if isinstance(source, Image.Image): source = np.asarray(source.convert('RGB'))
+    capture_state['fake_source'] = source; capture_state['fake_origin'] = tuple(origin)
+    return source
+
+def capture_from_fake(bbox): # 'file' backend: crops bbox out of a fake screen instead of the real one
+    source = capture_state['fake_source']
+    if source is None:
+        if not CAPTURE_FILE: raise RuntimeError("CaptureBackend is 'file' but [Scan] CaptureFile is empty")
+        source = set_fake_capture_source(CAPTURE_FILE)
+    screen = source() if callable(source) else source
+    if isinstance(screen, Image.Image): screen = np.asarray(screen.convert('RGB'))
+    ox, oy = capture_state['fake_origin']; l, t, r, b = bbox
+    out = np.zeros((b - t, r - l, 3), dtype=np.uint8) # Parts off the fake screen read as black
+    sl, st = max(l - ox, 0), max(t - oy, 0); sr, sb = min(r - ox, screen.shape[1]), min(b - oy, screen.shape[0])
+    if sl < sr and st < sb: out[st + oy - t:sb + oy - t, sl + ox - l:sr + ox - l] = screen[st:sb, sl:sr, :3]
+    return out
+
+CAPTURE_BACKENDS = {'imagegrab': capture_with_imagegrab, 'mss': capture_with_mss, 'file': capture_from_fake}
+
+def is_capture_backend_available(name): return name in CAPTURE_BACKENDS and (name != 'mss' or mss.available())
+
+def capture_region(bbox): # Absolute (left, top, right, bottom) -> HxWx3 uint8 RGB array from the configured backend
+    backend = CAPTURE_BACKEND if is_capture_backend_available(CAPTURE_BACKEND) else 'imagegrab'
+    bbox = tuple(int(v) for v in bbox)
+    with perf_span('capture', backend=backend, w=bbox[2] - bbox[0], h=bbox[3] - bbox[1]): return CAPTURE_BACKENDS[backend](bbox)
+
+def get_slot_sample_extents(): # (x0, y0, x1, y1) around a slot's top-left holding the slot, colour patch and OCR box
+    return get_grid_layout().sample_extents
+
+def get_grid_capture_bbox(game_rect): # -> (absolute bbox, origin) of the smallest capture holding the whole grid
+    # Covers every slot, colour patch and OCR box of the MAX_NUM_ROWS x NUM_COLS grid, clipped to the game window.
+    # origin is the bbox's top-left relative to the game window (what the scan functions take as origin).
+    game_x, game_y, game_w, game_h = game_rect
+    boxes = get_grid_layout().sample_boxes[:MAX_NUM_ROWS * NUM_COLS]
+    left, top = max(0, int(boxes[0, 0])), max(0, int(boxes[0, 1]))
+    right, bottom = min(game_w, int(boxes[-1, 2])), min(game_h, int(boxes[-1, 3]))
+    if right <= left or bottom <= top: # Grid lies outside the window (bad calibration): capture the window so the debug image shows why
+        left, top, right, bottom = 0, 0, game_w, game_h
+    return (game_x + left, game_y + top, game_x + right, game_y + bottom), (left, top)
+
+def get_slot_capture_bbox(game_x, game_y, slot_idx): # Absolute bbox of one visible slot (row-major index) with its patch and OCR box
+    if CONTAINERS_ENABLED: # Global slot over all containers
+        container, local_idx = locate_container_slot(slot_idx); box = get_container_layout(container).sample_boxes[local_idx]
+    else: box = get_grid_layout(slot_idx // NUM_COLS + 1).sample_boxes[slot_idx]
+    left, top, right, bottom = box.tolist()
+    return (game_x + left, game_y + top, game_x + right, game_y + bottom)
+
+def capture_slot_regions(game_x, game_y, slot_indices): # slot_idx -> array from get_slot_capture_bbox; tiny grabs for the executor
+    return {s_idx: capture_region(get_slot_capture_bbox(game_x, game_y, s_idx)) for s_idx in slot_indices}
+
+def preprocess_ocr_crop(slot_img_crop): # Grayscale, upscale, threshold, invert -> black digits on white for Tesseract
+    img = slot_img_crop.convert('L')
+    w, h = img.size; img = img.resize((w*OCR_UPSCALE_FACTOR, h*OCR_UPSCALE_FACTOR), Image.LANCZOS)
+    img = img.point(lambda p: 255 if p > OCR_THRESHOLD_VALUE else 0); return ImageOps.invert(img)
+
+def parse_stack_count(txt): return int(txt) if txt.isdigit() and int(txt) > 0 else 1 # Unreadable/empty -> stack of 1
+
+OCR_TESSERACT_CONFIG = r'--oem 3 --psm 7 -c tessedit_char_whitelist=0123456789'
+OCR_BATCH_TESSERACT_CONFIG = r'--oem 3 --psm 6 -c tessedit_char_whitelist=0123456789' # psm 6: one text line per montage tile
+
+# --- OCR ENGINES ---
+# Every engine takes a preprocessed crop (black digits on white) and returns (count or None, confidence 0..1).
+# With Engine = template, Tesseract is only asked when the template read is below TemplateMinConfidence.
+DIGIT_GLYPH_W, DIGIT_GLYPH_H = 12, 16 # Normalised glyph size used for template correlation
+digit_templates = None # {'digits': [d, ...], 'vectors': (n, H*W) zero-mean unit-norm float array, 'signature': str} once learned/loaded
+
+def recognize_count_tesseract(processed_img):
+    perf_count('ocr_calls')
+    with perf_span('ocr.tesseract'): txt = pytesseract.image_to_string(processed_img, config=OCR_TESSERACT_CONFIG).strip()
+    return (int(txt), 1.0) if txt.isdigit() and int(txt) > 0 else (None, 0.0)
+
+def segment_digit_glyphs(processed_img): # Split on blank columns (column projection) -> list of normalised glyph vectors
+    ink = np.asarray(processed_img) < 128
+    cols = np.flatnonzero(ink.any(axis=0))
+    if not cols.size: return []
+    breaks = np.flatnonzero(np.diff(cols) > 1) # Runs of inked columns are separated by at least one blank column
+    glyphs = []
+    for start, end in zip(np.r_[cols[0], cols[breaks + 1]], np.r_[cols[breaks], cols[-1]]):
+        seg = ink[:, start:end + 1]
+        rows = np.flatnonzero(seg.any(axis=1))
+        if end - start + 1 < max(1, OCR_UPSCALE_FACTOR) or rows.size < 2 * OCR_UPSCALE_FACTOR: continue # Specks, not digits
+        seg = seg[rows[0]:rows[-1] + 1]
+        # Nearest-neighbour resample to the fixed glyph size, then zero-mean / unit-norm for correlation
+        ys = (np.arange(DIGIT_GLYPH_H) * seg.shape[0] // DIGIT_GLYPH_H); xs = (np.arange(DIGIT_GLYPH_W) * seg.shape[1] // DIGIT_GLYPH_W)
+        vec = seg[ys[:, None], xs[None, :]].astype(np.float32).ravel(); vec -= vec.mean()
+        norm = np.linalg.norm(vec); glyphs.append(vec / norm if norm > 0 else vec)
+    return glyphs
+
+def recognize_count_template(processed_img):
+    if digit_templates is None: return None, 0.0
+    perf_count('template_reads')
+    with perf_span('ocr.template'): glyphs = segment_digit_glyphs(processed_img)
+    if not glyphs: return None, 0.0
+    scores = np.stack(glyphs) @ digit_templates['vectors'].T # Correlation of every glyph with every template at once
+    best = scores.argmax(axis=1)
+    txt = ''.join(str(digit_templates['digits'][i]) for i in best)
+    confidence = float(np.clip(scores[np.arange(len(best)), best].min(), 0.0, 1.0)) # A number is only as sure as its worst digit
+    return (int(txt), confidence) if int(txt) > 0 else (None, 0.0)
+
+OCR_ENGINES = {'tesseract': recognize_count_tesseract, 'template': recognize_count_template}
+
+def is_ocr_engine_available(engine_name):
+    if engine_name == 'tesseract':
+        if not tesseract_state['ready'].is_set(): log_message("Waiting for Tesseract warm-up..."); tesseract_state['ready'].wait()
+        return pytesseract_available
+    if engine_name == 'template': return digit_templates is not None
+    return False
+
+def is_any_ocr_available(): return any(is_ocr_engine_available(name) for name in OCR_ENGINES)
+
+def recognize_processed_count(processed_img, slot_idx_str=""): # Engine chain for one preprocessed crop -> (count, confident)
+    # Not confident: unreadable (taken as 1) or a low-confidence template read nothing could confirm. Those are never cached.
+    count, confidence = None, 0.0
+    if OCR_ENGINE != 'tesseract' and is_ocr_engine_available(OCR_ENGINE):
+        count, confidence = OCR_ENGINES[OCR_ENGINE](processed_img)
+        if count is not None and confidence >= OCR_TEMPLATE_MIN_CONFIDENCE: return count, True
+    if pytesseract_available:
+        tess_count, _ = recognize_count_tesseract(processed_img)
+        return (tess_count, True) if tess_count is not None else (1, False)
+    if count is not None: log_message(f"Slot {slot_idx_str}: low-confidence read {count} ({confidence:.2f}), no Tesseract to confirm.")
+    return (count, False) if count is not None else (1, False)
+
+def learn_digit_templates(folder): # Labelled raw OCR crops named '<count>_anything.png' -> digit templates file
+    global digit_templates
+    if not os.path.isdir(folder): log_message(f"ERR: Template folder '{folder}' not found."); return False
+    samples = {} # digit -> list of glyph vectors
+    used, skipped = 0, 0
+    for name in sorted(os.listdir(folder)):
+        label = name.split('_')[0].split('.')[0]
+        if not label.isdigit() or not name.lower().endswith('.png'): continue
+        try: glyphs = segment_digit_glyphs(preprocess_ocr_crop(Image.open(os.path.join(folder, name))))
+        except Exception as e: log_message(f"  Skip '{name}': {e}"); skipped += 1; continue
+        if len(glyphs) != len(label): log_message(f"  Skip '{name}': {len(glyphs)} glyphs for label '{label}'."); skipped += 1; continue
+        for digit, vec in zip(label, glyphs): samples.setdefault(int(digit), []).append(vec)
+        used += 1
+    if not samples: log_message("ERR: No usable labelled crops found."); return False
+    digits = sorted(samples); vectors = []
+    for d in digits:
+        vec = np.mean(samples[d], axis=0); vec -= vec.mean(); norm = np.linalg.norm(vec)
+        vectors.append(vec / norm if norm > 0 else vec)
+    digit_templates = {'digits': digits, 'vectors': np.stack(vectors).astype(np.float32)}
+    digit_templates['signature'] = hashlib.sha1(digit_templates['vectors'].tobytes()).hexdigest()[:12]
+    np.savez(OCR_TEMPLATE_FILE, digits=np.array(digits), vectors=digit_templates['vectors'],
+             threshold=OCR_THRESHOLD_VALUE, upscale=OCR_UPSCALE_FACTOR)
+    missing = sorted(set(range(10)) - set(digits))
+    log_message(f"Learned templates for digits {digits} from {used} crops ({skipped} skipped). Saved to {OCR_TEMPLATE_FILE}.")
+    if missing: log_message(f"  WARN: No samples for digits {missing}. Counts containing them will fall back to Tesseract.")
+    return True
+
+def load_digit_templates(): # Loads OCR_TEMPLATE_FILE if present; templates only match the settings they were learned with
+    global digit_templates
+    digit_templates = None
+    if not OCR_TEMPLATE_FILE or not os.path.exists(OCR_TEMPLATE_FILE): return
+    try:
+        with np.load(OCR_TEMPLATE_FILE) as data:
+            if int(data['threshold']) != OCR_THRESHOLD_VALUE or int(data['upscale']) != OCR_UPSCALE_FACTOR:
+                log_message(f"WARN: {OCR_TEMPLATE_FILE} was learned with other OCR settings. Re-run 'learndigits'."); return
+            digit_templates = {'digits': [int(d) for d in data['digits']], 'vectors': data['vectors'].astype(np.float32)}
+            digit_templates['signature'] = hashlib.sha1(digit_templates['vectors'].tobytes()).hexdigest()[:12] # Part of the OCR cache key
+        log_message(f"Digit templates loaded from {OCR_TEMPLATE_FILE} (digits {digit_templates['digits']}).")
+    except Exception as e: log_message(f"WARN: Could not load digit templates '{OCR_TEMPLATE_FILE}': {e}")
+
+# --- OCR RESULT CACHE ---
+# Content-addressed: the key is a hash of the thresholded crop bytes plus every setting that changes the read,
+# so an unchanged slot is never OCR'd twice. Bounded in-memory LRU in front of an optional JSON store on disk.
+# Only confident reads go in: a crop that read as nothing (stack of 1) or as an unconfirmed guess is read again next time.
+OCR_CACHE_FORMAT = 2 # Part of the key; v1 also cached unreadable crops as 1, so its entries are never looked up again
+ocr_cache = OrderedDict() # key -> count, most recently used last
+ocr_disk_cache = {} # key -> [count, last_used_unix_time]
+ocr_cache_state = {"hits": 0, "disk_hits": 0, "misses": 0, "disk_loaded": False, "disk_dirty": False}
+
+def get_ocr_cache_key(processed_img):
+    engine_sig = digit_templates['signature'] if OCR_ENGINE == 'template' and digit_templates is not None else ''
+    h = hashlib.sha1(f"{OCR_CACHE_FORMAT}|{OCR_THRESHOLD_VALUE}|{OCR_UPSCALE_FACTOR}|{OCR_ENGINE}|{engine_sig}|{processed_img.size}".encode())
+    h.update(processed_img.tobytes()); return h.hexdigest()
+
+def load_ocr_disk_cache(): # Lazy: only read the file on the first lookup of the session
+    global ocr_disk_cache
+    ocr_cache_state["disk_loaded"] = True
+    if not OCR_DISK_CACHE_FILE or not os.path.exists(OCR_DISK_CACHE_FILE): return
+    try:
+        with open(OCR_DISK_CACHE_FILE, 'r') as f: ocr_disk_cache = json.load(f)
+        log_message(f"OCR cache: {len(ocr_disk_cache)} entries loaded from {OCR_DISK_CACHE_FILE}.")
+    except Exception as e: log_message(f"WARN: Could not read OCR cache '{OCR_DISK_CACHE_FILE}': {e}"); ocr_disk_cache = {}
+
+def ocr_cache_get(key): # -> count or None
+    if key in ocr_cache:
+        ocr_cache.move_to_end(key); ocr_cache_state["hits"] += 1; perf_count('ocr_cache_hits'); return ocr_cache[key]
+    if OCR_DISK_CACHE_FILE:
+        if not ocr_cache_state["disk_loaded"]: load_ocr_disk_cache()
+        entry = ocr_disk_cache.get(key)
+        if entry is not None:
+            entry[1] = time.time(); ocr_cache_state["disk_dirty"] = True
+            ocr_cache_state["disk_hits"] += 1; perf_count('ocr_cache_hits'); ocr_cache_put(key, entry[0], to_disk=False); return entry[0]
+    ocr_cache_state["misses"] += 1; return None
+
+def ocr_cache_put(key, count, confident=True, to_disk=True):
+    if not confident: return
+    if OCR_CACHE_SIZE > 0:
+        ocr_cache[key] = count; ocr_cache.move_to_end(key)
+        while len(ocr_cache) > OCR_CACHE_SIZE: ocr_cache.popitem(last=False) # Evict least recently used
+    if to_disk and OCR_DISK_CACHE_FILE:
+        if not ocr_cache_state["disk_loaded"]: load_ocr_disk_cache()
+        ocr_disk_cache[key] = [count, time.time()]; ocr_cache_state["disk_dirty"] = True
+
+def save_ocr_disk_cache(): # Evicts least recently used entries beyond DiskCacheMaxEntries, then writes atomically
+    global ocr_disk_cache
+    if not OCR_DISK_CACHE_FILE or not ocr_cache_state["disk_dirty"]: return
+    if len(ocr_disk_cache) > OCR_DISK_CACHE_MAX_ENTRIES:
+        keep = sorted(ocr_disk_cache.items(), key=lambda kv: kv[1][1])[-OCR_DISK_CACHE_MAX_ENTRIES:] if OCR_DISK_CACHE_MAX_ENTRIES > 0 else []
+        log_message(f"OCR cache: evicting {len(ocr_disk_cache) - len(keep)} old disk entries.")
+        ocr_disk_cache = dict(keep)
+    try:
+        tmp_path = OCR_DISK_CACHE_FILE + '.tmp'
+        with open(tmp_path, 'w') as f: json.dump(ocr_disk_cache, f)
+        os.replace(tmp_path, OCR_DISK_CACHE_FILE); ocr_cache_state["disk_dirty"] = False
+    except Exception as e: log_message(f"WARN: Could not write OCR cache '{OCR_DISK_CACHE_FILE}': {e}")
+
+def log_ocr_cache_stats(): # End-of-scan summary, then reset the per-scan counters
+    st = ocr_cache_state; lookups = st["hits"] + st["disk_hits"] + st["misses"]
+    if lookups: log_message(f"OCR cache: {st['hits']} memory hits, {st['disk_hits']} disk hits, {st['misses']} misses "
+                            f"({100*(st['hits']+st['disk_hits'])//lookups}% hit rate, {len(ocr_cache)} in memory).")
+    st["hits"] = st["disk_hits"] = st["misses"] = 0
+
+def recognize_processed_count_cached(processed_img, slot_idx_str=""):
+    key = get_ocr_cache_key(processed_img)
+    count = ocr_cache_get(key)
+    if count is None: count, confident = recognize_processed_count(processed_img, slot_idx_str); ocr_cache_put(key, count, confident=confident)
+    return count
+
 def get_stack_count_from_image_region(slot_img_crop, slot_idx_str=""): # ... uses OCR_* globals
-    global pytesseract_available, OCR_UPSCALE_FACTOR, OCR_THRESHOLD_VALUE, pytesseract
-    if not pytesseract_available: return 1
+    if not is_any_ocr_available(): return 1
     try:
-        img = slot_img_crop.convert('L')
-        w, h = img.size; img = img.resize((w*OCR_UPSCALE_FACTOR, h*OCR_UPSCALE_FACTOR), Image.LANCZOS)
-        img = img.point(lambda p: 255 if p > OCR_THRESHOLD_VALUE else 0); img = ImageOps.invert(img)
-        img.save(os.path.join(DEBUG_IMAGE_FOLDER, f"Step_OCR_Slot_{slot_idx_str}_Processed.png"))
-        cfg = r'--oem 3 --psm 7 -c tessedit_char_whitelist=0123456789'
-        txt = pytesseract.image_to_string(img, config=cfg).strip()
-        return int(txt) if txt.isdigit() and int(txt) > 0 else 1
+        img = preprocess_ocr_crop(slot_img_crop)
+        debug_artifact('slots', f"Step_OCR_Slot_{slot_idx_str}_Processed.png", img)
+        return recognize_processed_count_cached(img, slot_idx_str)
     except Exception as e: log_message(f"Slot {slot_idx_str} OCR error: {e}"); return 1
 
-def smooth_drag(sx, sy, ex, ey): # ... uses MouseMovement globals
+def build_ocr_montage(processed_by_slot): # Stack processed crops vertically on white, separated by blank bands
+    # Returns (montage_img, tile_spans) where tile_spans maps slot_idx -> (top, bottom) rows of its tile.
+    tile_w = max(img.width for img in processed_by_slot.values()); tile_h = max(img.height for img in processed_by_slot.values())
+    sep = max(tile_h, 10) # Blank band at least one tile high so Tesseract never merges neighbouring lines
+    montage = Image.new('L', (tile_w + 2*sep, sep + len(processed_by_slot)*(tile_h + sep)), 255)
+    tile_spans = {}; y = sep
+    for slot_idx, img in processed_by_slot.items():
+        montage.paste(img, (sep, y)); tile_spans[slot_idx] = (y, y + tile_h); y += tile_h + sep
+    return montage, tile_spans
+
+def get_stack_counts_batched(crops_by_slot): # {slot_idx: raw OCR crop} -> {slot_idx: count} with ONE Tesseract call
+    # Confident template reads are taken as-is; only the rest go into the montage. Tiles whose recognised
+    # words can't be mapped unambiguously are re-read with the per-slot OCR.
+    if not is_any_ocr_available(): return {slot_idx: 1 for slot_idx in crops_by_slot}
+    counts = {}; processed = {}; cache_keys = {}
+    for slot_idx, crop in crops_by_slot.items():
+        if is_cancel_requested(): return counts
+        try: img = preprocess_ocr_crop(crop)
+        except Exception as e: log_message(f"Slot {slot_idx} OCR preprocess error: {e}"); counts[slot_idx] = 1; continue
+        if img.getextrema()[0] == 255: counts[slot_idx] = 1; continue # No ink at all: nothing to read, stack of 1
+        cache_keys[slot_idx] = get_ocr_cache_key(img)
+        cached = ocr_cache_get(cache_keys[slot_idx])
+        if cached is not None: counts[slot_idx] = cached; continue
+        if OCR_ENGINE != 'tesseract' and is_ocr_engine_available(OCR_ENGINE):
+            count, confidence = OCR_ENGINES[OCR_ENGINE](img)
+            if count is not None and confidence >= OCR_TEMPLATE_MIN_CONFIDENCE:
+                counts[slot_idx] = count; ocr_cache_put(cache_keys[slot_idx], count); continue
+        processed[slot_idx] = img
+    if not pytesseract_available or len(processed) < 2: # No Tesseract, or nothing to gain from a montage
+        for slot_idx in processed:
+            if is_cancel_requested(): break
+            counts[slot_idx], confident = recognize_processed_count(processed[slot_idx], str(slot_idx))
+            ocr_cache_put(cache_keys[slot_idx], counts[slot_idx], confident=confident)
+        return counts
+    if is_cancel_requested(): return counts
+
+    montage, tile_spans = build_ocr_montage(processed)
+    words_by_slot = {slot_idx: [] for slot_idx in processed}; ambiguous = set()
+    try:
+        debug_artifact('slots', "Step_OCR_Batch_Montage.png", montage)
+        perf_count('ocr_calls')
+        with perf_span('ocr.batch', tiles=len(processed)):
+            data = pytesseract.image_to_data(montage, config=OCR_BATCH_TESSERACT_CONFIG, output_type=pytesseract.Output.DICT)
+        for txt, top, height in zip(data['text'], data['top'], data['height']):
+            txt = str(txt).strip()
+            if not txt: continue
+            hits = [s for s, (t, b) in tile_spans.items() if top < b and top + height > t] # Tiles this word box touches
+            if len(hits) == 1 and tile_spans[hits[0]][0] <= top and top + height <= tile_spans[hits[0]][1]:
+                words_by_slot[hits[0]].append(txt)
+            else: ambiguous.update(hits) # Straddles a separator (or floats in one): can't trust the mapping
+    except Exception as e:
+        log_message(f"Batched OCR error: {e}. Falling back to per-slot OCR."); ambiguous.update(processed)
+
+    for slot_idx, words in words_by_slot.items():
+        if slot_idx not in ambiguous and len(words) == 1 and words[0].isdigit():
+            counts[slot_idx] = parse_stack_count(words[0]); ocr_cache_put(cache_keys[slot_idx], counts[slot_idx], confident=int(words[0]) > 0)
+        else: ambiguous.add(slot_idx) # No word or several words for one tile
+    if ambiguous:
+        log_message(f"Batched OCR: {len(processed)-len(ambiguous)}/{len(processed)} tiles mapped, re-reading slots {sorted(ambiguous)} individually.")
+        for slot_idx in sorted(ambiguous):
+            counts[slot_idx], confident = recognize_processed_count(processed[slot_idx], str(slot_idx))
+            ocr_cache_put(cache_keys[slot_idx], counts[slot_idx], confident=confident)
+    else: log_message(f"Batched OCR: all {len(processed)} tiles read in one Tesseract call.")
+    return counts
+
+# --- OCR WORKER POOL ---
+# Long-lived recognizer processes for per-slot OCR ([OCR] BatchOCR = false). The hotkey thread preprocesses and
+# checks the cache; the remaining crops go to the workers as one uint8 block in shared memory (no pickled images),
+# in chunks, and come back as one Future per slot. Only the per-slot path uses the pool; the default batched read
+# (BatchOCR = true) is a single Tesseract call. Tier colours are classified in one vectorized pass before the crops are
+# submitted, so what overlaps the reads is the debug layout image, not the classification.
+ocr_pool_state = {'pool': None, 'signature': None, 'broken': False}
+
+def get_ocr_worker_settings(): # Everything a worker needs to read counts like this process does
+    return {'tesseract_cmd': TESSERACT_CMD_PATH, 'engine': OCR_ENGINE, 'template_file': os.path.abspath(OCR_TEMPLATE_FILE) if OCR_TEMPLATE_FILE else '',
+            'min_confidence': OCR_TEMPLATE_MIN_CONFIDENCE, 'upscale': OCR_UPSCALE_FACTOR, 'threshold': OCR_THRESHOLD_VALUE}
+
+def init_ocr_worker(settings): # Runs once in each worker process
+    global TESSERACT_CMD_PATH, OCR_ENGINE, OCR_TEMPLATE_FILE, OCR_TEMPLATE_MIN_CONFIDENCE, OCR_UPSCALE_FACTOR, OCR_THRESHOLD_VALUE, LOG_QUIET
+    LOG_QUIET = True
+    TESSERACT_CMD_PATH, OCR_ENGINE, OCR_TEMPLATE_FILE = settings['tesseract_cmd'], settings['engine'], settings['template_file']
+    OCR_TEMPLATE_MIN_CONFIDENCE, OCR_UPSCALE_FACTOR, OCR_THRESHOLD_VALUE = settings['min_confidence'], settings['upscale'], settings['threshold']
+    initialize_tesseract(); load_digit_templates()
+
+def ocr_worker_read(shm_name, shape, first, last): # Worker task: (count, confident) for processed crops [first, last) of a shared batch
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        view = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf); batch = view[first:last].copy(); del view
+    finally: shm.close()
+    return [recognize_processed_count(Image.fromarray(img)) for img in batch]
+
+def is_ocr_pool_enabled(): return OCR_POOL_WORKERS > 0 and not ocr_pool_state['broken'] and is_any_ocr_available()
+
+def get_ocr_pool(): # Started on first use (or by warm_up_ocr_pool); restarted when the OCR settings change
+    signature = json.dumps(get_ocr_worker_settings(), sort_keys=True)
+    if ocr_pool_state['pool'] is not None and ocr_pool_state['signature'] == signature: return ocr_pool_state['pool']
+    shutdown_ocr_pool()
+    if os.name == 'posix': resource_tracker.ensure_running() # Workers share it, so their attach isn't reported as a leak
+    ocr_pool_state['pool'] = ProcessPoolExecutor(max_workers=OCR_POOL_WORKERS, initializer=init_ocr_worker, initargs=(get_ocr_worker_settings(),))
+    ocr_pool_state['signature'] = signature
+    return ocr_pool_state['pool']
+
+def warm_up_ocr_pool(): # Spawns every worker now so the first scan doesn't wait for process start-up
+    start = time.perf_counter(); pool = get_ocr_pool()
+    for f in [pool.submit(time.sleep, 0.05) for _ in range(OCR_POOL_WORKERS)]: f.result()
+    log_message(f"OCR pool: {OCR_POOL_WORKERS} worker processes ready in {(time.perf_counter() - start)*1000:.0f}ms.")
+
+def shutdown_ocr_pool():
+    if ocr_pool_state['pool'] is not None: ocr_pool_state['pool'].shutdown(wait=False, cancel_futures=True); ocr_pool_state['pool'] = None
+
+def submit_ocr_batch(processed_by_slot): # {slot_idx: processed 'L' image} -> {slot_idx: Future((count, confident))}
+    slots = list(processed_by_slot)
+    h = max(img.height for img in processed_by_slot.values()); w = max(img.width for img in processed_by_slot.values())
+    shape = (len(slots), h, w)
+    shm = shared_memory.SharedMemory(create=True, size=len(slots) * h * w)
+    batch = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf); batch[:] = 255 # White padding reads as blank
+    for i, slot_idx in enumerate(slots):
+        img_arr = np.asarray(processed_by_slot[slot_idx]); batch[i, :img_arr.shape[0], :img_arr.shape[1]] = img_arr
+    del batch
+    futures = {slot_idx: Future() for slot_idx in slots}
+    chunk = max(1, -(-len(slots) // (2 * OCR_POOL_WORKERS))) # ~2 chunks per worker evens out slow reads
+    chunks = [slots[i:i + chunk] for i in range(0, len(slots), chunk)]
+    pending = {'left': len(chunks)}; lock = threading.Lock()
+    def chunk_done(chunk_future, chunk_slots):
+        try:
+            for slot_idx, read in zip(chunk_slots, chunk_future.result()): futures[slot_idx].set_result(read)
+        except Exception as e:
+            for slot_idx in chunk_slots: futures[slot_idx].set_exception(e)
+        with lock: pending['left'] -= 1; last = pending['left'] == 0
+        if last: shm.close(); shm.unlink() # Every worker has copied its slice by now
+    try:
+        pool = get_ocr_pool()
+        for n, chunk_slots in enumerate(chunks):
+            first = n * chunk
+            pool.submit(ocr_worker_read, shm.name, shape, first, first + len(chunk_slots)).add_done_callback(lambda f, cs=chunk_slots: chunk_done(f, cs))
+    except Exception:
+        shm.close(); shm.unlink(); raise
+    return futures
+
+def get_stack_counts_pooled(crops_by_slot): # {slot_idx: raw OCR crop} -> ({slot_idx: count or Future((count, confident))}, cache keys) for resolve_stack_counts
+    counts = {}; processed = {}; cache_keys = {}
+    for slot_idx, crop in crops_by_slot.items():
+        if is_cancel_requested(): return counts, cache_keys
+        try: img = preprocess_ocr_crop(crop)
+        except Exception as e: log_message(f"Slot {slot_idx} OCR preprocess error: {e}"); counts[slot_idx] = 1; continue
+        debug_artifact('slots', f"Step_OCR_Slot_{slot_idx}_Processed.png", img)
+        if img.getextrema()[0] == 255: counts[slot_idx] = 1; continue # No ink: stack of 1
+        cache_keys[slot_idx] = get_ocr_cache_key(img)
+        cached = ocr_cache_get(cache_keys[slot_idx])
+        if cached is not None: counts[slot_idx] = cached
+        else: processed[slot_idx] = img
+    if processed:
+        try: futures = submit_ocr_batch(processed)
+        except Exception as e: # e.g. processes can't be started here: read in this process from now on
+            log_message(f"WARN: OCR pool unavailable ({e}). Reading counts one by one."); ocr_pool_state['broken'] = True
+            futures = {slot_idx: recognize_processed_count(img, str(slot_idx)) for slot_idx, img in processed.items()}
+        for slot_idx, fut in futures.items():
+            if isinstance(fut, Future): counts[slot_idx] = fut # Cached in resolve_stack_counts
+            else: ocr_cache_put(cache_keys[slot_idx], *fut); counts[slot_idx] = fut[0]
+    return counts, cache_keys
+
+def resolve_stack_counts(counts, cache_keys): # Waits for pooled reads; a failed read counts as 1
+    # The cache is only touched here, on the scanning thread: done-callbacks would run on the pool's thread,
+    # racing save_ocr_disk_cache and the LRU eviction
+    resolved = {}
+    for slot_idx, count in counts.items():
+        if not isinstance(count, Future): resolved[slot_idx] = count; continue
+        if is_cancel_requested(): count.cancel(); continue # Reads already running finish in the workers; nobody waits for them
+        try: read = count.result()
+        except Exception as e: log_message(f"Slot {slot_idx} OCR error: {e}"); resolved[slot_idx] = 1; continue
+        ocr_cache_put(cache_keys[slot_idx], *read); resolved[slot_idx] = read[0]
+    return resolved
+
+def smooth_drag(sx, sy, ex, ey, watch=None): # ... uses MouseMovement globals
+    # watch = (game_x, game_y, src_visible_slot, dst_visible_slot): with [Timing] Adaptive the fixed waits are replaced by
+    # waits on those slots and learned durations. Returns True if the drop was seen to settle (always True when not watching).
+    if TIMING_ADAPTIVE and watch is not None: return timed_drag(sx, sy, ex, ey, *watch)
     log_message(f"Dragging from ({sx},{sy}) to ({ex},{ey})")
     pyautogui.moveTo(sx, sy, duration=MOUSE_MOVE_DURATION, tween=pyautogui.easeInOutQuad); time.sleep(0.05)
     pyautogui.mouseDown(); time.sleep(0.1)
     pyautogui.moveTo(ex, ey, duration=DRAG_DURATION, tween=pyautogui.easeInOutQuad); time.sleep(0.05)
     pyautogui.mouseUp(); log_message(f"Drag done. Pause {POST_ACTION_DELAY}s"); time.sleep(POST_ACTION_DELAY)
+    return True
+
+# --- DRAG TIMING ---
+# Adaptive drags poll tiny slot grabs instead of sleeping: after mouseDown until the source slot reacts (item picked up),
+# after mouseUp until both slots changed and look the same on two grabs in a row. Each machine's profile keeps the
+# learned tween durations and wait timeouts (a little above the slowest recent latency). Games that show no lift on
+# pickup would cost the full timeout every drag, so after a few misses in a row the pickup wait drops to the old fixed pause.
+PICKUP_MISSES_TO_FALL_BACK = 3
+PICKUP_FALLBACK_WAIT = 0.1 # The fixed pause after mouseDown of the non-adaptive drag
+timing_profile = {'move_duration': None, 'drag_duration': None, 'pickup_timeout': None, 'drop_timeout': None,
+                  'streak': 0, 'pickup_latencies': [], 'drop_latencies': [], 'pickup_misses': 0, 'dirty': False}
+
+def get_timing_profile_key(): return f"{platform.node()}|{GAME_WINDOW_TITLE}"
+
+def load_timing_profile(): # Starts from the [MouseMovement] durations; a saved profile for this machine overrides them
+    timing_profile.update(move_duration=MOUSE_MOVE_DURATION, drag_duration=DRAG_DURATION, pickup_timeout=TIMING_WAIT_TIMEOUT,
+                          drop_timeout=TIMING_WAIT_TIMEOUT, streak=0, pickup_latencies=[], drop_latencies=[], pickup_misses=0, dirty=False)
+    if not TIMING_ADAPTIVE or not TIMING_PROFILE_FILE or not os.path.exists(TIMING_PROFILE_FILE): return
+    try:
+        with open(TIMING_PROFILE_FILE, 'r') as f: saved = json.load(f).get(get_timing_profile_key())
+    except Exception as e: log_message(f"WARN: Timing profile '{TIMING_PROFILE_FILE}' unreadable ({e}). Using config durations."); return
+    if not saved: return
+    for k in ('move_duration', 'drag_duration', 'pickup_timeout', 'drop_timeout'):
+        if isinstance(saved.get(k), (int, float)): timing_profile[k] = float(saved[k])
+    log_message(f"Timing profile: move {timing_profile['move_duration']:.3f}s, drag {timing_profile['drag_duration']:.3f}s, "
+                f"waits {timing_profile['pickup_timeout']:.3f}/{timing_profile['drop_timeout']:.3f}s.")
+
+def save_timing_profile():
+    if not TIMING_ADAPTIVE or not TIMING_PROFILE_FILE or not timing_profile['dirty']: return
+    try:
+        profiles = {}
+        if os.path.exists(TIMING_PROFILE_FILE):
+            with open(TIMING_PROFILE_FILE, 'r') as f: profiles = json.load(f)
+        profiles[get_timing_profile_key()] = {k: round(timing_profile[k], 4) for k in ('move_duration', 'drag_duration', 'pickup_timeout', 'drop_timeout')}
+        tmp_path = TIMING_PROFILE_FILE + '.tmp'
+        with open(tmp_path, 'w') as f: json.dump(profiles, f, indent=1)
+        os.replace(tmp_path, TIMING_PROFILE_FILE); timing_profile['dirty'] = False
+    except Exception as e: log_message(f"WARN: Timing profile not saved: {e}")
+
+def wait_until(condition, timeout): # Polls condition() every PollInterval -> (met, seconds waited)
+    start = time.perf_counter()
+    while True:
+        if condition(): return True, time.perf_counter() - start
+        if time.perf_counter() - start >= timeout: return False, time.perf_counter() - start
+        time.sleep(TIMING_POLL_INTERVAL)
+
+def learn_wait_timeout(key, latencies, latency): # Timeout follows the slowest of the last 20 latencies, with margin
+    latencies.append(latency); del latencies[:-20]
+    timing_profile[key] = min(TIMING_WAIT_TIMEOUT, max(3 * TIMING_POLL_INTERVAL + 0.02, 2 * max(latencies))); timing_profile['dirty'] = True
+
+def note_drag_result(ok): # Verified drags shorten the tweens a step at a time; a failed one backs off toward the config values
+    if ok:
+        timing_profile['streak'] += 1
+        if timing_profile['streak'] < TIMING_STREAK_TO_SPEEDUP: return
+        timing_profile['streak'] = 0
+        timing_profile['move_duration'] = max(TIMING_MIN_MOVE_DURATION, timing_profile['move_duration'] * 0.85)
+        timing_profile['drag_duration'] = max(TIMING_MIN_DRAG_DURATION, timing_profile['drag_duration'] * 0.85)
+    else:
+        timing_profile['streak'] = 0
+        timing_profile['move_duration'] = min(max(MOUSE_MOVE_DURATION, TIMING_MIN_MOVE_DURATION), timing_profile['move_duration'] * 1.5)
+        timing_profile['drag_duration'] = min(max(DRAG_DURATION, TIMING_MIN_DRAG_DURATION), timing_profile['drag_duration'] * 1.5)
+        timing_profile['pickup_timeout'] = timing_profile['drop_timeout'] = TIMING_WAIT_TIMEOUT # Re-learn the waits too
+        timing_profile['pickup_misses'] = 0
+    timing_profile['dirty'] = True
+
+def timed_drag(sx, sy, ex, ey, game_x, game_y, src, dst): # Adaptive smooth_drag -> True if the drop settled in time
+    if timing_profile['move_duration'] is None: load_timing_profile()
+    grab = lambda: capture_slot_regions(game_x, game_y, (src, dst))
+    before = grab(); last = {}
+    def drop_settled():
+        now = grab(); settled = bool(last) and all(np.array_equal(now[k], last[k]) for k in now)
+        last.update(now)
+        return settled and not np.array_equal(now[dst], before[dst])
+    log_message(f"Dragging from ({sx},{sy}) to ({ex},{ey}) (move {timing_profile['move_duration']:.3f}s, drag {timing_profile['drag_duration']:.3f}s)")
+    pyautogui.moveTo(sx, sy, duration=timing_profile['move_duration'], tween=pyautogui.easeInOutQuad)
+    pyautogui.mouseDown()
+    picked, pickup_s = wait_until(lambda: not np.array_equal(grab()[src], before[src]), timing_profile['pickup_timeout'])
+    if picked: timing_profile['pickup_misses'] = 0; learn_wait_timeout('pickup_timeout', timing_profile['pickup_latencies'], pickup_s)
+    else:
+        timing_profile['pickup_misses'] += 1
+        if timing_profile['pickup_misses'] == PICKUP_MISSES_TO_FALL_BACK and timing_profile['pickup_timeout'] > PICKUP_FALLBACK_WAIT:
+            log_message(f"No pickup seen on {PICKUP_MISSES_TO_FALL_BACK} drags in a row; waiting {PICKUP_FALLBACK_WAIT}s after mouseDown instead.")
+            timing_profile['pickup_timeout'] = PICKUP_FALLBACK_WAIT; timing_profile['dirty'] = True
+    pyautogui.moveTo(ex, ey, duration=timing_profile['drag_duration'], tween=pyautogui.easeInOutQuad)
+    pyautogui.mouseUp()
+    dropped, drop_s = wait_until(drop_settled, timing_profile['drop_timeout'])
+    if dropped: learn_wait_timeout('drop_timeout', timing_profile['drop_latencies'], drop_s)
+    log_message(f"Drag done. Pickup {'seen' if picked else 'not seen'} after {pickup_s:.3f}s, drop {'settled' if dropped else 'not settled'} after {drop_s:.3f}s.")
+    return dropped
+
+def wait_for_hotkey_release(hotkey, timeout): # Instead of a fixed pause before executing: start once the hotkey is let go
+    try: wait_until(lambda: not keyboard.is_pressed(hotkey), timeout)
+    except Exception: time.sleep(timeout) # Key name keyboard can't poll: keep the old fixed pause
+
+
+# --- MOVE PLANNER ---
+# Items with the same tier and count are interchangeable, so the planner only cares which CLASS each slot holds.
+# Misplaced slots form cycles (slot A holds what slot B needs, ...); a cycle of k slots costs k-1 drags, so
+# splitting the misplaced slots into as many (short) cycles as possible minimises the number of drags.
+def get_item_class(item): return (item['tier'], item['count'])
+
+def get_target_classes(items): # Class that target slot i must end up holding: tier asc, count desc
+    return sorted((get_item_class(it) for it in items), key=lambda k: (k[0], -k[1]))
+
+def plan_moves_legacy(items, num_slots): # Old tie-break-by-original-slot planner -> [(from, to)], for the report only
+    layout = [None] * num_slots; pos = {}
+    for it in items: layout[it['original_slot_index']] = it['id']; pos[it['id']] = it['original_slot_index']
+    pairs = []
+    for target, it in enumerate(sorted(items, key=lambda x: (x['tier'], -x['count'], x['original_slot_index']))):
+        src = pos[it['id']]
+        if src == target: continue
+        pairs.append((src, target)); displaced = layout[target]
+        layout[target], layout[src] = it['id'], displaced; pos[it['id']] = target
+        if displaced is not None: pos[displaced] = src
+    return pairs
+
+def find_shortest_class_cycle(adjacency, start): # BFS in the class graph -> [start, ..., last] or None
+    parents = {start: None}; frontier = [start]
+    while frontier:
+        next_frontier = []
+        for u in frontier:
+            for v in adjacency.get(u, ()):
+                if v == start:
+                    cycle = [u]
+                    while cycle[-1] != start: cycle.append(parents[cycle[-1]]) # (None is a class: the empty slot)
+                    return cycle[::-1]
+                if v not in parents: parents[v] = u; next_frontier.append(v)
+        frontier = next_frontier
+    return None
+
+def find_swap_cycles(slot_classes, target_classes, slot_position=None): # -> list of slot cycles [s1, ..., sk]: s(i+1) holds what s(i) needs
+    # slot_position: increasing slot -> position that decides which slot is "nearest" (default: the slot index)
+    position = slot_position or (lambda s: s)
+    required = lambda s: target_classes[s] if s < len(target_classes) else None # Slots past the items must end empty
+    buckets = {} # (current class, required class) -> misplaced slots; every slot is one edge of the class graph
+    for s, cur in enumerate(slot_classes):
+        if cur != required(s): buckets.setdefault((cur, required(s)), []).append(s)
+    cycles = []
+    # Class graph is balanced (each class is needed as often as it is held), so every edge lies on some cycle
+    while buckets:
+        adjacency = {}
+        for (u, v) in buckets: adjacency.setdefault(u, []).append(v)
+        best = None
+        for start in adjacency:
+            cyc = find_shortest_class_cycle(adjacency, start)
+            if cyc and (best is None or len(cyc) < len(best)): best = cyc
+            if best and len(best) == 2: break
+        edges = [(best[i], best[(i + 1) % len(best)]) for i in range(len(best))]
+        for _ in range(min(len(buckets[e]) for e in edges)): # Take this class cycle as often as the slots allow
+            anchor = buckets[edges[0]].pop(0); cycle = [anchor]
+            for e in edges[1:]: # Buckets stay sorted; pick the slot nearest the anchor to keep cycles (and drags) local
+                i = bisect.bisect_left(buckets[e], anchor)
+                if i == len(buckets[e]) or (i > 0 and position(anchor) - position(buckets[e][i - 1]) <= position(buckets[e][i]) - position(anchor)): i -= 1
+                cycle.append(buckets[e].pop(i))
+            cycles.append(cycle)
+        for e in edges:
+            if not buckets[e]: del buckets[e]
+    return cycles
+
+def get_cycle_drags(cycle, slot_classes): # -> [(from_slot, to_slot)] for one cycle, k-1 drags, never dragging an empty slot
+    drags = []
+    for i in range(len(cycle) - 1):
+        a, b = cycle[i], cycle[i + 1] # a holds the rotating item, b holds what a needs
+        drags.append((a, b) if slot_classes[b] is None else (b, a))
+    return drags
+
+def estimate_drag_travel(drags, slot_centers): # Cursor path length: to each drag's source, then the drag itself
+    travel, cursor = 0.0, None
+    for a, b in drags:
+        (ax, ay), (bx, by) = slot_centers[a], slot_centers[b]
+        if cursor is not None: travel += math.hypot(ax - cursor[0], ay - cursor[1])
+        travel += math.hypot(bx - ax, by - ay); cursor = (bx, by)
+    return travel
+
+def order_cycles_for_travel(cycles, slot_classes, slot_centers, keep_rotation=False): # Greedy nearest-next cycle, best rotation of each
+    # Every (cycle, rotation) candidate has a fixed internal cost; only the lead-in from the cursor changes per
+    # step, so each greedy step is one vectorised distance over all candidates. keep_rotation: cycles start where given.
+    cand_cycle, cand_cost, cand_src, cand_drags = [], [], [], []
+    for ci, cyc in enumerate(cycles):
+        k = len(cyc); starts = (0,) if keep_rotation else range(0, k, max(1, k // 24)) # Long cycles: only ~24 evenly spaced rotations
+        for r in starts:
+            drags = get_cycle_drags(cyc[r:] + cyc[:r], slot_classes)
+            cand_cycle.append(ci); cand_drags.append(drags); cand_src.append(slot_centers[drags[0][0]])
+            cand_cost.append(estimate_drag_travel(drags, slot_centers))
+    cand_cycle = np.array(cand_cycle); cand_cost = np.array(cand_cost, dtype=float); cand_src = np.array(cand_src, dtype=float).reshape(-1, 2)
+    done = np.zeros(len(cycles), dtype=bool); ordered = []; cursor = None
+    for _ in range(len(cycles)):
+        total = cand_cost if cursor is None else cand_cost + np.hypot(cand_src[:, 0] - cursor[0], cand_src[:, 1] - cursor[1])
+        total = np.where(done[cand_cycle], np.inf, total)
+        pick = int(total.argmin()); drags = cand_drags[pick]
+        ordered.append(drags); done[cand_cycle[pick]] = True; cursor = slot_centers[drags[-1][1]]
+    return ordered
+
+def plan_sort_moves(items, slot_centers): # -> (moves, report) using the equivalence-class cycle planner
+    num_slots = max([len(items)] + [it['original_slot_index'] + 1 for it in items])
+    layout = [None] * num_slots
+    for it in items: layout[it['original_slot_index']] = it['id']
+    classes = {it['id']: get_item_class(it) for it in items}
+    slot_classes = [classes.get(i) for i in layout]
+    cycles = find_swap_cycles(slot_classes, get_target_classes(items))
+    moves = []
+    for cycle_idx, drags in enumerate(order_cycles_for_travel(cycles, slot_classes, slot_centers)):
+        for a, b in drags:
+            moves.append({"from_slot_idx": a, "to_slot_idx": b, "item_id_being_moved": layout[a], "cycle": cycle_idx,
+                          "from_coords": slot_centers[a], "to_coords": slot_centers[b]})
+            layout[a], layout[b] = layout[b], layout[a] # Drag = swap (or move into an empty slot)
+    legacy = plan_moves_legacy(items, num_slots)
+    report = {"drags_before": len(legacy), "travel_before": estimate_drag_travel(legacy, slot_centers),
+              "drags_after": len(moves), "travel_after": estimate_drag_travel([(m['from_slot_idx'], m['to_slot_idx']) for m in moves], slot_centers),
+              "cycles": len(cycles)}
+    return moves, report
+
+# --- STACK CONSOLIDATION ---
+# Dropping a stack on a partial stack of the same tier adds it up to MaxStackSize; what doesn't fit stays in the source
+# slot. Before sorting, the partial stacks of each tier are merged into as few slots as their total allows. A drag that
+# empties its source frees a slot, so those come first (exact fits, then best fits); a drag that only tops up a stack
+# is used when no stack fits whole anywhere. The sort planner gets the merged, smaller set of items.
+def get_merge_result_items(move): # Items a merge move leaves behind -> {id: item}
+    results = {}
+    for slot, item_id, count in zip((move['from_slot_idx'], move['to_slot_idx']), move['result_ids'], move['result_counts']):
+        if item_id is not None: results[item_id] = {'id': item_id, 'tier': move['tier'], 'count': count, 'original_slot_index': slot}
+    return results
+
+def get_plan_items_by_id(plan_items, moves): # Scanned items plus everything merge moves create
+    items_by_id = {it['id']: it for it in plan_items}
+    for m in moves:
+        if m.get('action') == 'merge': items_by_id.update(get_merge_result_items(m))
+    return items_by_id
+
+def can_consolidate_stacks(paged): # Merges need real counts (OCR) and both stacks on screen together (no paging)
+    return CONSOLIDATE_ENABLED and not paged and is_any_ocr_available()
+
+def pick_stack_merge(stacks): # Partial stacks of one tier, smallest first -> (source, destination) of the next merge drag
+    room = lambda it: CONSOLIDATE_MAX_STACK - it['count']
+    by_count = {}
+    for it in stacks: by_count.setdefault(it['count'], []).append(it)
+    for dst in reversed(stacks): # Fills another stack exactly: frees a slot and completes a stack in one drag
+        src = next((it for it in by_count.get(room(dst), ()) if it is not dst), None)
+        if src is not None: return src, dst
+    src = stacks[0] # Else the smallest goes whole into the stack with the least room that still takes it
+    dst = min((it for it in stacks[1:] if room(it) >= src['count']), key=room, default=None)
+    return src, dst if dst is not None else stacks[-1] # Fits nowhere whole: top up the fullest
+
+def plan_stack_merges(items, slot_centers): # -> (merge moves, items after the merges, report)
+    items = [dict(it) for it in items]; partial_by_tier = {}
+    for it in items:
+        if it['count'] < CONSOLIDATE_MAX_STACK: partial_by_tier.setdefault(it['tier'], []).append(it)
+    moves = []; emptied = set()
+    for tier, stacks in sorted(partial_by_tier.items()):
+        # Every drag either empties its source or fills its destination; stop once the total needs every slot left
+        while len(stacks) > -(-sum(it['count'] for it in stacks) // CONSOLIDATE_MAX_STACK):
+            stacks.sort(key=lambda it: (it['count'], -it['original_slot_index'])) # Later slots give their stacks up first
+            src, dst = pick_stack_merge(stacks)
+            moved = min(CONSOLIDATE_MAX_STACK - dst['count'], src['count']); a, b = src['original_slot_index'], dst['original_slot_index']
+            src_id = f"{src['id']}-{moved}" if src['count'] > moved else None; dst_id = f"{dst['id']}+{moved}"
+            moves.append({"action": "merge", "from_slot_idx": a, "to_slot_idx": b, "item_id_being_moved": src['id'],
+                          "from_coords": slot_centers[a], "to_coords": slot_centers[b], "tier": tier,
+                          "result_ids": (src_id, dst_id), "result_counts": (src['count'] - moved, dst['count'] + moved)})
+            dst.update(id=dst_id, count=dst['count'] + moved); src.update(id=src_id, count=src['count'] - moved)
+            if src_id is None: stacks.remove(src); emptied.add(src['original_slot_index'])
+            if dst['count'] >= CONSOLIDATE_MAX_STACK: stacks.remove(dst)
+    remaining = [it for it in items if it['original_slot_index'] not in emptied]
+    report = {"drags": len(moves), "freed": len(emptied), "before": len(items), "after": len(remaining),
+              "travel": estimate_drag_travel([(m['from_slot_idx'], m['to_slot_idx']) for m in moves], slot_centers)}
+    return moves, remaining, report
+
+# --- PAGED (SCROLLING) SCAN ---
+# Libraries taller than one view are scanned page by page: scroll, capture, and classify the previous page on a
+# worker thread meanwhile. Overlapping rows between pages are found by comparing per-row pixel hashes, giving one
+# global slot model (global slot = global_row*NUM_COLS + col). The plan is then made page by page (plan_paged_swaps):
+# every drag has both slots on the page it runs on, and pages are visited in sweeps rather than once per drag.
+def get_grid_scroll_point(game_x, game_y): # Mouse position for the wheel: centre of the first visible slot
+    center_x, center_y = get_grid_layout().centers[0].tolist()
+    return game_x + center_x, game_y + center_y
+
+def scroll_inventory(clicks, game_x, game_y): # Positive = up (pyautogui convention). Parks the mouse off the grid after.
+    if not clicks: return
+    sx, sy = get_grid_scroll_point(game_x, game_y)
+    pyautogui.moveTo(sx, sy); pyautogui.scroll(clicks)
+    pyautogui.moveTo(max(game_x, game_x + GRID_OFFSET_X - SLOT_GAP_X - 10), sy) # No hover highlight in the next capture
+    time.sleep(PAGE_SCROLL_SETTLE_DELAY)
+
+def get_grid_row_hashes(img_arr, origin=(0, 0)): # One hash per grid row strip; low 4 bits dropped so tiny noise doesn't break matching
+    row_ys, col_xs = get_grid_slot_origins(MAX_NUM_ROWS, origin)
+    x0, x1 = int(col_xs[0]), int(col_xs[-1]) + SLOT_WIDTH
+    return [hashlib.sha1(np.ascontiguousarray(img_arr[y:y+SLOT_HEIGHT, x0:x1] >> 4).tobytes()).hexdigest() for y in row_ys]
+
+def find_page_overlap(prev_hashes, new_hashes, expected=None): # Rows shared by the bottom of prev and the top of new
+    n = len(prev_hashes)
+    matches = [k for k in range(n - 1, 0, -1) if prev_hashes[n - k:] == new_hashes[:k]]
+    if expected in matches: return expected # Empty rows all look alike; prefer the shift we already measured
+    return matches[0] if matches else 0
+
+def merge_page_scans(pages): # Page scan results -> global tiers array and items (first page showing a row wins)
+    total_rows = pages[-1]['top'] + MAX_NUM_ROWS
+    tiers = np.zeros((total_rows, NUM_COLS), dtype=np.int32); items = []; covered = 0
+    for p, page in enumerate(pages):
+        res = page['future'].result(); top = page['top']
+        new_from = max(0, covered - top) # Local rows below this index were already taken from an earlier page
+        tiers[top + new_from:top + MAX_NUM_ROWS] = res['tiers'][new_from:]
+        for it in res['items']:
+            r, c = divmod(it['original_slot_index'], NUM_COLS)
+            if r < new_from: continue
+            g_idx = (top + r) * NUM_COLS + c
+            items.append(dict(it, original_slot_index=g_idx, id=f"item_orig_{g_idx}", page=p))
+        covered = top + MAX_NUM_ROWS
+    return tiers, items
+
+def scan_inventory_pages(game_rect): # -> scan dict like scan_grid_screenshot plus page geometry, or None
+    game_x, game_y, _, _ = game_rect
+    capture_bbox, capture_origin = get_grid_capture_bbox(game_rect)
+    log_message(f"Paged scan: scrolling to top, then {PAGE_SCROLL_CLICKS} clicks per page (max {PAGE_MAX_PAGES} pages).")
+    scroll_inventory(PAGE_SCROLL_TOP_CLICKS, game_x, game_y)
+    pages = []; expected_overlap = None
+    with ThreadPoolExecutor(max_workers=1) as classifier: # Page N is classified while page N+1 is scrolled to and captured
+        for p in range(PAGE_MAX_PAGES):
+            if is_cancel_requested(): log_message(f"Paged scan cancelled at page {p}."); return None
+            if p > 0: scroll_inventory(PAGE_SCROLL_CLICKS, game_x, game_y)
+            try: shot = capture_region(capture_bbox)
+            except Exception as e: log_message(f"Screenshot error on page {p}: {e}"); return None
+            debug_artifact('summary', f"Step_0_FullScan_Screenshot_P{p}.png", shot)
+            hashes = get_grid_row_hashes(shot, capture_origin); top = 0
+            if pages:
+                if hashes == pages[-1]['hashes']: log_message(f"Paged scan: page {p} identical to page {p-1}, end of list reached."); break
+                overlap = find_page_overlap(pages[-1]['hashes'], hashes, expected_overlap)
+                if expected_overlap is None: expected_overlap = overlap
+                top = pages[-1]['top'] + MAX_NUM_ROWS - overlap
+                log_message(f"Paged scan: page {p} starts at global row {top} ({overlap} rows overlap page {p-1}).")
+                if overlap == 0: log_message("  WARN: No overlapping rows. Drags between these pages won't be possible; use fewer ScrollClicksPerPage.")
+            pages.append({'top': top, 'hashes': hashes, 'scroll_clicks': p * PAGE_SCROLL_CLICKS,
+                          'future': classifier.submit(scan_grid_screenshot, shot, capture_origin, game_x, game_y, False, f"_P{p}")})
+            if len(pages) >= 2: # The previous page finished classifying while we scrolled; has the inventory ended?
+                prev_tiers, _ = merge_page_scans(pages[:-1])
+                eff_rows, last_row = get_effective_scan_rows(prev_tiers)
+                if last_row < prev_tiers.shape[0] - 1: log_message(f"Paged scan: inventory ends at global row {eff_rows}."); break
+    tiers, items = merge_page_scans(pages)
+    eff_rows, last_row = get_effective_scan_rows(tiers)
+    items = [it for it in items if it['original_slot_index'] < eff_rows * NUM_COLS]
+    log_message(f"Paged scan: {len(pages)} pages, {tiers.shape[0]} global rows, {len(items)} items.")
+    return {'items': items, 'tiers': tiers, 'eff_rows': eff_rows, 'last_scanned_row': last_row,
+            'page_tops': [pg['top'] for pg in pages], 'page_scroll_clicks': [pg['scroll_clicks'] for pg in pages],
+            'current_page': len(pages) - 1}
+
+def get_page_scroll(pages, from_page, to_page): # -> (top_clicks, clicks): scroll up top_clicks first (0: don't), then clicks
+    # The scan reached each page ScrollClicksPerPage after the one before. Only the last page can have moved less (the list
+    # ended there), so clicks between two other pages are exact. To or from the last page, go back to the top first (at least
+    # the clicks that reached from_page, however long the list) and count from there.
+    clicks = pages['page_scroll_clicks']; last = len(clicks) - 1
+    if last in (from_page, to_page): return max(PAGE_SCROLL_TOP_CLICKS, abs(clicks[from_page])), clicks[to_page]
+    return 0, clicks[to_page] - clicks[from_page]
+
+def scroll_to_page(pages, page, game_x, game_y): # From wherever the list is now (e.g. after a restart)
+    clicks = pages['page_scroll_clicks']
+    scroll_inventory(max([PAGE_SCROLL_TOP_CLICKS] + [abs(c) for c in clicks]), game_x, game_y); scroll_inventory(clicks[page], game_x, game_y)
+
+def get_page_regions(page_tops, num_rows): # -> (own, shared) global slots per page
+    # own: rows from this page's top down to where the next page starts; shared: the next page's own rows this page shows too
+    tops = [top for top in page_tops if top < num_rows] or [0]; ends = tops[1:] + [num_rows]
+    own = [list(range(top * NUM_COLS, end * NUM_COLS)) for top, end in zip(tops, ends)]
+    shared = [list(range(ends[p] * NUM_COLS, min(tops[p] + MAX_NUM_ROWS, ends[p + 1]) * NUM_COLS)) for p in range(len(tops) - 1)]
+    return own, shared
+
+def plan_paged_swaps(slot_classes, target_classes, page_tops, first_page): # -> [(page, slot a, slot b)] or None
+    # A book only crosses from one page's own rows into the next page's through the rows both pages show. flows[p][cls] is
+    # how many more books of cls the rows above page p+1 hold than they need: > 0 some must go down, < 0 some must come up.
+    # Swapping one of each settles a unit of both at once, so pages are visited in sweeps (up, down, up, ...) doing every
+    # such swap the page allows; a book rides along a whole sweep. Books that must go up wait in the shared rows for the next
+    # upward pass. When nothing crosses a page's own rows any more they are sorted in place with swap cycles.
+    cls = list(slot_classes); num_rows = -(-len(cls) // NUM_COLS); cls += [None] * (num_rows * NUM_COLS - len(cls))
+    want = [target_classes[s] if s < len(target_classes) else None for s in range(len(cls))] # Slots past the items end empty
+    own, shared = get_page_regions(page_tops, num_rows); last = len(own) - 1
+    region = [p for p, slots in enumerate(own) for _ in slots]
+    flows, surplus = [], {}
+    for p in range(last):
+        for s in own[p]: surplus[cls[s]] = surplus.get(cls[s], 0) + 1; surplus[want[s]] = surplus.get(want[s], 0) - 1
+        flows.append({c: n for c, n in surplus.items() if n})
+    if any(flows[p] and not shared[p] for p in range(last)):
+        log_message("ERR: Books must move between pages that share no rows. Reduce ScrollClicksPerPage and rescan."); return None
+    swaps = []; done = [False] * len(own)
+    flow = lambda p, c: flows[p].get(c, 0) if 0 <= p < last else 0
+
+    def swap(page, a, b):
+        if cls[a] == cls[b]: return
+        if region[a] != region[b]: # Crosses the boundary below the upper slot's region
+            upper, lower = (a, b) if region[a] < region[b] else (b, a); f = flows[region[upper]]
+            for c, d in ((cls[upper], -1), (cls[lower], 1)):
+                f[c] = f.get(c, 0) + d
+                if not f[c]: del f[c]
+        cls[a], cls[b] = cls[b], cls[a]; swaps.append((page, a, b))
+
+    def visit(q, carry=False):
+        if q < last: # Books going down leave q's own rows for the shared rows; books coming up take their place
+            waiting_rows = set(shared[q - 1]) if q > 0 else set()
+            while True:
+                down = [s for s in own[q] if flow(q, cls[s]) > 0]; up = [s for s in shared[q] if flow(q, cls[s]) < 0]
+                if not down or not up: break
+                # Prefer swaps that put books where they're wanted, and books that keep going up into the rows page q-1 shares
+                score = lambda ab: ((want[ab[1]] == cls[ab[0]]) + (want[ab[0]] == cls[ab[1]]) - (want[ab[0]] == cls[ab[0]])
+                                    + (ab[0] in waiting_rows and flow(q - 1, cls[ab[1]]) < 0))
+                swap(q, *max(((a, b) for a in down for b in up), key=score))
+        if carry and q + 1 < last: # Stalled: books with further to go cross anyway, as many as the next boundary can use.
+            # What they displace comes up a page and goes back down later: one extra drag each.
+            demand = sum(-n for n in flows[q + 1].values() if n < 0) - sum(flow(q + 1, cls[s]) > 0 for s in own[q + 1])
+            for a in own[q]:
+                if demand <= 0: break
+                if flow(q, cls[a]) <= 0 or flow(q + 1, cls[a]) <= 0: continue
+                room = [z for z in shared[q] if flow(q, cls[z]) >= 0 and flow(q + 1, cls[z]) <= 0 and cls[z] != cls[a]]
+                if not room: break
+                swap(q, a, max(room, key=lambda z: (want[a] == cls[z]) - (want[z] == cls[z]))); demand -= 1
+        if q > 0 and flows[q - 1]: # Books that must go up past page q-1 wait in the rows it shares with page q
+            zone = shared[q - 1]; zone_set = set(zone); f = flows[q - 1]
+            waiting = {}
+            for z in zone:
+                if f.get(cls[z], 0) < 0: waiting[cls[z]] = waiting.get(cls[z], 0) + 1
+            for s in own[q]:
+                c = cls[s]
+                if s in zone_set or f.get(c, 0) >= 0 or waiting.get(c, 0) >= -f[c]: continue
+                room = [z for z in zone if f.get(cls[z], 0) >= 0]
+                if not room: break
+                swap(q, s, max(room, key=lambda z: (want[s] == cls[z]) - (want[z] == cls[z]))); waiting[c] = waiting.get(c, 0) + 1
+        if not done[q] and not (q > 0 and flows[q - 1]) and not (q < last and flows[q]):
+            local = own[q] # Nothing crosses these rows any more: sort them in place
+            for cycle in find_swap_cycles([cls[s] for s in local], [want[s] for s in local]):
+                for i in range(len(cycle) - 1): swap(q, local[cycle[i]], local[cycle[i + 1]])
+            done[q] = True
+
+    pages = range(min(first_page, last), -1, -1); upward = True; idle = rounds = 0
+    while not all(done):
+        before = len(swaps)
+        for q in pages: visit(q, carry=idle >= 2 and not upward)
+        idle = 0 if len(swaps) > before else idle + 1; rounds += 1
+        if idle >= 4 or rounds > 2 * len(cls) + 10: log_message("ERR: Paged plan did not converge. Rescan or reduce ScrollClicksPerPage."); return None
+        upward = not upward; pages = range(last, -1, -1) if upward else range(last + 1)
+    return swaps
+
+def plan_paged_moves(items, scan, game_x, game_y): # Items (global slots) -> drags with page-local coords plus scroll actions, or None
+    page_tops = scan['page_tops']
+    layout = {it['original_slot_index']: it['id'] for it in items}
+    classes = {it['id']: get_item_class(it) for it in items}
+    num_slots = max([len(items)] + [s_idx + 1 for s_idx in layout])
+    swaps = plan_paged_swaps([classes.get(layout.get(s_idx)) for s_idx in range(num_slots)], get_target_classes(items), page_tops, scan['current_page'])
+    if swaps is None: return None
+    plan = []; page = scan['current_page']; page_changes = 0; page_centers = {}
+    for new_page, a, b in swaps:
+        if new_page != page:
+            top_clicks, clicks = get_page_scroll(scan, page, new_page)
+            plan.append({"action": "scroll", "from_page": page, "to_page": new_page, "scroll_clicks": clicks, "top_clicks": top_clicks})
+            page = new_page; page_changes += 1
+        src, dst = (a, b) if layout.get(a) is not None else (b, a)
+        if page not in page_centers: # Screen centers of global slots while this page is scrolled into view
+            page_centers[page] = get_slot_center_coords(game_x, game_y - page_tops[page] * get_grid_layout().pitch[1], page_tops[page] + MAX_NUM_ROWS)
+        centers = page_centers[page]
+        plan.append({"action": "drag", "page": page, "from_slot_idx": src, "to_slot_idx": dst, "item_id_being_moved": layout[src],
+                     "from_coords": centers[src], "to_coords": centers[dst]})
+        layout[src], layout[dst] = layout.get(dst), layout[src]
+    log_message(f"Paged plan: {len(swaps)} drags over {len(page_tops)} pages, {page_changes} page changes.")
+    return plan
+
+# --- CONTAINERS ---
+# Several grids open at the same time (the library plus storage chests), each a [Container <name>] section with its own
+# GridOffsetX/Y, NumCols and NumRows. Slot size, gaps, colour patch and OCR box come from [GridStructure], [ColorPatch]
+# and [OCR]: the game draws every container with the same slot art. Slots are numbered one container after another in
+# [Containers] Names order (container['base'] is its first global slot), so the planner, executor and checkpoints see
+# one long inventory. One capture covers every container; each tier goes to the first container whose Tiers claim it.
+def parse_tier_range(text): # '1-2', '4' or '3,5' -> set of tiers; '' -> None (any tier no other container claims)
+    tiers = set()
+    for part in filter(None, (p.strip() for p in text.split(','))):
+        low, _, high = part.partition('-')
+        tiers.update(range(int(low), int(high or low) + 1))
+    return tiers or None
+
+def load_container_settings(): # [Containers] Names -> CONTAINERS; containers with bad values are left out
+    global CONTAINERS, CONTAINERS_ENABLED
+    containers = []; base = 0
+    for name in filter(None, (n.strip() for n in get_cfg_val('Containers', 'Names').split(','))):
+        section = get_config_section(f"Container {name}")
+        if section is None: log_message(f"Config ERROR: No [Container {name}] section. Container '{name}' ignored."); continue
+        try:
+            container = {'name': name, 'offset': (config.getint(section, 'GridOffsetX'), config.getint(section, 'GridOffsetY')),
+                         'cols': config.getint(section, 'NumCols', fallback=NUM_COLS), 'rows': config.getint(section, 'NumRows', fallback=MAX_NUM_ROWS),
+                         'tiers': parse_tier_range(config.get(section, 'Tiers', fallback=''))}
+        except (ValueError, configparser.Error) as e: log_message(f"Config ERROR: [{section}]: {e}. Container '{name}' ignored."); continue
+        if container['cols'] <= 0 or container['rows'] <= 0: log_message(f"Config ERROR: [{section}] needs NumCols and NumRows > 0. Container '{name}' ignored."); continue
+        container.update(base=base, slots=container['cols'] * container['rows']); base += container['slots']; containers.append(container)
+    CONTAINERS = containers
+    if CONTAINERS_ENABLED and not CONTAINERS: log_message("Config ERROR: [Containers] Enabled without a valid container. Using [GridStructure]."); CONTAINERS_ENABLED = False
+    if CONTAINERS_ENABLED and PAGED_SCAN_ENABLED: log_message("WARN: [Paging] is ignored while [Containers] is enabled.")
+
+def get_container_layout(container): # GridLayout of one container; rebuilt only when the slot art settings change
+    key = (*container['offset'], container['cols']) + get_grid_layout_key()[3:]
+    layout = container.get('layout')
+    if layout is None or layout.key != key: layout = container['layout'] = build_grid_layout(key, container['rows'])
+    return layout
+
+def locate_container_slot(slot_idx): # Global slot -> (container, slot within it)
+    container = CONTAINERS[bisect.bisect_right([c['base'] for c in CONTAINERS], slot_idx) - 1]
+    return container, slot_idx - container['base']
+
+def get_container_slot_centers(game_x, game_y): # Absolute (x, y) centre of every global slot
+    centers = np.vstack([get_container_layout(c).centers for c in CONTAINERS]) + (game_x, game_y)
+    return [tuple(pt) for pt in centers.tolist()]
+
+def get_containers_capture_bbox(game_rect): # -> (absolute bbox, origin) of the one capture holding every container
+    game_x, game_y, game_w, game_h = game_rect
+    boxes = np.vstack([get_container_layout(c).sample_boxes for c in CONTAINERS])
+    left, top = max(0, int(boxes[:, 0].min())), max(0, int(boxes[:, 1].min()))
+    right, bottom = min(game_w, int(boxes[:, 2].max())), min(game_h, int(boxes[:, 3].max()))
+    if right <= left or bottom <= top: left, top, right, bottom = 0, 0, game_w, game_h # Same fallback as get_grid_capture_bbox
+    return (game_x + left, game_y + top, game_x + right, game_y + bottom), (left, top)
+
+def scan_container_screenshot(screenshot_arr, origin, game_x, game_y): # Stage 1 over every container -> scan dict, global slots
+    items = []; found = []
+    for container in CONTAINERS:
+        if is_cancel_requested(): break
+        # Every row is read: a chest can have holes anywhere, so the early-stop rules don't apply
+        scan = scan_grid_screenshot(screenshot_arr, origin, game_x, game_y, stop_early=False, debug_tag=f"_C{container['name']}", grid=get_container_layout(container))
+        for it in scan['items']:
+            s_idx = it['original_slot_index'] + container['base']
+            items.append(dict(it, original_slot_index=s_idx, id=f"item_orig_{s_idx}"))
+        found.append(f"{container['name']} {len(scan['items'])}/{container['slots']}")
+    log_message(f"Container scan: {', '.join(found)} slots occupied.")
+    return {'items': items, 'eff_rows': sum(c['rows'] for c in CONTAINERS)}
+
+def classify_container_tiers(img_arr, origin): # One capture of every container -> tier per global slot (0 = empty)
+    tiers = []
+    for container in CONTAINERS:
+        tiers += classify_grid_tiers(img_arr, origin=origin, grid=get_container_layout(container))[0].reshape(-1).tolist()
+    return tiers
+
+def get_container_target_classes(items): # -> class per global slot (None = ends empty); each container packed tier asc, count desc
+    assigned = {c['name']: [] for c in CONTAINERS}; overflow = []
+    fallback = next((c for c in CONTAINERS if c['tiers'] is None), None)
+    for cls in get_target_classes(items):
+        home = next((c for c in CONTAINERS if c['tiers'] and cls[0] in c['tiers']), fallback)
+        if home is None: overflow.append(cls)
+        else: assigned[home['name']].append(cls)
+    for c in CONTAINERS: overflow += assigned[c['name']][c['slots']:]; del assigned[c['name']][c['slots']:]
+    if overflow: log_message(f"WARN: {len(overflow)} items have no room in their container (tiers {sorted({cls[0] for cls in overflow})}); they fill free slots elsewhere.")
+    for c in sorted(CONTAINERS, key=lambda c: c['tiers'] is not None): # Overflow fills catch-all containers first
+        free = c['slots'] - len(assigned[c['name']])
+        assigned[c['name']] += overflow[:free]; overflow = overflow[free:]
+    targets = [None] * sum(c['slots'] for c in CONTAINERS)
+    for c in CONTAINERS: targets[c['base']:c['base'] + len(assigned[c['name']])] = sorted(assigned[c['name']], key=lambda k: (k[0], -k[1]))
+    return targets
+
+def plan_container_moves(items, slot_centers, target_classes): # -> (moves, report): one plan over every container
+    slot_container = [ci for ci, c in enumerate(CONTAINERS) for _ in range(c['slots'])]
+    total_slots = len(slot_container)
+    layout = [None] * total_slots
+    for it in items: layout[it['original_slot_index']] = it['id']
+    classes = {it['id']: get_item_class(it) for it in items}
+    slot_classes = [classes.get(i) for i in layout]
+    # Containers are spaced far apart for the "nearest slot" choice, so cycles stay inside one container when they can
+    cycles = find_swap_cycles(slot_classes, target_classes, slot_position=lambda s: s + slot_container[s] * total_slots)
+    batches = {} # Containers a cycle touches -> its cycles; cycles share no slots, so batches can run one after another
+    for cycle in cycles:
+        owners = [slot_container[s] for s in cycle]
+        cross = next((i for i in range(len(cycle)) if owners[i] != owners[i - 1]), None)
+        if cross is not None: cycle = cycle[cross:] + cycle[:cross] # The step a cycle leaves out is then a cross-container one
+        batches.setdefault(tuple(sorted(set(owners))), []).append(cycle)
+    moves = []; cycle_idx = 0
+    for key in sorted(batches, key=lambda k: (len(k) == 1, k)): # Items change containers first, then one container at a time
+        for drags in order_cycles_for_travel(batches[key], slot_classes, slot_centers, keep_rotation=len(key) > 1):
+            for a, b in drags:
+                moves.append({"from_slot_idx": a, "to_slot_idx": b, "item_id_being_moved": layout[a], "cycle": cycle_idx,
+                              "from_coords": slot_centers[a], "to_coords": slot_centers[b]})
+                layout[a], layout[b] = layout[b], layout[a]
+            cycle_idx += 1
+    report = {"drags": len(moves), "cycles": len(cycles), "batches": len(batches),
+              "cross_drags": sum(slot_container[m['from_slot_idx']] != slot_container[m['to_slot_idx']] for m in moves),
+              "travel": estimate_drag_travel([(m['from_slot_idx'], m['to_slot_idx']) for m in moves], slot_centers)}
+    return moves, report
+
+def list_containers(): # Console 'containers'
+    if not CONTAINERS: log_message("No containers configured ([Containers] Names)."); return
+    for c in CONTAINERS:
+        tiers = ",".join(map(str, sorted(c['tiers']))) if c['tiers'] else "any"
+        log_message(f"  {c['name']}: {c['cols']}x{c['rows']} at ({c['offset'][0]},{c['offset'][1]}), slots {c['base']}-{c['base'] + c['slots'] - 1}, tiers {tiers}")
+    log_message(f"Containers {'enabled' if CONTAINERS_ENABLED else 'disabled'} ([Containers] Enabled).")
+
+def set_container_origin(name, delay=3): # Console 'containerorigin <name>': hover the container's first slot (top-left)
+    log_message(f"Hover the TOP-LEFT of the first slot of '{name}'. Reading the mouse in {delay}s...")
+    time.sleep(delay)
+    game_rect = get_game_window_rect()
+    if not game_rect: log_message("ERR: Game window not found."); return
+    mx, my = pyautogui.position(); offset = (mx - game_rect[0], my - game_rect[1])
+    names = [n.strip() for n in get_cfg_val('Containers', 'Names').split(',') if n.strip()]
+    if name not in names: names.append(name)
+    cfg_to_save = configparser.ConfigParser(interpolation=None)
+    if os.path.exists(CONFIG_FILE): cfg_to_save.read(CONFIG_FILE)
+    for target in (cfg_to_save, config): # The file, and the running settings
+        section = next((s for s in target.sections() if s.lower() == f"container {name}".lower()), f"Container {name}")
+        if not target.has_section(section): target.add_section(section)
+        target.set(section, 'gridoffsetx', str(offset[0])); target.set(section, 'gridoffsety', str(offset[1]))
+        containers_section = next((s for s in target.sections() if s.lower() == 'containers'), 'containers')
+        if not target.has_section(containers_section): target.add_section(containers_section)
+        target.set(containers_section, 'names', ", ".join(names))
+    with open(CONFIG_FILE, 'w') as configfile: cfg_to_save.write(configfile)
+    load_container_settings()
+    log_message(f"Container '{name}' origin: X={offset[0]}, Y={offset[1]}. Saved to {CONFIG_FILE}; set its NumCols, NumRows and Tiers there if they differ.")
+
+# --- CLOSED-LOOP EXECUTION ---
+# After every drag only the source and destination slots are grabbed and compared with the layout the plan
+# expects at that point. A mismatch is re-checked once (the UI can lag), then both slots are re-read and the
+# rest of the plan is recomputed from the corrected layout.
+def read_slot_capture(slot_arr, read_count=False, slot_label=""): # Array from capture_slot_regions -> (tier, count); tier 0 = empty
+    layout = get_grid_layout(); sample_tl = np.tile(layout.sample_boxes[0, :2], 2) # Boxes of slot 0, made relative to its capture
+    px, py, pr, pb = (layout.patch_boxes[0] - sample_tl).tolist()
+    patch = slot_arr[max(0, py):pb, max(0, px):pr]
+    tier = identify_tier_from_color(tuple(patch.reshape(-1, 3).mean(axis=0).astype(int))) if patch.size else None
+    if not tier: return 0, None
+    if not read_count: return tier, None
+    ox, oy, orr, ob = (layout.ocr_boxes[0] - sample_tl).tolist()
+    return tier, get_stack_count_from_image_region(Image.fromarray(slot_arr[oy:ob, ox:orr]), slot_label)
+
+def slot_matches(observed, expected): # observed (tier, count or None) vs expected class (tier, count) or None for empty
+    if expected is None: return observed[0] == 0
+    return observed[0] == expected[0] and (observed[1] is None or observed[1] == expected[1])
+
+def check_drag_result(game_x, game_y, slots, expected): # slots: visible (src, dst); expected: class per slot -> (ok, observed)
+    # Counts are only OCR'd when the tier alone can't tell the two expected stacks apart.
+    read_count = None not in expected and expected[0] != expected[1] and expected[0][0] == expected[1][0]
+    grabs = capture_slot_regions(game_x, game_y, slots)
+    observed = [read_slot_capture(grabs[s_idx], read_count, f"V{s_idx}") for s_idx in slots]
+    return all(slot_matches(o, e) for o, e in zip(observed, expected)), observed
+
+def repair_layout(layout, items_by_id, slots, involved_ids, observed, repair_idx): # Puts what was actually seen into layout
+    # Items that were part of the failed drag keep their ids when their class shows up again; anything else is a new item.
+    unused = [item_id for item_id in involved_ids if item_id is not None]
+    for s_idx, (tier, count) in zip(slots, observed):
+        if tier == 0: layout[s_idx] = None; continue
+        match = next((item_id for item_id in unused if get_item_class(items_by_id[item_id]) == (tier, count)), None)
+        if match is None:
+            match = f"item_seen_{s_idx}_{repair_idx}"
+            items_by_id[match] = {'tier': tier, 'count': count, 'original_slot_index': s_idx, 'id': match}
+        else: unused.remove(match)
+        layout[s_idx] = match
+
+def replan_remaining_moves(layout, items_by_id, game_x, game_y, pages, page): # Fresh plan from the current layout -> moves or None
+    items = [dict(items_by_id[item_id], original_slot_index=s_idx, id=item_id) for s_idx, item_id in sorted(layout.items()) if item_id is not None]
+    if not items: return []
+    if CONTAINERS_ENABLED: slot_centers = get_container_slot_centers(game_x, game_y)
+    else:
+        num_slots = max([len(items)] + [it['original_slot_index'] + 1 for it in items])
+        slot_centers = get_slot_center_coords(game_x, game_y, -(-num_slots // NUM_COLS))
+    merges = []
+    if can_consolidate_stacks(bool(pages)): merges, items, _ = plan_stack_merges(items, slot_centers)
+    if CONTAINERS_ENABLED: return merges + plan_container_moves(items, slot_centers, get_container_target_classes(items))[0]
+    if pages: return plan_paged_moves(items, dict(pages, current_page=page), game_x, game_y)
+    return merges + plan_sort_moves(items, slot_centers)[0]
+
+# --- PLAN CHECKPOINTS ---
+# The plan is written to EXECUTOR_CHECKPOINT_FILE when it is made and again after every completed move, together with
+# a fingerprint of the scan it came from and the layout expected at that point. An interrupted or stopped sort can then
+# be resumed (even after a restart): one grid capture checks the tiers against that layout, then the next move runs.
+def get_plan_fingerprint(items): # Scan contents + reading settings -> short hash
+    scan_key = sorted((it['original_slot_index'], it['tier'], it['count']) for it in items)
+    return hashlib.blake2b(json.dumps([scan_key, repr(get_scan_settings_signature())]).encode(), digest_size=8).hexdigest()
+
+def get_settings_fingerprint(): return hashlib.blake2b(repr(get_scan_settings_signature()).encode(), digest_size=8).hexdigest()
+
+def encode_plan_move(m): # Move dict -> compact list
+    if m.get("action") == "scroll": return ["scroll", m['from_page'], m['to_page'], m['scroll_clicks'], m.get('top_clicks', 0)]
+    if m.get("action") == "merge": return ["merge", m['from_slot_idx'], m['to_slot_idx'], m['item_id_being_moved'], *m['from_coords'], *m['to_coords'],
+                                           m['tier'], *m['result_ids'], *m['result_counts']]
+    return [m['from_slot_idx'], m['to_slot_idx'], m['item_id_being_moved'], *m['from_coords'], *m['to_coords'], m.get('page', -1)]
+
+def decode_plan_move(m):
+    if m[0] == "scroll": return {"action": "scroll", "from_page": m[1], "to_page": m[2], "scroll_clicks": m[3], "top_clicks": m[4] if len(m) > 4 else 0}
+    if m[0] == "merge": return {"action": "merge", "from_slot_idx": m[1], "to_slot_idx": m[2], "item_id_being_moved": m[3], "from_coords": (m[4], m[5]),
+                                "to_coords": (m[6], m[7]), "tier": m[8], "result_ids": (m[9], m[10]), "result_counts": (m[11], m[12])}
+    move = {"from_slot_idx": m[0], "to_slot_idx": m[1], "item_id_being_moved": m[2], "from_coords": (m[3], m[4]), "to_coords": (m[5], m[6])}
+    if m[7] >= 0: move.update(action="drag", page=m[7])
+    return move
+
+def save_plan_checkpoint(plan): # Atomic rewrite; a failed write never stops the sort
+    if not EXECUTOR_CHECKPOINT_FILE: return
+    data = {'fingerprint': plan['fingerprint'], 'settings': plan['settings'], 'game_origin': list(plan['game_origin']),
+            'next_move': plan['next_move'], 'page': plan['page'], 'pages': plan['pages'],
+            'items': [[it['id'], it['tier'], it['count'], it['original_slot_index']] for it in plan['items']],
+            'layout': [[s_idx, item_id] for s_idx, item_id in sorted(plan['layout'].items())],
+            'moves': [encode_plan_move(m) for m in plan['moves']]}
+    try:
+        with open(EXECUTOR_CHECKPOINT_FILE + '.tmp', 'w') as f: json.dump(data, f, separators=(',', ':'))
+        os.replace(EXECUTOR_CHECKPOINT_FILE + '.tmp', EXECUTOR_CHECKPOINT_FILE)
+    except Exception as e: log_message(f"WARN: Could not write checkpoint '{EXECUTOR_CHECKPOINT_FILE}': {e}")
 
+def load_plan_checkpoint(): # -> plan dict like last_calculated_plan, or None
+    if not EXECUTOR_CHECKPOINT_FILE or not os.path.exists(EXECUTOR_CHECKPOINT_FILE): return None
+    try:
+        with open(EXECUTOR_CHECKPOINT_FILE) as f: data = json.load(f)
+        items = [{'id': i, 'tier': t, 'count': c, 'original_slot_index': s} for i, t, c, s in data['items']]
+        return {'moves': [decode_plan_move(m) for m in data['moves']], 'items': items, 'pages': data['pages'],
+                'layout': {s_idx: item_id for s_idx, item_id in data['layout']}, 'next_move': data['next_move'], 'page': data['page'],
+                'game_origin': tuple(data['game_origin']), 'fingerprint': data['fingerprint'], 'settings': data['settings']}
+    except Exception as e: log_message(f"WARN: Could not read checkpoint '{EXECUTOR_CHECKPOINT_FILE}': {e}"); return None
+
+def clear_plan_checkpoint():
+    if EXECUTOR_CHECKPOINT_FILE and os.path.exists(EXECUTOR_CHECKPOINT_FILE):
+        try: os.remove(EXECUTOR_CHECKPOINT_FILE)
+        except OSError as e: log_message(f"WARN: Could not remove checkpoint: {e}")
+
+def shift_plan_coords(plan, dx, dy): # The game window moved since the plan was made
+    for m in plan['moves']:
+        if 'from_coords' in m: m['from_coords'] = (m['from_coords'][0] + dx, m['from_coords'][1] + dy); m['to_coords'] = (m['to_coords'][0] + dx, m['to_coords'][1] + dy)
+    plan['game_origin'] = (plan['game_origin'][0] + dx, plan['game_origin'][1] + dy)
+
+def verify_checkpoint_layout(plan, game_rect): # One grid capture, tiers only -> number of visible slots that differ
+    game_x, game_y, _, _ = game_rect
+    pages = plan['pages']
+    if pages: scroll_to_page(pages, plan['page'], game_x, game_y) # Put the list back where the checkpoint was taken
+    if CONTAINERS_ENABLED:
+        capture_bbox, capture_origin = get_containers_capture_bbox(game_rect)
+        seen_tiers = classify_container_tiers(capture_region(capture_bbox), capture_origin)
+    else:
+        capture_bbox, capture_origin = get_grid_capture_bbox(game_rect)
+        seen_tiers = classify_grid_tiers(capture_region(capture_bbox), origin=capture_origin)[0].reshape(-1).tolist()
+    top = pages['page_tops'][plan['page']] * NUM_COLS if pages else 0
+    items_by_id = get_plan_items_by_id(plan['items'], plan['moves'])
+    mismatches = []
+    for v, seen in enumerate(seen_tiers):
+        item_id = plan['layout'].get(top + v)
+        expected = items_by_id[item_id]['tier'] if item_id is not None else 0
+        if seen != expected: mismatches.append(f"{top + v}: T{expected} expected, T{seen} seen")
+    return mismatches
+
+def get_resumable_plan(): # Unfinished plan from memory, else from the checkpoint file -> plan or None
+    plan = last_calculated_plan if last_calculated_plan and last_calculated_plan.get('next_move') else load_plan_checkpoint()
+    if plan is None or plan['next_move'] >= len(plan['moves']): log_message("Nothing to resume. Plan with the plan hotkey."); return None
+    if plan['settings'] != get_settings_fingerprint():
+        log_message("ERR: Calibration or reading settings changed since this plan was made. Rescan with the plan hotkey."); return None
+    return plan
+
+def resume_sort_plan(): execute_sort_plan(resume=True)
 
 # --- MAIN LOGIC (calculate_sort_plan, execute_sort_plan) ---
 # These functions need to be complete and use the global config variables.
 # calculate_sort_plan needs the TypeError fix for draw.rectangle
+# --- INCREMENTAL RESCAN ---
+# The last scan of each view is kept in memory. A new scan hashes every slot's pixels and only re-runs
+# tier detection and OCR on slots whose hash changed; everything else is reused as-is.
+last_scan_state = {} # view tag ('' or '_P<page>') -> {'signature', 'fingerprints', 'tiers', 'colors', 'counts'}
+
+def get_scan_settings_signature(): # Anything that changes how a slot is read invalidates the previous scan
+    return (GRID_OFFSET_X, GRID_OFFSET_Y, NUM_COLS, MAX_NUM_ROWS, SLOT_WIDTH, SLOT_HEIGHT, SLOT_GAP_X, SLOT_GAP_Y,
+            COLOR_PATCH_RELATIVE_X, COLOR_PATCH_RELATIVE_Y, COLOR_PATCH_SIZE, COLOR_TOLERANCE, tuple(sorted(TIER_COLORS.items())),
+            OCR_RELATIVE_X, OCR_RELATIVE_Y, OCR_WIDTH, OCR_HEIGHT, OCR_UPSCALE_FACTOR, OCR_THRESHOLD_VALUE, OCR_ENGINE,
+            digit_templates['signature'] if digit_templates is not None else '',
+            tier_classifier['signature'] if tier_classifier is not None else '',
+            tuple((c['name'], c['offset'], c['cols'], c['rows'], tuple(sorted(c['tiers'] or ()))) for c in CONTAINERS) if CONTAINERS_ENABLED else ())
+
+def get_slot_fingerprints(img_arr, origin=(0, 0), grid=None): # (rows, cols) object array of per-slot pixel hashes
+    layout, num_rows = get_scan_grid(grid)
+    row_ys, col_xs = get_grid_slot_origins(num_rows, origin, layout)
+    fingerprints = np.empty((num_rows, layout.cols), dtype=object)
+    for r, y in enumerate(row_ys):
+        for c, x in enumerate(col_xs):
+            region = img_arr[max(0, y):y + SLOT_HEIGHT, max(0, x):x + SLOT_WIDTH]
+            fingerprints[r, c] = hashlib.blake2b(np.ascontiguousarray(region).tobytes(), digest_size=8).digest()
+    return fingerprints
+
+def forget_last_scan(): last_scan_state.clear() # Next scan re-analyses every slot
+
+def scan_grid_screenshot(screenshot_arr, origin, game_x, game_y, stop_early=True, debug_tag="", grid=None): # Stage 1 for one grid capture
+    # screenshot_arr: HxWx3 RGB array from capture_region; origin: its top-left relative to the game window; grid: see get_scan_grid.
+    # Returns {'items': [...], 'tiers': (rows, cols) array, 'eff_rows': int, 'last_scanned_row': int}.
+    # With stop_early=False every row is read (paged scans decide where the inventory ends across pages).
+    scanned_items_initial_state=[] # Stores items with their initial physical slot data
+    # Annotated layout image; no copy or drawing at all when debug images are off
+    debug_ss_slots = Image.fromarray(screenshot_arr) if is_debug_level('summary') else None
+    draw = ImageDraw.Draw(debug_ss_slots) if debug_ss_slots is not None else None
+    img_h, img_w = screenshot_arr.shape[:2]
+    layout, num_rows = get_scan_grid(grid); num_cols = layout.cols
+
+    # Tier of every slot comes from one vectorized pass; the row early-stop rules then work on that array.
+    # Incremental: only slots whose pixels changed since the last scan of this view are re-analysed
+    prev_scan = last_scan_state.get(debug_tag) if INCREMENTAL_RESCAN else None
+    fingerprints = get_slot_fingerprints(screenshot_arr, origin, grid) if INCREMENTAL_RESCAN else None
+    if prev_scan is not None and prev_scan['signature'] != get_scan_settings_signature(): prev_scan = None
+    changed = np.ones((num_rows, num_cols), dtype=bool) if prev_scan is None else (fingerprints != prev_scan['fingerprints'])
+    with perf_span('tiers', tag=debug_tag): slot_tiers, slot_colors = classify_grid_tiers(screenshot_arr, num_rows, changed, origin, grid)
+    perf_count('slots_scanned', int(changed.sum()))
+    if prev_scan is not None:
+        slot_tiers[~changed] = prev_scan['tiers'][~changed]; slot_colors[~changed] = prev_scan['colors'][~changed]
+    if stop_early: eff_rows, last_scanned_row = get_effective_scan_rows(slot_tiers)
+    else: eff_rows, last_scanned_row = num_rows, num_rows - 1
+    if tier_classifier is not None: log_tier_rejections(slot_colors, lookup_tier_lut(slot_colors)[1], last_scanned_row + 1)
+    to_capture = tuple(origin) * 2 # Window-relative (l, t, r, b) -> relative to the capture
+    num_slots = num_rows * num_cols
+    slot_tls = layout.slot_tl[:num_slots] - origin; ocr_boxes = layout.ocr_boxes[:num_slots] - to_capture
+    centers_abs = layout.centers[:num_slots] + (game_x, game_y)
+
+    for s_idx in range((last_scanned_row + 1) * num_cols if draw is not None else 0):
+        # Slot, then colour patch sample area, relative to the capture
+        s_rel_x, s_rel_y = slot_tls[s_idx].tolist()
+        draw.rectangle([s_rel_x, s_rel_y, s_rel_x+SLOT_WIDTH, s_rel_y+SLOT_HEIGHT], outline="blue", width=1)
+        draw.text((s_rel_x+2,s_rel_y+2), str(s_idx), fill="yellow")
+        draw.rectangle((layout.patch_boxes[s_idx] - to_capture).tolist(), outline="red", width=1)
+
+    ocr_crops = {}; slot_scan_notes = {} # slot_idx -> raw OCR crop / (row-col label, patch colour) for the log
+    reused_counts = {} # slot_idx -> count carried over from the previous scan
+    for r, c in zip(*np.nonzero(slot_tiers[:eff_rows])): # Row-major order, occupied slots only
+        r, c = int(r), int(c); s_idx = r*num_cols+c
+        tier = int(slot_tiers[r, c]); avg_c = tuple(int(v) for v in slot_colors[r, c])
+
+        # OCR crop coordinates relative to the capture
+        ocr_l_rel, ocr_t_rel, ocr_r_rel, ocr_b_rel = ocr_boxes[s_idx].tolist()
+        if draw is not None: draw.rectangle([ocr_l_rel, ocr_t_rel, ocr_r_rel, ocr_b_rel], outline="lime", width=1)
+
+        if not changed[r, c] and s_idx in prev_scan['counts']: reused_counts[s_idx] = prev_scan['counts'][s_idx]
+        elif ocr_l_rel < ocr_r_rel and ocr_t_rel < ocr_b_rel and \
+           ocr_r_rel <= img_w and ocr_b_rel <= img_h and \
+           ocr_l_rel >=0 and ocr_t_rel >=0: # Ensure crop is valid
+            sc_crop = Image.fromarray(screenshot_arr[ocr_t_rel:ocr_b_rel, ocr_l_rel:ocr_r_rel])
+            debug_artifact('slots', f"Step_OCR_Slot{debug_tag}_{s_idx}_Raw.png", sc_crop)
+            ocr_crops[s_idx] = sc_crop
+        else:
+            log_message(f"WARN: Invalid OCR crop coordinates for slot {s_idx}. Defaulting count to 1.")
+
+        # Physical center of this slot on screen (for the drag targets)
+        s_cx_abs, s_cy_abs = centers_abs[s_idx].tolist()
+        scanned_items_initial_state.append({
+            'tier':tier, 'count':1,
+            'original_slot_index':s_idx, # This item was found at physical slot s_idx
+            'id': f"item_orig_{s_idx}",    # A unique ID based on original position
+            'current_physical_coords': (s_cx_abs,s_cy_abs) # Its current screen center
+        })
+        slot_scan_notes[s_idx] = f"(R{r}C{c})", avg_c
+
+    # Stack counts for all occupied slots: one batched Tesseract call, or one call per slot
+    # Pooled reads come back as futures; the layout image is finished while the workers read. Tier classification
+    # is one vectorized pass over the grid that is already done by now, so it does not overlap the reads
+    pending_counts = get_stack_counts_pooled(ocr_crops) if not OCR_BATCH_MODE and is_ocr_pool_enabled() else None
+    if draw is not None: debug_artifact('summary', f"Step_1_ScannedSlots_Layout{debug_tag}.png", debug_ss_slots)
+    with perf_span('ocr', tag=debug_tag, crops=len(ocr_crops)):
+        if pending_counts is not None: stack_counts = resolve_stack_counts(*pending_counts)
+        elif OCR_BATCH_MODE: stack_counts = get_stack_counts_batched(ocr_crops)
+        else: stack_counts = {s_idx: get_stack_count_from_image_region(crop, f"{debug_tag}{s_idx}") for s_idx, crop in ocr_crops.items()
+                              if not is_cancel_requested()}
+    log_ocr_cache_stats()
+    with perf_span('ocr.cache_save'): save_ocr_disk_cache()
+    stack_counts.update(reused_counts)
+    if INCREMENTAL_RESCAN and not is_cancel_requested(): # A cancelled scan has missing counts; never reuse it
+        if prev_scan is not None:
+            log_message(f"Incremental scan{debug_tag}: {int((~changed).sum())} slots reused, {int(changed.sum())} re-analysed "
+                        f"({len(reused_counts)} counts reused, {len(ocr_crops)} OCR'd).")
+        last_scan_state[debug_tag] = {'signature': get_scan_settings_signature(), 'fingerprints': fingerprints,
+                                      'tiers': slot_tiers, 'colors': slot_colors, 'counts': dict(stack_counts)}
+    for item in scanned_items_initial_state:
+        s_idx = item['original_slot_index']; item['count'] = stack_counts.get(s_idx, 1)
+        rc_str, avg_c = slot_scan_notes[s_idx]
+        log_message(f"Slot {debug_tag}{s_idx}{rc_str}: T{item['tier']},C{item['count']},Clr{avg_c}")
+
+    if last_scanned_row < num_rows - 1:
+        if eff_rows > 0: log_message(f"Stop scan: Row {last_scanned_row} (0-idx) empty after items found up to row {eff_rows-1}.")
+        else: log_message(f"Stop scan: Initial {last_scanned_row+1} rows appear empty.")
+
+    return {'items': scanned_items_initial_state, 'tiers': slot_tiers, 'eff_rows': eff_rows, 'last_scanned_row': last_scanned_row}
+
 def calculate_sort_plan():
     global is_processing, last_calculated_plan
     # Uses global config variables like GRID_OFFSET_X, SLOT_WIDTH, NUM_COLS, etc.
 
-    if is_processing: log_message("Busy."); return
+    if is_processing: report_busy(); return
     is_processing = True; log_message("Calculating sort plan..."); last_calculated_plan = None
-    log_message(f"Grid Offset: X={GRID_OFFSET_X}, Y={GRID_OFFSET_Y}")
-    log_message(f"Grid: {NUM_COLS}x{MAX_NUM_ROWS}(max), Slot:{SLOT_WIDTH}x{SLOT_HEIGHT}, Gap:{SLOT_GAP_X}x{SLOT_GAP_Y}")
 
-    game_rect = get_game_window_rect()
+    with perf_span('window'): game_rect = get_game_window_rect()
     if not game_rect: is_processing=False; return
+    if CALIBRATION_PROFILE_AUTO_SELECT:
+        with perf_span('profile'): select_calibration_profile(game_rect)
+    log_message(f"Grid Offset: X={GRID_OFFSET_X}, Y={GRID_OFFSET_Y}")
+    log_message(f"Grid: {NUM_COLS}x{MAX_NUM_ROWS}(max), Slot:{SLOT_WIDTH}x{SLOT_HEIGHT}, Gap:{SLOT_GAP_X}x{SLOT_GAP_Y}")
+    if CONTAINERS_ENABLED: log_message("Containers: " + ", ".join(f"{c['name']} {c['cols']}x{c['rows']} at ({c['offset'][0]},{c['offset'][1]})" for c in CONTAINERS))
     game_x, game_y, game_w, game_h = game_rect # game_w, game_h for screenshot boundary checks
 
     try:
-        win=gw.getWindowsWithTitle(GAME_WINDOW_TITLE)[0]
-        if not win.isActive:
-            log_message("Activating game window..."); win.activate(); time.sleep(0.5)
-            if not win.isActive: log_message("WARN: Failed to activate game window. Ensure it's focused."); # Continue if activation fails but don't block
-        screenshot = ImageGrab.grab(bbox=game_rect)
-        ensure_debug_folder(); screenshot.save(os.path.join(DEBUG_IMAGE_FOLDER, "Step_0_FullScan_Screenshot.png"))
+        with perf_span('window.activate'):
+            win=gw.getWindowsWithTitle(GAME_WINDOW_TITLE)[0]
+            if not win.isActive:
+                log_message("Activating game window..."); win.activate(); time.sleep(0.5)
+                if not win.isActive: log_message("WARN: Failed to activate game window. Ensure it's focused."); # Continue if activation fails but don't block
+        ensure_debug_folder(); begin_debug_scan("containers" if CONTAINERS_ENABLED else "paged" if PAGED_SCAN_ENABLED else "grid")
+        if CONTAINERS_ENABLED: # One capture holding every container
+            capture_bbox, capture_origin = get_containers_capture_bbox(game_rect)
+            screenshot = capture_region(capture_bbox)
+            debug_artifact('summary', "Step_0_FullScan_Screenshot.png", screenshot)
+        elif not PAGED_SCAN_ENABLED: # Only the grid's bounding box is captured, straight into an array
+            capture_bbox, capture_origin = get_grid_capture_bbox(game_rect)
+            screenshot = capture_region(capture_bbox)
+            debug_artifact('summary', "Step_0_FullScan_Screenshot.png", screenshot)
     except Exception as e: log_message(f"Screenshot error: {e}"); is_processing=False; return
 
-    log_message("Scanning slots..."); scanned_items_initial_state=[] # Stores items with their initial physical slot data
-    eff_rows=0
-    debug_ss_slots=screenshot.copy(); draw=ImageDraw.Draw(debug_ss_slots)
-
     # --- Stage 1: Scan the screen and identify all items and their properties ---
-    for r in range(MAX_NUM_ROWS):
-        row_items_found_this_scan=False
-        for c in range(NUM_COLS):
-            s_idx = r*NUM_COLS+c
-            
-            # Slot coordinates relative to the screenshot for drawing
-            s_rel_x = GRID_OFFSET_X + c*(SLOT_WIDTH+SLOT_GAP_X) 
-            s_rel_y = GRID_OFFSET_Y + r*(SLOT_HEIGHT+SLOT_GAP_Y)
-            draw.rectangle([s_rel_x, s_rel_y, s_rel_x+SLOT_WIDTH, s_rel_y+SLOT_HEIGHT], outline="blue", width=1)
-            draw.text((s_rel_x+2,s_rel_y+2), str(s_idx), fill="yellow")
-
-            # Absolute screen coordinates for color patch sampling
-            pcx_abs, pcy_abs = get_color_patch_coords_for_slot(s_idx, game_x, game_y)
-            avg_c = get_average_color_from_patch(screenshot, pcx_abs, pcy_abs, game_x, game_y, str(s_idx))
-            tier = identify_tier_from_color(avg_c, str(s_idx))
-            
-            # Draw color patch sample area (relative to screenshot)
-            cp_rel_x = pcx_abs - game_x - COLOR_PATCH_SIZE//2; cp_rel_y = pcy_abs - game_y - COLOR_PATCH_SIZE//2
-            draw.rectangle([cp_rel_x, cp_rel_y, cp_rel_x+COLOR_PATCH_SIZE, cp_rel_y+COLOR_PATCH_SIZE], outline="red", width=1)
-
-            if tier is not None:
-                row_items_found_this_scan=True
-                if r + 1 > eff_rows: eff_rows = r + 1 # Track the max row we've found an item in
-
-                # OCR Region Calculation (absolute screen coordinates, then relative for cropping)
-                slot_tl_abs_x = game_x + GRID_OFFSET_X + c*(SLOT_WIDTH+SLOT_GAP_X)
-                slot_tl_abs_y = game_y + GRID_OFFSET_Y + r*(SLOT_HEIGHT+SLOT_GAP_Y)
-                
-                ocr_tl_abs_x = slot_tl_abs_x + OCR_RELATIVE_X
-                ocr_tl_abs_y = slot_tl_abs_y + OCR_RELATIVE_Y
-                ocr_br_abs_x = ocr_tl_abs_x + OCR_WIDTH
-                ocr_br_abs_y = ocr_tl_abs_y + OCR_HEIGHT
-
-                # OCR crop coordinates relative to the screenshot
-                ocr_l_rel, ocr_t_rel = ocr_tl_abs_x-game_x, ocr_tl_abs_y-game_y
-                ocr_r_rel, ocr_b_rel = ocr_br_abs_x-game_x, ocr_br_abs_y-game_y
-                draw.rectangle([ocr_l_rel, ocr_t_rel, ocr_r_rel, ocr_b_rel], outline="lime", width=1)
-                
-                s_count=1
-                if ocr_l_rel < ocr_r_rel and ocr_t_rel < ocr_b_rel and \
-                   ocr_r_rel <= screenshot.width and ocr_b_rel <= screenshot.height and \
-                   ocr_l_rel >=0 and ocr_t_rel >=0: # Ensure crop is valid
-                    sc_crop = screenshot.crop((ocr_l_rel,ocr_t_rel,ocr_r_rel,ocr_b_rel))
-                    sc_crop.save(os.path.join(DEBUG_IMAGE_FOLDER,f"Step_OCR_Slot_{s_idx}_Raw.png"))
-                    s_count = get_stack_count_from_image_region(sc_crop, str(s_idx))
-                else:
-                    log_message(f"WARN: Invalid OCR crop coordinates for slot {s_idx}. Defaulting count to 1.")
-
-                # Physical center of this slot on screen
-                s_cx_abs, s_cy_abs = slot_tl_abs_x+SLOT_WIDTH//2, slot_tl_abs_y+SLOT_HEIGHT//2
-                scanned_items_initial_state.append({
-                    'tier':tier, 'count':s_count, 
-                    'original_slot_index':s_idx, # This item was found at physical slot s_idx
-                    'id': f"item_orig_{s_idx}",    # A unique ID based on original position
-                    'current_physical_coords': (s_cx_abs,s_cy_abs) # Its current screen center
-                })
-                log_message(f"Slot {s_idx}(R{r}C{c}): T{tier},C{s_count},Clr{avg_c}")
-        
-        if not row_items_found_this_scan and r>=1 and eff_rows > 0 and r >= eff_rows : 
-            # If this row is empty, AND we've already found items in a previous row (eff_rows > 0),
-            # AND this empty row is at or after the last known effective row.
-            log_message(f"Stop scan: Row {r} (0-idx) empty after items found up to row {eff_rows-1}.");break
-        if not row_items_found_this_scan and r > 3 and eff_rows == 0 : 
-            # If first ~4 rows are completely empty
-            log_message(f"Stop scan: Initial {r+1} rows appear empty.");break
-    
-    debug_ss_slots.save(os.path.join(DEBUG_IMAGE_FOLDER, "Step_1_ScannedSlots_Layout.png"))
+    log_message("Scanning slots...")
+    if CONTAINERS_ENABLED: scan = scan_container_screenshot(screenshot, capture_origin, game_x, game_y)
+    elif PAGED_SCAN_ENABLED:
+        scan = scan_inventory_pages(game_rect)
+        if scan is None: is_processing=False; return
+    else: scan = scan_grid_screenshot(screenshot, capture_origin, game_x, game_y)
+    if is_cancel_requested(): log_message("Scan cancelled."); is_processing=False; return
+    scanned_items_initial_state = scan['items']; eff_rows = scan['eff_rows']
     if not scanned_items_initial_state:log_message("No items found.");is_processing=False;return
     log_message(f"Scan done. Max row with items: {eff_rows-1 if eff_rows > 0 else 'None'}. Items found: {len(scanned_items_initial_state)}")
+    debug_note("Items: " + ", ".join(f"{it['original_slot_index']}:T{it['tier']}C{it['count']}" for it in scanned_items_initial_state))
 
-    # --- Stage 2: Determine target order and generate moves ---
-    target_sorted_items_by_properties = sorted(
-        scanned_items_initial_state, 
-        key=lambda x: (x['tier'], -x['count'], x['original_slot_index']) # Tier asc, Count desc, OriginalPos asc
-    )
-    
-    log_message(f"--- Target Sorted Order (Properties of items that should be in these final slots) ---")
-    for i,item_props in enumerate(target_sorted_items_by_properties[:10]): # Log first 10
-        log_message(f"Target Slot {i} should contain: Item (ID {item_props['id']}) with T{item_props['tier']},C{item_props['count']}")
-
-    # `current_simulated_layout` maps a physical slot index to the item `id` currently in it.
-    current_simulated_layout = [None] * (MAX_NUM_ROWS * NUM_COLS)
-    # `item_details_map` maps item `id` to its full details (tier, count, id, original_slot_index)
-    item_details_map = {}
-
-    for item_data in scanned_items_initial_state:
-        current_simulated_layout[item_data['original_slot_index']] = item_data['id']
-        item_details_map[item_data['id']] = item_data
 
+    # --- Stage 2: Determine target order and generate moves ---
     # Get the absolute screen coordinates for all physical slot centers we might use
     # Use eff_rows if known, otherwise MAX_NUM_ROWS for safety, though moves only go up to len(target_items)
-    num_rows_for_centers = eff_rows if eff_rows > 0 else MAX_NUM_ROWS 
-    all_physical_slot_centers = get_slot_center_coords(game_x, game_y, num_rows_for_centers)
-
-    moves_to_make = []
-    # Iterate through each target physical slot (0, 1, 2, ...) up to the number of items we have
-    for target_physical_slot_idx in range(len(target_sorted_items_by_properties)):
-        # Get the properties of the item that *should* be in this target_physical_slot_idx
-        desired_item_id_for_target_slot = target_sorted_items_by_properties[target_physical_slot_idx]['id']
+    paged = PAGED_SCAN_ENABLED and not CONTAINERS_ENABLED
+    if CONTAINERS_ENABLED: all_physical_slot_centers = get_container_slot_centers(game_x, game_y)
+    else:
+        num_rows_for_centers = eff_rows if eff_rows > 0 else MAX_NUM_ROWS 
+        all_physical_slot_centers = get_slot_center_coords(game_x, game_y, num_rows_for_centers)
+
+    # Partial stacks are merged first; the sort then plans over the merged items
+    merge_moves, items_to_sort = [], scanned_items_initial_state
+    if can_consolidate_stacks(paged):
+        with perf_span('consolidate', items=len(scanned_items_initial_state)):
+            merge_moves, items_to_sort, merge_report = plan_stack_merges(scanned_items_initial_state, all_physical_slot_centers)
+        log_message(f"Consolidation: {merge_report['drags']} merge drags free {merge_report['freed']} slots "
+                    f"({merge_report['before']} -> {merge_report['after']} stacks, max {CONSOLIDATE_MAX_STACK}), ~{merge_report['travel']:.0f}px cursor travel.")
+    elif CONSOLIDATE_ENABLED: log_message("WARN: Stack consolidation skipped: " + ("not available with [Paging]." if paged else "no OCR engine, counts unknown."))
+
+    target_classes = get_container_target_classes(items_to_sort) if CONTAINERS_ENABLED else get_target_classes(items_to_sort)
+    log_message(f"--- Target Sorted Order (Properties of items that should be in these final slots) ---")
+    for i,target in enumerate(target_classes[:10]): # Log first 10
+        if target is not None: log_message(f"Target Slot {i} should contain: an item with T{target[0]},C{target[1]}")
 
-        # Find where this desired_item_id_for_target_slot *currently is* in our simulation
-        current_physical_location_of_desired_item = -1
-        try:
-            current_physical_location_of_desired_item = current_simulated_layout.index(desired_item_id_for_target_slot)
-        except ValueError:
-            log_message(f"CRIT ERR: Desired item ID {desired_item_id_for_target_slot} not found in simulation. Abort.");is_processing=False;return
-
-        # If the desired item is not already in its correct target physical slot
-        if current_physical_location_of_desired_item != target_physical_slot_idx:
-            # This item needs to move.
-            # Source: current_physical_location_of_desired_item
-            # Destination: target_physical_slot_idx
-
-            # Ensure coordinates are valid before adding to move list
-            if not (0 <= current_physical_location_of_desired_item < len(all_physical_slot_centers) and \
-                    0 <= target_physical_slot_idx < len(all_physical_slot_centers)):
-                log_message(f"WARN: Skipping move due to invalid slot index. From: {current_physical_location_of_desired_item}, To: {target_physical_slot_idx}")
-                continue
-
-            moves_to_make.append({
-                "from_slot_idx": current_physical_location_of_desired_item,
-                "to_slot_idx": target_physical_slot_idx,
-                "item_id_being_moved": desired_item_id_for_target_slot, # Item that belongs in target_idx
-                "from_coords": all_physical_slot_centers[current_physical_location_of_desired_item],
-                "to_coords": all_physical_slot_centers[target_physical_slot_idx]
-            })
-            
-            # Simulate the swap in `current_simulated_layout`
-            item_id_being_moved = current_simulated_layout[current_physical_location_of_desired_item]
-            item_id_displaced = current_simulated_layout[target_physical_slot_idx] # Can be None if target is empty
-
-            current_simulated_layout[target_physical_slot_idx] = item_id_being_moved
-            current_simulated_layout[current_physical_location_of_desired_item] = item_id_displaced
-            # No need to update 'current_physical_coords' in item_details_map as we use all_physical_slot_centers
+    # `item_details_map` maps item `id` to its full details (tier, count, id, original_slot_index)
+    item_details_map = {item_data['id']: item_data for item_data in scanned_items_initial_state + items_to_sort}
+
+    if CONTAINERS_ENABLED:
+        with perf_span('plan', items=len(items_to_sort)):
+            moves_to_make, plan_report = plan_container_moves(items_to_sort, all_physical_slot_centers, target_classes)
+        log_message(f"Planner: {plan_report['drags']} drags ({plan_report['cross_drags']} between containers) in {plan_report['cycles']} swap cycles, "
+                    f"{plan_report['batches']} container batches, ~{plan_report['travel']:.0f}px cursor travel.")
+    elif paged: # Drags with per-page coords plus scroll actions, planned page by page
+        with perf_span('plan', items=len(items_to_sort)): moves_to_make = plan_paged_moves(items_to_sort, scan, game_x, game_y)
+        if moves_to_make is None: is_processing=False; return
+    else:
+        with perf_span('plan', items=len(items_to_sort)): moves_to_make, plan_report = plan_sort_moves(items_to_sort, all_physical_slot_centers)
+        log_message(f"Planner: {plan_report['drags_after']} drags in {plan_report['cycles']} swap cycles, ~{plan_report['travel_after']:.0f}px cursor travel "
+                    f"(tie-break-by-slot plan: {plan_report['drags_before']} drags, ~{plan_report['travel_before']:.0f}px).")
+    moves_to_make = merge_moves + moves_to_make
 
     if moves_to_make:
         log_message("--- Calculated Action Plan (0-indexed physical slots) ---")
         for i,m in enumerate(moves_to_make):
+            if m.get("action") == "scroll":
+                log_message(f"Move {i+1}: Scroll from page {m['from_page']} to page {m['to_page']} ({'top (' + str(m['top_clicks']) + '), then ' if m.get('top_clicks') else ''}{m['scroll_clicks']} clicks)"); continue
+            if m.get("action") == "merge":
+                log_message(f"Move {i+1}: Merge T{m['tier']} stack from physical_slot {m['from_slot_idx']} onto physical_slot {m['to_slot_idx']} "
+                            f"(leaves {m['result_counts'][0]} and {m['result_counts'][1]})")
+                debug_note(f"Move {i+1}: {m['from_slot_idx']} -> {m['to_slot_idx']} (merge)"); continue
             item_props = item_details_map[m['item_id_being_moved']]
             log_message(f"Move {i+1}: Drag item (ID {m['item_id_being_moved']}, T{item_props['tier']}C{item_props['count']}) "
                         f"from current physical_slot {m['from_slot_idx']} to target physical_slot {m['to_slot_idx']}")
-        last_calculated_plan={"moves":moves_to_make}
-    else:log_message("Inventory already sorted or no moves needed based on scan.")
+            debug_note(f"Move {i+1}: {m['from_slot_idx']} -> {m['to_slot_idx']}" + (f" (page {m['page']})" if 'page' in m else ""))
+        pages = {k: scan[k] for k in ('page_tops', 'page_scroll_clicks', 'current_page')} if paged else None
+        last_calculated_plan={"moves":moves_to_make, "items":scanned_items_initial_state, "pages":pages,
+                              "layout": {it['original_slot_index']: it['id'] for it in scanned_items_initial_state},
+                              "next_move": 0, "page": pages['current_page'] if pages else 0, "game_origin": (game_x, game_y),
+                              "fingerprint": get_plan_fingerprint(scanned_items_initial_state), "settings": get_settings_fingerprint()}
+        save_plan_checkpoint(last_calculated_plan)
+    else:log_message("Inventory already sorted or no moves needed based on scan."); clear_plan_checkpoint()
     log_message("Sort plan calculation finished.");is_processing=False
     
-def execute_sort_plan(): # Logic unchanged
-    # ... (same as previous full script)
+def execute_sort_plan(resume=False, hotkey=None): # resume: continue an interrupted/stopped plan from its checkpoint; hotkey: the one that started it
     global is_processing, last_calculated_plan
-    if is_processing: log_message("Busy."); return
-    if not last_calculated_plan or not last_calculated_plan["moves"]: log_message("No plan. Numpad1 first."); return
-    is_processing=True; log_message("Executing sort plan..."); time.sleep(2)
-    if not get_game_window_rect(): is_processing=False; log_message("Game window lost."); return
+    if is_processing: report_busy(); return
+    if resume:
+        plan = get_resumable_plan()
+        if plan is None: return
+    else:
+        plan = last_calculated_plan
+        if not plan or not plan["moves"]: log_message("No plan. Numpad1 first."); return
+        if plan.get('next_move'): log_message(f"Plan stopped before move {plan['next_move'] + 1}. Press {RESUME_SORT_HOTKEY} to continue it, or rescan."); return
+    is_processing=True; log_message("Resuming sort plan..." if resume else "Executing sort plan...")
+    if TIMING_ADAPTIVE: wait_for_hotkey_release(hotkey or (RESUME_SORT_HOTKEY if resume else EXECUTE_SORT_HOTKEY), 2)
+    else: time.sleep(2)
+    game_rect = get_game_window_rect()
+    if not game_rect: is_processing=False; log_message("Game window lost."); return
     win = gw.getWindowsWithTitle(GAME_WINDOW_TITLE)[0]
     if not win.isActive: log_message("Game window not active."); is_processing=False; return
 
-    for i, move in enumerate(last_calculated_plan["moves"]):
+    game_x, game_y, _, _ = game_rect
+    if resume:
+        plan = dict(plan, moves=[dict(m) for m in plan['moves']], layout=dict(plan['layout']))
+        if (game_x, game_y) != tuple(plan['game_origin']): shift_plan_coords(plan, game_x - plan['game_origin'][0], game_y - plan['game_origin'][1])
+        with perf_span('resume.verify'): mismatches = verify_checkpoint_layout(plan, game_rect)
+        if mismatches:
+            log_message(f"ERR: Inventory doesn't match the checkpoint ({len(mismatches)} slots differ, e.g. {mismatches[0]}). Rescan with the plan hotkey.")
+            is_processing=False; return
+        log_message(f"Checkpoint {plan['fingerprint']} verified, continuing at move {plan['next_move'] + 1} of {len(plan['moves'])}.")
+    else: plan = dict(plan, next_move=0, page=plan['pages']['current_page'] if plan['pages'] else 0,
+                      layout={it['original_slot_index']: it['id'] for it in plan['items']})
+    last_calculated_plan = plan
+    moves = plan["moves"]
+    # Expected layout (global slot -> item id), updated as drags land; saved with every checkpoint
+    items_by_id = get_plan_items_by_id(plan.get("items", []), moves)
+    layout = dict(plan['layout'])
+    verify = EXECUTOR_VERIFY_MOVES and bool(items_by_id)
+    pages = plan.get("pages"); page = plan['page']
+    failures = []; repairs = 0; drags_done = merges_done = 0; i = plan['next_move']; stopped = False
+    while i < len(moves):
+        if is_cancel_requested():
+            log_message(f"Stopped before move {i + 1} of {len(moves)}. Press {RESUME_SORT_HOTKEY} (or type 'resume') to continue."); stopped = True; break
+        move = moves[i]; i += 1
+        if move.get("action") == "scroll":
+            log_message(f"Move {i}: Scroll to page {move['to_page']}"); perf_count('scrolls')
+            if move.get("top_clicks"): scroll_inventory(move["top_clicks"], game_x, game_y)
+            scroll_inventory(move["scroll_clicks"], game_x, game_y); page = move['to_page']
+            plan.update(next_move=i, page=page, layout=dict(layout)); save_plan_checkpoint(plan); continue
         sx,sy = move.get("from_coords", (None,None)); ex,ey = move.get("to_coords", (None,None)) # Safer access
-        if not (sx and sy and ex and ey): log_message(f"ERR: Bad coords move {i+1}. Skip."); continue
-        log_message(f"Move {i+1}: Drag ({sx},{sy}) to ({ex},{ey})")
-        smooth_drag(sx,sy,ex,ey)
-        if i < len(last_calculated_plan["moves"])-1: log_message("Pause..."); time.sleep(0.2)
-    log_message("Execution finished."); last_calculated_plan=None; is_processing=False
+        if not (sx and sy and ex and ey): # Skipped, but past it: a resume must not stop here again
+            log_message(f"ERR: Bad coords move {i}. Skip."); plan.update(next_move=i, page=page, layout=dict(layout)); save_plan_checkpoint(plan); continue
+        log_message(f"Move {i}: Drag ({sx},{sy}) to ({ex},{ey})")
+        a, b = move['from_slot_idx'], move['to_slot_idx']; top = pages['page_tops'][page] * NUM_COLS if pages else 0; visible = (a - top, b - top)
+        with perf_span('drag', move=i, src=a, dst=b): settled = smooth_drag(sx,sy,ex,ey, (game_x, game_y) + visible)
+        drags_done += 1; perf_count('moves')
+        involved_ids = (layout.get(a), layout.get(b))
+        if move.get("action") == "merge": layout[a], layout[b] = move['result_ids']; merges_done += 1
+        else: layout[a], layout[b] = involved_ids[1], involved_ids[0]
+        if not verify and TIMING_ADAPTIVE: note_drag_result(settled)
+        if verify:
+            expected = [get_item_class(items_by_id[layout[s_idx]]) if layout[s_idx] is not None else None for s_idx in (a, b)]
+            with perf_span('verify', move=i): ok, observed = check_drag_result(game_x, game_y, visible, expected)
+            if not ok: time.sleep(EXECUTOR_VERIFY_RETRY_DELAY); ok, observed = check_drag_result(game_x, game_y, visible, expected)
+            if TIMING_ADAPTIVE: note_drag_result(ok)
+            if not ok:
+                failures.append(f"Move {i} ({a} -> {b}): expected {expected}, saw {[o[0] if o[1] is None else o for o in observed]}")
+                log_message(f"WARN: Drag check failed. {failures[-1]}")
+                if repairs >= EXECUTOR_MAX_REPAIRS: log_message(f"ERR: {repairs} repairs already, stopping. Rescan with the plan hotkey."); stopped = True; break
+                grabs = capture_slot_regions(game_x, game_y, visible) # Re-read both slots, counts included, and replan from there
+                observed = [read_slot_capture(grabs[v], True, f"V{v}") for v in visible]
+                repair_layout(layout, items_by_id, (a, b), involved_ids, observed, repairs); repairs += 1
+                remaining = replan_remaining_moves(layout, items_by_id, game_x, game_y, pages, page)
+                if remaining is None: log_message("ERR: Repair plan failed. Rescan with the plan hotkey."); stopped = True; break
+                log_message(f"Repair {repairs}: slots {a}, {b} now hold {observed}; {len([m for m in remaining if m.get('action') != 'scroll'])} drags replanned.")
+                moves = moves[:i] + remaining; plan['moves'] = moves; items_by_id.update(get_plan_items_by_id([], remaining))
+        plan.update(next_move=i, page=page, layout=dict(layout)); save_plan_checkpoint(plan) # Only after the move is known good
+        if i < len(moves) and not TIMING_ADAPTIVE: log_message("Pause..."); time.sleep(0.2)
+    log_message(f"Execution report: {drags_done} drags ({merges_done} merges), {len(failures)} failed checks, {repairs} repairs" + (" (unverified)." if not verify else "."))
+    for failure in failures: log_message(f"  {failure}")
+    save_timing_profile()
+    if stopped: log_message(f"Execution stopped; progress saved at move {plan['next_move'] + 1} of {len(plan['moves'])}.")
+    else: log_message("Execution finished."); last_calculated_plan=None; clear_plan_checkpoint()
+    is_processing=False
+
+def scan_then_execute_sort(): # Chained hotkey: plan, then execute straight away unless cancelled or nothing to move
+    calculate_sort_plan()
+    if is_cancel_requested() or not last_calculated_plan or not last_calculated_plan['moves']: return
+    execute_sort_plan(hotkey=SCAN_AND_EXECUTE_HOTKEY)
 
 
 def request_exit(): # Unhookall fix applied
@@ -813,6 +2959,89 @@ def request_exit(): # Unhookall fix applied
     except Exception as e: log_message(f"Note: Error unhook_all in request_exit: {e}")
     script_running = False; log_message("Script will now terminate. Close console if needed.")
 
+# --- OFFLINE BATCH MODE ---
+# python inventory_sorter.py batch <screenshots or folders> [--config config.ini] [--out batch_results] [--workers N]
+# Scans and plans saved game-window screenshots without the game; one JSON per screenshot plus summary.json.
+BATCH_IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+def init_batch_worker(config_path, verbose): # Per-process setup (also used in-process for a single file)
+    global CONFIG_FILE, DEBUG_LEVEL, INCREMENTAL_RESCAN, LOG_QUIET, OCR_POOL_WORKERS, OCR_DISK_CACHE_FILE
+    LOG_QUIET = not verbose; CONFIG_FILE = config_path
+    load_config(); initialize_tesseract(); load_digit_templates(); load_tier_classifier()
+    DEBUG_LEVEL = 'off'; INCREMENTAL_RESCAN = False # Every file is a different inventory
+    OCR_POOL_WORKERS = 0 # Batch mode already runs one process per file
+    OCR_DISK_CACHE_FILE = '' # Workers would rewrite the same file (and .tmp) over each other; the memory cache still works
+
+def scan_and_plan_image(img_arr, origin=(0, 0)): # Stage 1 + 2 of calculate_sort_plan on one array -> result dict
+    # Coordinates in the result are relative to the game window (origin = where img_arr's top-left sits in it).
+    start = time.perf_counter()
+    scan = scan_grid_screenshot(img_arr, origin, 0, 0)
+    items = scan['items']; moves, report = [], None
+    if items:
+        centers = get_slot_center_coords(0, 0, max(1, -(-max(len(items), max(it['original_slot_index'] for it in items) + 1) // NUM_COLS)))
+        moves, report = plan_sort_moves(items, centers)
+    return {'layout': [{'slot': it['original_slot_index'], 'row': it['original_slot_index'] // NUM_COLS, 'col': it['original_slot_index'] % NUM_COLS,
+                        'tier': it['tier'], 'count': it['count']} for it in items],
+            'tiers': scan['tiers'].tolist(), 'eff_rows': scan['eff_rows'],
+            'moves': [{'from_slot': m['from_slot_idx'], 'to_slot': m['to_slot_idx'], 'item': m['item_id_being_moved']} for m in moves],
+            'report': report, 'elapsed_ms': round((time.perf_counter() - start) * 1000.0, 2)}
+
+def process_batch_file(path, origin, out_path): # Worker task: one screenshot -> JSON file; returns a short summary
+    os.makedirs(os.path.dirname(out_path) or '.', exist_ok=True)
+    try:
+        img_arr = np.asarray(Image.open(path).convert('RGB'))
+        result = dict(file=path, **scan_and_plan_image(img_arr, origin))
+    except Exception as e: result = {'file': path, 'error': str(e)}
+    with open(out_path, 'w') as f: json.dump(result, f, indent=1)
+    return {'file': path, 'output': out_path, 'error': result.get('error'), 'items': len(result.get('layout', [])),
+            'moves': len(result.get('moves', [])), 'elapsed_ms': result.get('elapsed_ms')}
+
+def collect_batch_files(paths): # Files as given, folders expanded (sorted, non-recursive)
+    files = []
+    for path in paths:
+        if os.path.isdir(path): files += sorted(os.path.join(path, n) for n in os.listdir(path) if n.lower().endswith(BATCH_IMAGE_EXTENSIONS))
+        elif os.path.isfile(path): files.append(path)
+        else: log_message(f"WARN: '{path}' not found, skipped.")
+    return files
+
+def get_batch_output_paths(files, out_dir): # -> JSON path per file: its path below the files' common folder, never two alike
+    folders = [os.path.dirname(os.path.abspath(path)) for path in files]
+    try: root = os.path.commonpath(folders)
+    except ValueError: root = None # Different drives: names only, the suffix below keeps them apart
+    taken = {'summary.json'}; out_paths = []
+    for path in files:
+        name = os.path.splitext(os.path.relpath(os.path.abspath(path), root) if root else os.path.basename(path))[0]
+        rel = name + '.json'; n = 1
+        while rel.lower() in taken: n += 1; rel = f"{name}_{n}.json" # e.g. shot.png next to shot.jpg
+        taken.add(rel.lower()); out_paths.append(os.path.join(out_dir, rel))
+    return out_paths
+
+def run_batch_cli(argv): # -> process exit code
+    parser = argparse.ArgumentParser(prog="inventory_sorter.py batch", description="Scan and plan saved screenshots of the game window.")
+    parser.add_argument('paths', nargs='+', help="screenshot files and/or folders of screenshots")
+    parser.add_argument('--config', default=CONFIG_FILE)
+    parser.add_argument('--out', default='batch_results', help="folder for the JSON results")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="processes for folders / multiple files")
+    parser.add_argument('--origin', type=int, nargs=2, default=(0, 0), metavar=('X', 'Y'),
+                        help="position of the screenshot's top-left in the game window (e.g. for grid-only captures)")
+    parser.add_argument('--verbose', action='store_true', help="full scan log")
+    args = parser.parse_args(argv)
+    files = collect_batch_files(args.paths)
+    if not files: log_message("ERR: No screenshots found."); return 1
+    os.makedirs(args.out, exist_ok=True); origin = tuple(args.origin); start = time.perf_counter()
+    out_paths = get_batch_output_paths(files, args.out)
+    if len(files) == 1 or args.workers <= 1:
+        init_batch_worker(args.config, args.verbose)
+        summaries = [process_batch_file(path, origin, out_path) for path, out_path in zip(files, out_paths)]
+    else:
+        with ProcessPoolExecutor(max_workers=min(args.workers, len(files)), initializer=init_batch_worker, initargs=(args.config, args.verbose)) as pool:
+            summaries = list(pool.map(process_batch_file, files, [origin] * len(files), out_paths))
+    with open(os.path.join(args.out, 'summary.json'), 'w') as f: json.dump(summaries, f, indent=1)
+    failed = [sm for sm in summaries if sm['error']]
+    for sm in failed: print(f"FAILED {sm['file']}: {sm['error']}")
+    print(f"{len(files)} screenshot(s) in {time.perf_counter() - start:.1f}s, {len(failed)} failed. Results in '{args.out}'.")
+    return 1 if failed else 0
+
 # --- Helper for Hotkey Registration ---
 def register_hotkeys(hotkey_definitions_list): # Logic unchanged
     log_message("--- Registering Hotkeys ---") # ... (rest of function)
@@ -830,10 +3059,14 @@ def register_hotkeys(hotkey_definitions_list): # Logic unchanged
 
 # --- SCRIPT EXECUTION ---
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == 'batch': sys.exit(run_batch_cli(sys.argv[2:]))
     log_message("Inventory Sorter Script Loading...")
-    load_config()       
-    initialize_tesseract() 
-    ensure_debug_folder()  
+    startup_marks = [('imports', time.perf_counter())]
+    load_config(); startup_marks.append(('config', time.perf_counter()))
+    start_tesseract_warm_up() # Hotkeys go live while Tesseract is detected and warmed up
+    load_digit_templates(); load_tier_classifier()
+    load_timing_profile()
+    ensure_debug_folder(); startup_marks.append(('templates/profile', time.perf_counter()))
 
     log_message(f"--- Script Configuration Summary ---")
     log_message(f"  Game Window: '{GAME_WINDOW_TITLE}'")
@@ -841,35 +3074,62 @@ if __name__ == "__main__":
     
     # Use lowercase for key_config_name to match DEFAULT_CONFIG and INI convention
     hotkey_actions_list = [
-        ('calculateandplan', calculate_sort_plan, "Scan & Plan Sort"),
-        ('executesort', execute_sort_plan, "Execute Sort Plan"),
-        ('setgridorigin', set_grid_origin_individually, "Indiv: Set Grid Origin (Top-Left of 1st Slot)"),
-        ('startfulluicalibration', start_or_advance_full_ui_calibration, "Full UI Calibration Cycle (All Geometry)"),
-        ('calibrateslotdimensions', calibrate_slot_dimensions_individually, "Indiv: Set Slot Width/Height (2 clicks)"),
-        ('calibrateslotxgap', calibrate_slot_x_gap_individually, "Indiv: Set Slot X-Gap (2 clicks)"),
-        ('calibrateslotygap', calibrate_slot_y_gap_individually, "Indiv: Set Slot Y-Gap (2 clicks)"),
-        ('calibratetiercolorpoint', calibrate_tier_color_point_individually, "Indiv: Set Tier Color Sample Point (2 clicks)"),
-        ('calibrateocrregion', calibrate_ocr_region_individually, "Indiv: Set OCR Stack Count Region (3 clicks)"),
-        ('savecalibratedvalues', save_calibrated_values_to_config, "Save ALL Current Calibrated Values to config.ini"),
-        ('interruptprocess', request_interrupt_processing, "INTERRUPT Current Action (e.g., sorting, long calibration)"),
+        ('calculateandplan', job_action('plan', perf_action('plan', calculate_sort_plan)), "Scan & Plan Sort"),
+        ('executesort', job_action('execute', perf_action('execute', execute_sort_plan)), "Execute Sort Plan"),
+        ('scanandexecute', job_action('plan+execute', perf_action('plan+execute', scan_then_execute_sort)), "Scan, Plan & Execute in one go"),
+        ('resumesort', job_action('resume', perf_action('resume', resume_sort_plan)), "Resume a stopped Sort Plan (checks the inventory first)"),
+        ('setgridorigin', job_action('setgridorigin', set_grid_origin_individually, only_if_idle=True), "Indiv: Set Grid Origin (Top-Left of 1st Slot)"),
+        ('startfulluicalibration', job_action('startfulluicalibration', start_or_advance_full_ui_calibration, only_if_idle=True), "Full UI Calibration Cycle (All Geometry)"),
+        ('calibrateslotdimensions', job_action('calibrateslotdimensions', calibrate_slot_dimensions_individually, only_if_idle=True), "Indiv: Set Slot Width/Height (2 clicks)"),
+        ('calibrateslotxgap', job_action('calibrateslotxgap', calibrate_slot_x_gap_individually, only_if_idle=True), "Indiv: Set Slot X-Gap (2 clicks)"),
+        ('calibrateslotygap', job_action('calibrateslotygap', calibrate_slot_y_gap_individually, only_if_idle=True), "Indiv: Set Slot Y-Gap (2 clicks)"),
+        ('calibratetiercolorpoint', job_action('calibratetiercolorpoint', calibrate_tier_color_point_individually, only_if_idle=True), "Indiv: Set Tier Color Sample Point (2 clicks)"),
+        ('calibrateocrregion', job_action('calibrateocrregion', calibrate_ocr_region_individually, only_if_idle=True), "Indiv: Set OCR Stack Count Region (3 clicks)"),
+        ('autocalibrategrid', job_action('autocalibrate', auto_calibrate_grid), "Auto: Detect Grid, Color Patch & OCR Region from one screenshot"),
+        ('savecalibratedvalues', job_action('save', save_calibrated_values_to_config), "Save ALL Current Calibrated Values to config.ini"),
+        ('profilenextaction', job_action('cprofile', request_profile_next_action), "Run the next Plan/Execute under cProfile"),
+        ('interruptprocess', request_interrupt_processing, "INTERRUPT Current Action and cancel queued ones (scan, sort)"),
         ('exitscript', request_exit, "Unhook Keys & Prepare for Exit")
     ]
-    register_hotkeys(hotkey_actions_list)
+    keyboard.available(); startup_marks.append(('keyboard import', time.perf_counter()))
+    register_hotkeys(hotkey_actions_list); startup_marks.append(('hotkeys', time.perf_counter()))
+    prev_t = STARTUP_T0
+    startup_parts = []
+    for name, t in startup_marks: startup_parts.append(f"{name} {(t - prev_t)*1000:.0f}ms"); prev_t = t
+    log_message(f"Startup: {', '.join(startup_parts)}; total {(prev_t - STARTUP_T0)*1000:.0f}ms"
+                + (" (Tesseract still warming up in background)." if not tesseract_state['ready'].is_set() else "."))
     
-    log_message("Console active. Enter 'calibratecolors' (for tier colors) or 'exit' (console input loop).")
+    log_message("Console active. Enter 'calibratecolors [tier]' (show / sample tier colors), 'learncolors [folder]' (tier classifier), 'learndigits [folder]' (OCR templates), 'autocalibrate [screenshot]' (grid geometry), 'resume' (stopped sort), 'profiles' / 'useprofile <n>' / 'exportprofiles <file> [n ...]' / 'importprofiles <file>' (calibration per window size), 'containers' / 'containerorigin <name>' (several grids), 'jobs' (queued / recent actions), 'dumpdebug' (buffered scans), 'exporttrace' (last action's timings) or 'exit' (console input loop).")
 
     while script_running:
         try:
             if not script_running: break # Moved redundant check earlier
-            cmd = input("> ").strip().lower()
+            raw_cmd = input("> ").strip(); cmd = raw_cmd.lower(); cmd_args = raw_cmd.split()[1:] # Args keep their case (paths)
             # if not script_running: break # Redundant check removed
 
-            if cmd == 'calibratecolors': get_color_under_mouse_periodic()
+            if cmd.startswith('calibratecolors'): get_color_under_mouse_periodic(label_tier=int(cmd_args[0]) if cmd_args and cmd_args[0].isdigit() else None)
+            elif cmd.startswith('learncolors'): job_action('learncolors', lambda folder=cmd_args[0] if cmd_args else None: learn_tier_classifier(folder))()
+            elif cmd.startswith('learndigits'): job_action('learndigits', lambda folder=cmd_args[0] if cmd_args else 'ocr_training': learn_digit_templates(folder))()
+            elif cmd.startswith('autocalibrate'): job_action('autocalibrate', lambda path=cmd_args[0] if cmd_args else None: auto_calibrate_grid(path))()
+            elif cmd == 'resume': job_action('resume', perf_action('resume', resume_sort_plan))()
+            elif cmd == 'jobs': list_jobs()
+            elif cmd == 'containers': list_containers()
+            elif cmd.startswith('containerorigin') and cmd_args: job_action('containerorigin', lambda name=" ".join(cmd_args): set_container_origin(name), only_if_idle=True)()
+            elif cmd == 'profiles': list_calibration_profiles()
+            elif cmd.startswith('useprofile'):
+                key = get_profile_by_name(" ".join(cmd_args))
+                if key: job_action('useprofile', lambda key=key: apply_calibration_profile(key))()
+                else: log_message(f"ERR: Unknown profile '{' '.join(cmd_args)}'. See 'profiles'.")
+            elif cmd.startswith('exportprofiles') and cmd_args: export_calibration_profiles(cmd_args[0], cmd_args[1:])
+            elif cmd.startswith('importprofiles') and cmd_args: job_action('importprofiles', lambda path=cmd_args[0]: import_calibration_profiles(path))()
+            elif cmd == 'dumpdebug': dump_debug_ring_buffer()
+            elif cmd == 'exporttrace': export_last_trace()
             elif cmd == 'exit': log_message("Exiting console loop. Hotkeys still active."); break
-            elif cmd: log_message(f"Unknown cmd: '{cmd}'. Use 'calibratecolors' or 'exit'.")
+            elif cmd: log_message(f"Unknown cmd: '{cmd}'. Use 'calibratecolors [tier]', 'learncolors [folder]', 'learndigits [folder]', 'autocalibrate [screenshot]', 'resume', 'profiles', 'useprofile <n>', 'exportprofiles <file> [n ...]', 'importprofiles <file>', 'containers', 'containerorigin <name>', 'jobs', 'dumpdebug', 'exporttrace' or 'exit'.")
         except EOFError: log_message("EOFError. Non-interactive mode."); break
         except KeyboardInterrupt: log_message("\nCtrl+C: Exiting."); script_running=False
     
+    cancel_jobs(); flush_debug_writer(); shutdown_ocr_pool()
     try: keyboard.unhook_all(); log_message("All hotkeys unhooked on final exit.") # Fixed unhook logic
     except Exception as e: log_message(f"Note: Error during final unhook_all: {e}")
     log_message("Script terminated.")
\ No newline at end of file
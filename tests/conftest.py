@@ -0,0 +1,20 @@
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import inventory_sorter as sorter
+from inventory_benchmark import patched_sorter
+
+@pytest.fixture
+def quiet_sorter(): # The sorter with its log muted; every global a test changes goes back afterwards
+    with patched_sorter(log_message=lambda message: None): yield sorter
+
+@pytest.fixture
+def simulated_sorter(quiet_sorter): # config.ini loaded as inventory_simulator runs it: nothing written to disk, no profiles
+    sorter.CONFIG_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config.ini')
+    sorter.load_config()
+    sorter.initialize_tesseract(); sorter.load_digit_templates(); sorter.load_tier_classifier()
+    sorter.DEBUG_LEVEL = 'off'; sorter.OCR_DISK_CACHE_FILE = ''; sorter.EXECUTOR_CHECKPOINT_FILE = ''
+    sorter.TIMING_PROFILE_FILE = ''; sorter.CALIBRATION_PROFILE_AUTO_SELECT = False
+    yield sorter
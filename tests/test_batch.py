@@ -0,0 +1,27 @@
+import json
+import os
+
+import numpy as np
+from PIL import Image
+
+def test_output_paths_never_collide(quiet_sorter, tmp_path):
+    files = [str(tmp_path / 'a' / 'shot.png'), str(tmp_path / 'b' / 'shot.png'), str(tmp_path / 'a' / 'Shot.jpg'),
+             str(tmp_path / 'summary.png'), str(tmp_path / 'a' / 'shot.png')]
+    out = [os.path.relpath(p, 'out') for p in quiet_sorter.get_batch_output_paths(files, 'out')]
+    assert out == [os.path.join('a', 'shot.json'), os.path.join('b', 'shot.json'), os.path.join('a', 'Shot_2.json'),
+                   'summary_2.json', os.path.join('a', 'shot_3.json')]
+
+def test_batch_keeps_same_named_files_apart(quiet_sorter, tmp_path, capsys):
+    config = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config.ini')
+    for folder in ('day1', 'day2'):
+        (tmp_path / folder).mkdir(); Image.fromarray(np.zeros((40, 40, 3), dtype=np.uint8)).save(tmp_path / folder / 'inv.png')
+    out = tmp_path / 'results'
+    assert quiet_sorter.run_batch_cli([str(tmp_path / 'day1'), str(tmp_path / 'day2'), '--out', str(out), '--workers', '1', '--config', config]) == 0
+    for folder in ('day1', 'day2'):
+        with open(out / folder / 'inv.json') as f: assert json.load(f)['file'] == str(tmp_path / folder / 'inv.png')
+    with open(out / 'summary.json') as f: assert len(json.load(f)) == 2
+
+def test_batch_workers_leave_disk_cache_alone(quiet_sorter): # Parallel workers must not share ocr_cache.json
+    config = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config.ini')
+    quiet_sorter.init_batch_worker(config, False)
+    assert quiet_sorter.OCR_DISK_CACHE_FILE == ''
@@ -0,0 +1,29 @@
+import random
+
+import pytest
+from PIL import Image
+
+import inventory_benchmark
+
+def config_geometry(sorter): # The config.ini grid the benchmark renders, in detect_grid_geometry's terms
+    return {'offset_x': sorter.GRID_OFFSET_X, 'offset_y': sorter.GRID_OFFSET_Y, 'slot_width': sorter.SLOT_WIDTH,
+            'slot_height': sorter.SLOT_HEIGHT, 'gap_x': sorter.SLOT_GAP_X, 'gap_y': sorter.SLOT_GAP_Y, 'num_cols': sorter.NUM_COLS}
+
+@pytest.mark.parametrize('fill', [1.0, 0.1, 0.0]) # Full, mostly empty, no items at all
+@pytest.mark.parametrize('render', [{}, {'scale': 1.25, 'light': -15, 'gain': 0.9}])
+def test_detects_rendered_grid(simulated_sorter, fill, render):
+    sorter = simulated_sorter; num_rows = 8
+    layout = inventory_benchmark.make_random_layout(num_rows * sorter.NUM_COLS, fill, random.Random(1))
+    screen, _ = inventory_benchmark.render_inventory(layout, num_rows, **render)
+    grid = sorter.detect_grid_geometry(screen)
+    assert grid is not None
+    assert {key: grid[key] for key in config_geometry(sorter)} == config_geometry(sorter)
+    assert grid['rows'] == num_rows
+
+def test_auto_calibration_applies_detected_grid(simulated_sorter, tmp_path):
+    sorter = simulated_sorter; expected = config_geometry(sorter)
+    layout = inventory_benchmark.make_random_layout(6 * sorter.NUM_COLS, 0.2, random.Random(2))
+    Image.fromarray(inventory_benchmark.render_inventory(layout, 6)[0]).save(tmp_path / 'inventory.png')
+    sorter.GRID_OFFSET_X += 40; sorter.SLOT_WIDTH -= 10; sorter.SLOT_GAP_Y += 3; sorter.NUM_COLS += 1 # A stale calibration
+    assert sorter.auto_calibrate_grid(str(tmp_path / 'inventory.png')) is not None
+    assert config_geometry(sorter) == expected
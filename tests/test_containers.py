@@ -0,0 +1,21 @@
+import numpy as np
+
+def paint_tiers(sorter, img, layout, tiers): # Fill each slot's colour patch with its tier colour (0 stays background)
+    for s_idx, tier in enumerate(tiers):
+        if tier: left, top, right, bottom = layout.patch_boxes[s_idx].tolist(); img[top:bottom, left:right] = sorter.TIER_COLORS[tier]
+
+def test_container_tiers_use_each_container_grid(simulated_sorter, monkeypatch):
+    sorter = simulated_sorter
+    monkeypatch.setattr(sorter, 'tier_classifier', None)
+    chest = {'name': 'chest', 'offset': (40, 700), 'cols': 3, 'rows': 2, 'tiers': None, 'base': 0, 'slots': 6}
+    library = {'name': 'library', 'offset': (500, 60), 'cols': 4, 'rows': 3, 'tiers': None, 'base': 6, 'slots': 12}
+    sorter.CONTAINERS = [chest, library]
+    grid_before = (sorter.GRID_OFFSET_X, sorter.GRID_OFFSET_Y, sorter.NUM_COLS, sorter.MAX_NUM_ROWS, sorter.get_grid_layout())
+    img = np.zeros((1100, 1100, 3), dtype=np.uint8)
+    expected = [1, 0, 3, 0, 0, 2] + [3, 3, 0, 1, 0, 0, 0, 0, 2, 0, 0, 1]
+    paint_tiers(sorter, img, sorter.get_container_layout(chest), expected[:6])
+    paint_tiers(sorter, img, sorter.get_container_layout(library), expected[6:])
+    assert sorter.classify_container_tiers(img, (0, 0)) == expected
+    scan = sorter.scan_container_screenshot(img, (0, 0), 0, 0)
+    assert sorted((it['original_slot_index'], it['tier']) for it in scan['items']) == [(s, t) for s, t in enumerate(expected) if t]
+    assert (sorter.GRID_OFFSET_X, sorter.GRID_OFFSET_Y, sorter.NUM_COLS, sorter.MAX_NUM_ROWS, sorter.get_grid_layout()) == grid_before
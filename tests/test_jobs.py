@@ -0,0 +1,45 @@
+import threading
+from collections import deque
+
+import pytest
+
+@pytest.fixture
+def jobs(quiet_sorter, monkeypatch): # Fresh scheduler with its own worker thread
+    sorter = quiet_sorter
+    monkeypatch.setattr(sorter, 'job_state', {'queue': None, 'thread': None, 'current': None, 'history': deque(maxlen=sorter.JOB_HISTORY_SIZE),
+                                              'next_id': 1, 'live': {}, 'lock': threading.Lock()})
+    release = threading.Event()
+    yield sorter, release
+    release.set(); sorter.cancel_jobs()
+
+def block_worker(sorter, release): # -> job that holds the worker until release is set
+    started = threading.Event()
+    job = sorter.submit_job('blocker', lambda: (started.set(), release.wait(5)))
+    assert started.wait(5)
+    return job
+
+def test_dedupe_and_cancel_beyond_history(jobs):
+    sorter, release = jobs
+    block_worker(sorter, release)
+    queued = [sorter.submit_job(f"job{n}", lambda: None) for n in range(sorter.JOB_HISTORY_SIZE + 5)]
+    assert queued[0] not in sorter.job_state['history'] # Fell out of the history, still waiting
+    assert sorter.submit_job('job0', lambda: None) is None
+    assert sorter.cancel_jobs() == len(queued) + 1
+    release.set(); sorter.job_state['queue'].join()
+    assert all(job['state'] == 'cancelled' for job in queued) and not sorter.job_state['live']
+
+def test_busy_bail_out_is_skipped(jobs, monkeypatch):
+    sorter, _ = jobs
+    monkeypatch.setattr(sorter, 'is_processing', True)
+    job = sorter.submit_job('execute', sorter.execute_sort_plan); sorter.job_state['queue'].join()
+    assert job['state'] == 'skipped'
+    sorter.is_processing = False
+    job = sorter.submit_job('noop', lambda: None); sorter.job_state['queue'].join()
+    assert job['state'] == 'done'
+
+def test_calibration_step_refused_while_busy(jobs):
+    sorter, release = jobs
+    block_worker(sorter, release)
+    assert sorter.submit_job('setgridorigin', lambda: None, only_if_idle=True) is None
+    release.set(); sorter.job_state['queue'].join()
+    assert sorter.submit_job('setgridorigin', lambda: None, only_if_idle=True) is not None
@@ -0,0 +1,48 @@
+from collections import OrderedDict
+
+import pytest
+from PIL import Image
+
+@pytest.fixture
+def ocr(simulated_sorter, monkeypatch): # Template engine only, empty in-memory cache, no disk file
+    sorter = simulated_sorter
+    sorter.OCR_ENGINE, sorter.OCR_CACHE_SIZE, sorter.OCR_TEMPLATE_MIN_CONFIDENCE = 'template', 64, 0.8
+    monkeypatch.setattr(sorter, 'ocr_cache', OrderedDict()); monkeypatch.setattr(sorter, 'pytesseract_available', False)
+    monkeypatch.setattr(sorter, 'digit_templates', {'digits': [], 'vectors': None, 'signature': 'test'})
+    return sorter
+
+def read_twice(sorter, monkeypatch, result): # -> (first count, engine calls over both reads)
+    calls = []
+    monkeypatch.setitem(sorter.OCR_ENGINES, 'template', lambda img: calls.append(img) or result)
+    img = Image.new('L', (20, 10), 255)
+    first = sorter.recognize_processed_count_cached(img, "0"); sorter.recognize_processed_count_cached(img, "0")
+    return first, len(calls)
+
+def test_confident_read_is_cached(ocr, monkeypatch):
+    assert read_twice(ocr, monkeypatch, (7, 0.95)) == (7, 1)
+
+@pytest.mark.parametrize('result, count', [((7, 0.3), 7), ((None, 0.0), 1)])
+def test_unconfirmed_read_is_not_cached(ocr, monkeypatch, result, count): # Low-confidence guess, or unreadable -> 1
+    assert read_twice(ocr, monkeypatch, result) == (count, 2)
+    assert not ocr.ocr_cache
+
+def test_cache_key_has_format_version(ocr, monkeypatch):
+    img = Image.new('L', (20, 10), 255); key = ocr.get_ocr_cache_key(img)
+    monkeypatch.setattr(ocr, 'OCR_CACHE_FORMAT', ocr.OCR_CACHE_FORMAT + 1)
+    assert ocr.get_ocr_cache_key(img) != key
+
+def test_pooled_reads_are_cached_by_the_scanning_thread(ocr, monkeypatch):
+    import threading
+    from concurrent.futures import Future
+    inked = Image.new('L', (20, 10), 255); inked.putpixel((3, 3), 0)
+    futures = {0: Future(), 1: Future()}
+    monkeypatch.setattr(ocr, 'preprocess_ocr_crop', lambda crop: inked.copy())
+    monkeypatch.setattr(ocr, 'submit_ocr_batch', lambda processed: {i: futures[i] for i in processed})
+    put_threads = []; real_put = ocr.ocr_cache_put
+    monkeypatch.setattr(ocr, 'ocr_cache_put', lambda *a, **kw: put_threads.append(threading.current_thread()) or real_put(*a, **kw))
+    counts, keys = ocr.get_stack_counts_pooled({0: inked, 1: inked})
+    worker = threading.Thread(target=lambda: (futures[0].set_result((12, True)), futures[1].set_exception(RuntimeError("worker died"))))
+    worker.start(); worker.join()
+    assert not ocr.ocr_cache and not put_threads # Finishing a read doesn't touch the cache
+    assert ocr.resolve_stack_counts(counts, keys) == {0: 12, 1: 1}
+    assert put_threads == [threading.current_thread()] and list(ocr.ocr_cache.values()) == [12]
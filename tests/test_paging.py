@@ -0,0 +1,60 @@
+import argparse, random
+
+import pytest
+
+import inventory_simulator
+
+def make_page_tops(num_rows, visible_rows, step): # As the scan sees them: the last page stops where the list ends
+    tops = [0]
+    while tops[-1] + visible_rows < num_rows: tops.append(min(tops[-1] + step, num_rows - visible_rows))
+    return tops
+
+def check_paged_swaps(sorter, slot_classes, page_tops, first_page): # Apply the swaps page by page -> number of page changes
+    num_cols, visible_rows = sorter.NUM_COLS, sorter.MAX_NUM_ROWS
+    target = sorted((c for c in slot_classes if c), key=lambda k: (k[0], -k[1]))
+    swaps = sorter.plan_paged_swaps(slot_classes, target, page_tops, first_page)
+    assert swaps is not None
+    cur = list(slot_classes) + [None] * (-len(slot_classes) % num_cols); page, changes = first_page, 0
+    for p, a, b in swaps:
+        lo, hi = page_tops[p] * num_cols, (page_tops[p] + visible_rows) * num_cols
+        assert lo <= a < hi and lo <= b < hi, (p, a, b) # Both ends on screen
+        assert cur[a] != cur[b]
+        cur[a], cur[b] = cur[b], cur[a]; changes += p != page; page = p
+    assert cur == target + [None] * (len(cur) - len(target))
+    return changes
+
+@pytest.mark.parametrize('seed', range(200))
+def test_paged_swaps_random(quiet_sorter, seed):
+    rng = random.Random(seed)
+    quiet_sorter.NUM_COLS, quiet_sorter.MAX_NUM_ROWS = rng.randint(1, 8), rng.randint(2, 12)
+    num_slots, fill = rng.randint(1, 600), rng.random()
+    tops = make_page_tops(-(-num_slots // quiet_sorter.NUM_COLS), quiet_sorter.MAX_NUM_ROWS, rng.randint(1, quiet_sorter.MAX_NUM_ROWS - 1))
+    classes = [(rng.randint(1, 6), 1) if rng.random() < fill else None for _ in range(num_slots)]
+    check_paged_swaps(quiet_sorter, classes, tops, rng.randrange(len(tops)))
+
+def test_paged_swaps_clamped_last_page(quiet_sorter): # 318 slots = 53 rows: the last page sits 3 rows above the stride
+    quiet_sorter.NUM_COLS, quiet_sorter.MAX_NUM_ROWS = 6, 10
+    tops = make_page_tops(53, 10, 5)
+    assert tops[-1] == 43 and tops[-2] == 40
+    rng = random.Random(1)
+    classes = [(rng.randint(1, 5), 1) for _ in range(318)]
+    assert check_paged_swaps(quiet_sorter, classes, tops, len(tops) - 1) < 200 # Relaying every move took ~900
+
+@pytest.mark.parametrize('seed', range(2))
+def test_full_inventory_not_multiple_of_page(simulated_sorter, seed): # Regression: full 318-slot list ended on a clamped page
+    args = argparse.Namespace(max_stack=0, rows_per_click=1, drop=0.0, pickup_latency=0.03, drop_latency=0.05)
+    result = inventory_simulator.run_sort_trial(318, 1.0, args, seed)
+    assert result['paged'] and result['sorted']
+    assert result['drags'] < 3 * result['items']
+
+@pytest.mark.parametrize('num_slots, start_row', [(318, 43), (318, 20), (1200, 190)])
+def test_scroll_to_page_from_anywhere(simulated_sorter, num_slots, start_row): # Resume puts the list back from wherever it was left
+    sorter = simulated_sorter
+    game = inventory_simulator.SimulatedGame([None] * num_slots, sorter.MAX_NUM_ROWS)
+    tops = make_page_tops(game.total_rows, sorter.MAX_NUM_ROWS, -sorter.PAGE_SCROLL_CLICKS)
+    pages = {'page_tops': tops, 'page_scroll_clicks': [p * sorter.PAGE_SCROLL_CLICKS for p in range(len(tops))]}
+    with game.installed():
+        for page in (len(tops) - 1, len(tops) - 2, 0):
+            game.top_row = start_row
+            sorter.scroll_to_page(pages, page, 0, 0)
+            assert game.top_row == tops[page]
@@ -0,0 +1,74 @@
+import random
+
+import pytest
+
+def make_items(slots): # [(tier, count) or None per slot] -> scanned items
+    return [{'id': f"item_orig_{s}", 'tier': t, 'count': c, 'original_slot_index': s} for s, (t, c) in
+            ((s, cls) for s, cls in enumerate(slots) if cls is not None)]
+
+def slot_centers(num_slots, cols=6): return [(s % cols * 50 + 25, s // cols * 50 + 25) for s in range(num_slots)]
+
+def run_plan(sorter, slots, merge=False): # Merges (optional), then the sort, applied to a slot model -> (final slots, merges, drags)
+    items = make_items(slots); centers = slot_centers(len(slots)); merges = []
+    if merge: merges, items, _ = sorter.plan_stack_merges(items, centers)
+    moves, _ = sorter.plan_sort_moves(items, centers)
+    model = list(slots)
+    for m in merges:
+        a, b = m['from_slot_idx'], m['to_slot_idx']
+        assert model[a][0] == model[b][0] == m['tier'] and a != b
+        moved = min(sorter.CONSOLIDATE_MAX_STACK - model[b][1], model[a][1]); assert moved > 0
+        assert m['result_counts'] == (model[a][1] - moved, model[b][1] + moved)
+        model[a] = (m['tier'], model[a][1] - moved) if model[a][1] > moved else None; model[b] = (m['tier'], model[b][1] + moved)
+    for m in moves:
+        a, b = m['from_slot_idx'], m['to_slot_idx']
+        assert model[a] is not None and a != b # Never drags an empty slot
+        model[a], model[b] = model[b], model[a]
+    return model, merges, moves
+
+def assert_sorted(model):
+    items = [cls for cls in model if cls is not None]
+    assert model == sorted(items, key=lambda k: (k[0], -k[1])) + [None] * (len(model) - len(items))
+
+def tier_totals(slots):
+    totals = {}
+    for cls in filter(None, slots): totals[cls[0]] = totals.get(cls[0], 0) + cls[1]
+    return totals
+
+@pytest.mark.parametrize('seed', range(400))
+def test_random_layouts(quiet_sorter, seed):
+    rng = random.Random(seed)
+    quiet_sorter.CONSOLIDATE_MAX_STACK = rng.choice((5, 20, 100))
+    num_slots, fill, num_tiers = rng.randint(1, 240), rng.random(), rng.randint(1, 6)
+    slots = [(rng.randint(1, num_tiers), rng.randint(1, quiet_sorter.CONSOLIDATE_MAX_STACK)) if rng.random() < fill else None for _ in range(num_slots)]
+    merge = seed % 2 == 0
+    model, merges, moves = run_plan(quiet_sorter, slots, merge)
+    assert_sorted(model)
+    assert tier_totals(model) == tier_totals(slots)
+    if merge: # Partial stacks of each tier end up in as few slots as their total allows
+        full = quiet_sorter.CONSOLIDATE_MAX_STACK
+        partial = tier_totals(cls for cls in slots if cls and cls[1] < full)
+        for tier, total in tier_totals(slots).items():
+            assert sum(1 for cls in model if cls and cls[0] == tier) == sum(1 for cls in slots if cls == (tier, full)) + -(-partial.get(tier, 0) // full)
+
+def test_empty_layout(quiet_sorter):
+    assert run_plan(quiet_sorter, [None] * 12)[2] == []
+    assert quiet_sorter.plan_sort_moves([], [])[0] == []
+
+def test_already_sorted(quiet_sorter):
+    slots = [(1, 9), (1, 3), (2, 5), (2, 5), (3, 1), None, None]
+    model, _, moves = run_plan(quiet_sorter, slots)
+    assert moves == [] and model == slots
+
+def test_full_grid(quiet_sorter):
+    rng = random.Random(7)
+    slots = [(rng.randint(1, 4), rng.randint(1, 3)) for _ in range(60)]
+    model, _, moves = run_plan(quiet_sorter, slots)
+    assert_sorted(model); assert None not in model
+    assert len(moves) <= sum(a != b for a, b in zip(slots, model)) # A cycle of k misplaced slots costs k-1 drags
+
+def test_duplicate_class(quiet_sorter): # All interchangeable: only items outside the packed prefix move, one drag each
+    slots = [None, (2, 4), None, None, (2, 4), (2, 4), None, (2, 4)]
+    model, _, moves = run_plan(quiet_sorter, slots)
+    assert model == [(2, 4)] * 4 + [None] * 4 and len(moves) == 3
+    model, _, moves = run_plan(quiet_sorter, [(1, 2), (3, 1), (1, 2), (3, 1), (1, 2)])
+    assert model == [(1, 2)] * 3 + [(3, 1)] * 2 and len(moves) == 1 # Slots 1 and 4 swap; the other 1s stay put
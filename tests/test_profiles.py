@@ -0,0 +1,61 @@
+import configparser
+import json
+
+import pytest
+
+WINDOW = (0, 0, 1920, 1080)
+GEOMETRY = ('GRID_OFFSET_X', 'GRID_OFFSET_Y', 'NUM_COLS', 'SLOT_WIDTH', 'SLOT_HEIGHT', 'SLOT_GAP_X', 'SLOT_GAP_Y',
+            'COLOR_PATCH_RELATIVE_X', 'COLOR_PATCH_RELATIVE_Y', 'OCR_RELATIVE_X', 'OCR_RELATIVE_Y', 'OCR_WIDTH', 'OCR_HEIGHT', 'TIER_COLORS')
+
+@pytest.fixture
+def profiles(simulated_sorter, monkeypatch, tmp_path): # Empty profile store in tmp_path, a private copy of the running config
+    sorter = simulated_sorter
+    running = configparser.ConfigParser(); running.read_dict(sorter.config)
+    monkeypatch.setattr(sorter, 'config', running)
+    monkeypatch.setattr(sorter, 'calibration_profiles', {'loaded': False, 'profiles': {}, 'active': None, 'warned': set()})
+    sorter.CALIBRATION_PROFILE_FILE = str(tmp_path / 'profiles.json')
+    return sorter
+
+def geometry(sorter): return {name: getattr(sorter, name) for name in GEOMETRY}
+
+def recalibrate(sorter): # What a calibration for another window leaves in the config and globals
+    section = sorter.get_config_section('GridStructure')
+    sorter.config.set(section, 'gridoffsetx', '100'); sorter.config.set(section, 'slotwidth', '60'); sorter.load_calibration_settings()
+    sorter.GRID_OFFSET_Y, sorter.SLOT_GAP_X, sorter.OCR_WIDTH = 5, 1, 9
+
+def test_saved_profile_restores_geometry(profiles):
+    saved = geometry(profiles)
+    key = profiles.save_calibration_profile(WINDOW)
+    recalibrate(profiles)
+    assert geometry(profiles) != saved
+    assert profiles.apply_calibration_profile(key)
+    assert geometry(profiles) == saved
+
+def test_imported_profile_restores_geometry(profiles, monkeypatch, tmp_path):
+    saved = geometry(profiles)
+    key = profiles.save_calibration_profile(WINDOW)
+    assert profiles.export_calibration_profiles(str(tmp_path / 'export.json'))
+    monkeypatch.setattr(profiles, 'calibration_profiles', {'loaded': True, 'profiles': {}, 'active': None, 'warned': set()}) # Another machine
+    profiles.CALIBRATION_PROFILE_FILE = str(tmp_path / 'other.json'); recalibrate(profiles)
+    assert profiles.import_calibration_profiles(str(tmp_path / 'export.json'))
+    with open(tmp_path / 'other.json') as f: assert list(json.load(f)['profiles']) == [key]
+    assert profiles.apply_calibration_profile(key)
+    assert geometry(profiles) == saved
+
+@pytest.mark.parametrize('bad_settings', [{'GridStructure': {'gridoffsetx': 'left'}}, {'GridStructure': 'oops'},
+                                          {'TierColors': {'tier1': '10,20'}}, {'Hotkeys': {'calculate': 'f1'}},
+                                          {'GridStructure': {'nosuchoption': '1'}}])
+def test_malformed_import_changes_nothing(profiles, tmp_path, bad_settings):
+    key = profiles.save_calibration_profile(WINDOW); saved = geometry(profiles)
+    stored = json.loads((tmp_path / 'profiles.json').read_text()); config_before = {s: dict(profiles.config[s]) for s in profiles.config.sections()}
+    good = dict(stored['profiles'][key]); bad = dict(good, settings=bad_settings)
+    with open(tmp_path / 'import.json', 'w') as f: json.dump({'version': 1, 'profiles': {'Game 800x600': good, 'Game 1024x768': bad}}, f)
+    assert not profiles.import_calibration_profiles(str(tmp_path / 'import.json'))
+    assert sorted(profiles.load_calibration_profiles()) == [key]
+    assert json.loads((tmp_path / 'profiles.json').read_text()) == stored
+    assert {s: dict(profiles.config[s]) for s in profiles.config.sections()} == config_before and geometry(profiles) == saved
+
+def test_malformed_stored_profile_is_ignored(profiles, tmp_path):
+    with open(tmp_path / 'profiles.json', 'w') as f: json.dump({'version': 1, 'profiles': {'Game 800x600': {'settings': {'OCR': {'width': 'wide'}}}}}, f)
+    assert profiles.load_calibration_profiles() == {}
+    assert not profiles.apply_calibration_profile('Game 800x600')
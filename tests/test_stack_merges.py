@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from test_planner import assert_sorted, make_items, slot_centers
+
+def stacks(*counts): return [{'id': f"s{n}", 'tier': 1, 'count': c, 'original_slot_index': n} for n, c in enumerate(counts)]
+
+@pytest.mark.parametrize('counts, expected', [
+    ((10, 30, 70), (30, 70)), # Fills a stack exactly
+    ((10, 45, 60), (10, 60)), # Else smallest into the stack with the least room that takes it whole
+    ((50, 60, 70), (50, 70)), # Fits nowhere whole: tops up the fullest
+])
+def test_pick_stack_merge(quiet_sorter, counts, expected):
+    quiet_sorter.CONSOLIDATE_MAX_STACK = 100
+    src, dst = quiet_sorter.pick_stack_merge(stacks(*counts))
+    assert (src['count'], dst['count']) == expected
+
+def test_plan_stack_merges(quiet_sorter):
+    quiet_sorter.CONSOLIDATE_MAX_STACK = 100
+    items = make_items([(1, 30), (2, 50), (1, 70), (1, 100), (2, 60), (1, 5)])
+    moves, remaining, report = quiet_sorter.plan_stack_merges(items, slot_centers(6))
+    # Tier 1: 30 fills 70 exactly; 5 stays (105 needs two slots anyway). Tier 2: 50 + 60 already use the fewest slots.
+    assert [(m['from_slot_idx'], m['to_slot_idx'], m['result_counts']) for m in moves] == [(0, 2, (0, 100))]
+    assert moves[0]['result_ids'] == (None, 'item_orig_2+30') and moves[0]['item_id_being_moved'] == 'item_orig_0'
+    assert sorted((it['original_slot_index'], it['count']) for it in remaining) == [(1, 50), (2, 100), (3, 100), (4, 60), (5, 5)]
+    assert (report['freed'], report['before'], report['after']) == (1, 6, 5)
+
+def test_merge_moves_survive_checkpoint(quiet_sorter, tmp_path):
+    quiet_sorter.CONSOLIDATE_MAX_STACK, quiet_sorter.EXECUTOR_CHECKPOINT_FILE = 100, str(tmp_path / 'checkpoint.json')
+    items = make_items([(1, 30), (2, 50), (1, 70), (2, 60)]); centers = slot_centers(4)
+    merges, merged, _ = quiet_sorter.plan_stack_merges(items, centers)
+    moves = merges + quiet_sorter.plan_sort_moves(merged, centers)[0]
+    plan = {'moves': moves, 'items': items, 'pages': None, 'layout': {it['original_slot_index']: it['id'] for it in items}, 'next_move': 1,
+            'page': 0, 'game_origin': (0, 0), 'fingerprint': 'f', 'settings': 's'}
+    assert all(quiet_sorter.decode_plan_move(json.loads(json.dumps(quiet_sorter.encode_plan_move(m)))) == m for m in merges)
+    quiet_sorter.save_plan_checkpoint(plan); loaded = quiet_sorter.load_plan_checkpoint()
+    assert loaded['moves'][:len(merges)] == merges and [m['action'] for m in loaded['moves'][:len(merges)]] == ['merge'] * len(merges)
+    assert quiet_sorter.get_plan_items_by_id(loaded['items'], loaded['moves']) == quiet_sorter.get_plan_items_by_id(items, moves)
+
+def test_replan_after_partial_merge(simulated_sorter, monkeypatch): # The executor stopped after the first merge
+    sorter = simulated_sorter
+    sorter.CONSOLIDATE_ENABLED, sorter.CONSOLIDATE_MAX_STACK, sorter.CONTAINERS_ENABLED = True, 100, False
+    monkeypatch.setattr(sorter, 'is_any_ocr_available', lambda: True)
+    slots = [(2, 40), (1, 30), (2, 50), (1, 70), (1, 20), None, (2, 30), (1, 100)]
+    items = make_items(slots); merges, _, _ = sorter.plan_stack_merges(items, slot_centers(len(slots)))
+    assert len(merges) >= 2
+    layout = {it['original_slot_index']: it['id'] for it in items}
+    layout[merges[0]['from_slot_idx']], layout[merges[0]['to_slot_idx']] = merges[0]['result_ids'] # As the executor records a merge
+    items_by_id = sorter.get_plan_items_by_id(items, merges[:1])
+    remaining = sorter.replan_remaining_moves(layout, items_by_id, 0, 0, None, 0)
+    assert remaining[0]['action'] == 'merge' and merges[0] not in remaining
+    items_by_id.update(sorter.get_plan_items_by_id([], remaining))
+    for m in remaining: # Play the rest on the id layout
+        a, b = m['from_slot_idx'], m['to_slot_idx']
+        if m.get('action') == 'merge': layout[a], layout[b] = m['result_ids']
+        else: layout[a], layout[b] = layout.get(b), layout[a]
+    model = [None] * len(slots)
+    for s_idx, item_id in layout.items():
+        if item_id is not None: model[s_idx] = (items_by_id[item_id]['tier'], items_by_id[item_id]['count'])
+    assert_sorted(model)
+    assert [cls[0] for cls in model[:5]] == [1, 1, 1, 2, 2] and model[5:] == [None] * 3 # 220 of tier 1 in 3 slots, 120 of tier 2 in 2
+    assert sum(cls[1] for cls in model[:3]) == 220 and sum(cls[1] for cls in model[3:5]) == 120
@@ -0,0 +1,52 @@
+import json
+
+import numpy as np
+import pytest
+
+import inventory_benchmark
+
+@pytest.fixture
+def learned(simulated_sorter, monkeypatch, tmp_path): # Classifier trained on the colours the benchmark paints, in tmp files
+    sorter = simulated_sorter; rng = np.random.default_rng(0)
+    monkeypatch.setattr(sorter, 'tier_classifier', None)
+    palette = {tier: tuple(rgb) for tier, rgb in sorter.TIER_COLORS.items()}; palette[0] = inventory_benchmark.SLOT_RGB
+    samples = {str(tier): np.clip(np.array(rgb) + rng.normal(0, 3, (40, 3)), 0, 255).astype(int).tolist() for tier, rgb in palette.items()}
+    sorter.COLOR_SAMPLE_FILE, sorter.COLOR_CLASSIFIER_FILE = str(tmp_path / 'samples.json'), str(tmp_path / 'classifier.npz')
+    with open(sorter.COLOR_SAMPLE_FILE, 'w') as f: json.dump(samples, f)
+    direct = lambda rgb: sorter.identify_tier_from_color(tuple(rgb)) # TierColors + Tolerance, read before the table exists
+    expected = {tier: direct(rgb) for tier, rgb in palette.items()}
+    assert sorter.learn_tier_classifier()
+    return sorter, palette, samples, expected
+
+def classify_with_model(sorter, colors): # The saved Gaussian model evaluated directly, as compile_tier_lut does for each cell
+    with np.load(sorter.COLOR_CLASSIFIER_FILE) as data: classes, means, inv_covs = data['classes'], data['means'], data['inv_covs']
+    step = 256 >> sorter.TIER_LUT_BITS
+    lab = sorter.rgb_to_lab((np.asarray(colors) // step) * step + step // 2)
+    dists = np.stack([np.sqrt(np.einsum('ni,ij,nj->n', lab - m, ic, lab - m)) for m, ic in zip(means, inv_covs)], axis=1)
+    best = classes[dists.argmin(axis=1)]
+    return np.where((best > 0) & (dists.min(axis=1) <= sorter.COLOR_MAX_DISTANCE), best, 0)
+
+def test_table_agrees_with_tolerance_matching(learned):
+    sorter, palette, samples, expected = learned
+    for tier, rgb in palette.items():
+        assert sorter.classify_tier_color(rgb)[0] == expected[tier] == (tier or None)
+    for tier, rgb_list in samples.items(): # Every training sample reads back as its tier
+        tiers, _ = sorter.lookup_tier_lut(np.array(rgb_list))
+        assert (tiers == int(tier)).all()
+
+def test_table_agrees_with_model(learned):
+    sorter, _, samples, _ = learned
+    colors = np.array([rgb for rgb_list in samples.values() for rgb in rgb_list])
+    colors = np.clip(np.concatenate([colors, colors + 12, colors - 12]), 0, 255) # Samples and the cells around them
+    tiers, reasons = sorter.lookup_tier_lut(colors)
+    clear = reasons != 3 # The model picks one of two close tiers; the table rejects them as ambiguous
+    assert (tiers[clear] == classify_with_model(sorter, colors)[clear]).all()
+
+@pytest.mark.parametrize('rgb', [(0, 255, 0), (255, 255, 255), (0, 0, 255), (250, 240, 10)])
+def test_colours_far_from_every_tier_are_rejected(learned, rgb):
+    sorter = learned[0]
+    assert sorter.classify_tier_color(rgb) == (None, 'unknown colour')
+
+def test_unsampled_patch_is_not_classified(learned):
+    tiers, reasons = learned[0].lookup_tier_lut(np.array([[-1, -1, -1], list(learned[1][1])]))
+    assert tiers.tolist() == [0, 1] and reasons.tolist() == [4, 0]
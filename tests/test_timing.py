@@ -0,0 +1,35 @@
+import time
+import types
+
+import numpy as np
+import pytest
+
+@pytest.fixture
+def drag_rig(simulated_sorter, monkeypatch): # timed_drag against slots that change only when told to -> (sorter, state)
+    sorter = simulated_sorter
+    sorter.TIMING_ADAPTIVE, sorter.TIMING_WAIT_TIMEOUT = True, 0.3
+    monkeypatch.setattr(sorter, 'timing_profile', dict(sorter.timing_profile)); sorter.load_timing_profile()
+    state = {'lift': False, 'down': False, 'dropped': 0}
+    def grab(game_x, game_y, slots): # Source changes on pickup only if this game shows a lift; the drop always shows
+        src, dst = slots
+        return {src: np.array([int(state['down'] and state['lift'])]), dst: np.array([state['dropped']])}
+    def mouse_up(): state.update(down=False, dropped=state['dropped'] + 1)
+    monkeypatch.setattr(sorter, 'capture_slot_regions', grab)
+    monkeypatch.setattr(sorter, 'pyautogui', types.SimpleNamespace(moveTo=lambda *a, **k: None, easeInOutQuad=None,
+                                                                 mouseDown=lambda: state.update(down=True), mouseUp=mouse_up))
+    return sorter, state
+
+def test_no_lift_falls_back_to_short_wait(drag_rig):
+    sorter, state = drag_rig
+    for _ in range(sorter.PICKUP_MISSES_TO_FALL_BACK): assert sorter.timed_drag(0, 0, 1, 1, 0, 0, 0, 1)
+    assert sorter.timing_profile['pickup_timeout'] == sorter.PICKUP_FALLBACK_WAIT
+    start = time.perf_counter(); sorter.timed_drag(0, 0, 1, 1, 0, 0, 0, 1)
+    assert time.perf_counter() - start < sorter.TIMING_WAIT_TIMEOUT
+
+def test_seen_lift_resets_misses(drag_rig):
+    sorter, state = drag_rig
+    for _ in range(sorter.PICKUP_MISSES_TO_FALL_BACK - 1): sorter.timed_drag(0, 0, 1, 1, 0, 0, 0, 1)
+    state['lift'] = True; sorter.timed_drag(0, 0, 1, 1, 0, 0, 0, 1)
+    assert sorter.timing_profile['pickup_misses'] == 0 and sorter.timing_profile['pickup_timeout'] < sorter.TIMING_WAIT_TIMEOUT
+    state['lift'] = False; sorter.timed_drag(0, 0, 1, 1, 0, 0, 0, 1)
+    assert sorter.timing_profile['pickup_misses'] == 1